@@ -0,0 +1,319 @@
+# cmms_api/agenda.py
+# Proyección de los eventos de agenda de los planes de mantenimiento preventivo:
+# se leen los detalles y los horómetros de todos los equipos de una vez, los
+# vencimientos se calculan con pronostico.py y los eventos se guardan con un
+# solo bulk_create.
+
+import datetime
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Case, Exists, F, OuterRef, Prefetch, Subquery, When
+from django.utils import timezone
+
+from .cache import invalidar_tags, tag_modelo
+from .models import Agendas, DetallesPlanMantenimiento, Equipos, OrdenesTrabajo, PlanesMantenimiento
+from .pronostico import HORAS_DIARIAS_DEFECTO, pronosticar
+
+# Hora de inicio de los eventos proyectados y duración (minutos) de los de
+# tareas sin tiempo estimado.
+HORA_INICIO_EVENTO = 8
+DURACION_EVENTO_DEFECTO = 60
+
+
+def equipos_con_horometro(equipos):
+    """
+    Anota cada equipo con `ultimo_horometro`: su última lectura de horómetro o,
+    si no tiene lecturas registradas, el horómetro de su OT más reciente que lo
+    registró (usa el índice por equipo y fecha de creación de las OTs).
+    """
+    ultima_ot = OrdenesTrabajo.objects.filter(
+        idequipo=OuterRef('pk'), horometro__isnull=False
+    ).order_by('-fechacreacionot').values('horometro')[:1]
+    return equipos.annotate(ultimo_horometro=Case(
+        When(fechahorometro__isnull=False, then=F('horometroactual')),
+        default=Subquery(ultima_ot),
+    ))
+
+
+def uso_equipo(equipo, hoy, horas_diarias=HORAS_DIARIAS_DEFECTO):
+    """
+    (horómetro estimado a hoy, tasa de uso) de un equipo de equipos_con_horometro.
+    Sin tasa estimada se usa `horas_diarias`; con ella, el horómetro se proyecta
+    desde la fecha de la última lectura.
+    """
+    tasa = equipo.tasausodiaria if equipo.tasausodiaria is not None else horas_diarias
+    horometro = equipo.ultimo_horometro or 0
+    if equipo.fechahorometro is not None and equipo.tasausodiaria is not None:
+        dias = (hoy - timezone.localdate(equipo.fechahorometro)).days
+        horometro += int(max(dias, 0) * tasa)
+    return horometro, tasa
+
+
+def vencimientos(equipos, detalles, hoy, horizonte_dias=None, max_ocurrencias=None,
+                 horas_diarias=HORAS_DIARIAS_DEFECTO, duracion_defecto=0):
+    """
+    Pronóstico de cada detalle para cada equipo (ver pronostico.pronosticar) con
+    la tasa de uso estimada de cada uno, o `horas_diarias` si no la tiene.
+    `equipos` debe venir de equipos_con_horometro. Retorna tuplas
+    (equipo, detalle, fecha, horometro_estimado, minutos) ordenadas por equipo,
+    detalle y fecha.
+    """
+    if not equipos or not detalles:
+        return []
+    horometros, tasas = zip(*(uso_equipo(equipo, hoy, horas_diarias) for equipo in equipos))
+    resultado = pronosticar(
+        horometros=horometros,
+        tasas=tasas,
+        intervalos=[detalle.intervalohorasoperacion for detalle in detalles],
+        duraciones=[detalle.idtareaestandar.tiempoestimadominutos or duracion_defecto for detalle in detalles],
+        horizonte_dias=horizonte_dias,
+        max_ocurrencias=max_ocurrencias,
+    )
+    return [
+        (equipos[e], detalles[d], hoy + timezone.timedelta(days=dias), horometro, minutos)
+        for e, d, dias, horometro, minutos in zip(*(columna.tolist() for columna in resultado))
+    ]
+
+
+def clave_natural(evento):
+    return (evento.idequipo_id, evento.idplanmantenimiento_id, evento.iddetalleplan_id, evento.fechavencimiento)
+
+
+def _eventos_del_lote(eventos):
+    """ Eventos con clave natural en el rango de vencimientos de los equipos y planes del lote. """
+    fechas = [evento.fechavencimiento for evento in eventos]
+    return Agendas.objects.filter(
+        idequipo__in={evento.idequipo_id for evento in eventos},
+        idplanmantenimiento__in={evento.idplanmantenimiento_id for evento in eventos},
+        fechavencimiento__range=(min(fechas), max(fechas)),
+    ).order_by()
+
+
+def insertar_faltantes(eventos, con_ids=False):
+    """
+    Inserta los eventos proyectados (con su clave natural completa) que aún no
+    están en la agenda. Los existentes se leen con una sola consulta por rango
+    de vencimiento sobre los equipos y planes del lote, así que conviene llamarla
+    por lotes acotados de equipos. Es segura de repetir: lo que otro proceso haya
+    insertado entretanto se ignora por la restricción única. Retorna los
+    eventos que se intentó insertar; con `con_ids` se leen sus claves primarias
+    (bulk_create con ignore_conflicts no las asigna).
+    """
+    if not eventos:
+        return []
+    existentes = set(_eventos_del_lote(eventos).values_list(
+        'idequipo', 'idplanmantenimiento', 'iddetalleplan', 'fechavencimiento'
+    ))
+
+    faltantes = [evento for evento in eventos if clave_natural(evento) not in existentes]
+    if faltantes:
+        Agendas.objects.bulk_create(faltantes, batch_size=500, ignore_conflicts=True)
+        # bulk_create no envía post_save: se invalidan a mano la agenda y el dashboard.
+        invalidar_tags(tag_modelo(Agendas))
+        if con_ids:
+            ids = {
+                tuple(clave): idagenda for idagenda, *clave in _eventos_del_lote(faltantes).values_list(
+                    'idagenda', 'idequipo', 'idplanmantenimiento', 'iddetalleplan', 'fechavencimiento'
+                )
+            }
+            for evento in faltantes:
+                evento.idagenda = ids.get(clave_natural(evento))
+    return faltantes
+
+
+def generar_agenda_plan(plan, usuario):
+    """
+    Crea los eventos de agenda del próximo mantenimiento de cada tarea activa
+    del plan para cada equipo activo de su tipo, salvo los que ya están en la
+    agenda (por clave natural, ver insertar_faltantes). Retorna una lista de
+    (evento, equipo, detalle) de los eventos creados, en el orden de la proyección.
+    """
+    equipos = list(equipos_con_horometro(
+        Equipos.objects.filter(idtipoequipo=plan.idtipoequipo_id, activo=True)
+    ))
+    detalles = list(DetallesPlanMantenimiento.objects.filter(
+        idplanmantenimiento=plan, activo=True
+    ).select_related('idtareaestandar').order_by('intervalohorasoperacion'))
+
+    proyectados = [
+        (evento_plan(equipo, plan, detalle, fecha, horometro, minutos, usuario), equipo, detalle)
+        for equipo, detalle, fecha, horometro, minutos in vencimientos(
+            equipos, detalles, timezone.now().date(), max_ocurrencias=1,
+            duracion_defecto=DURACION_EVENTO_DEFECTO
+        )
+    ]
+    if not proyectados:
+        return proyectados
+
+    with transaction.atomic():
+        # Las claves generadas se leen por clave natural: otra generación
+        # simultánea del mismo plan no puede confundirse con esta.
+        insertados = {id(evento) for evento in insertar_faltantes(
+            [evento for evento, _, _ in proyectados], con_ids=True
+        )}
+    return [fila for fila in proyectados if id(fila[0]) in insertados]
+
+
+def usuario_sistema():
+    """ Usuario con que se registran los eventos creados automáticamente. """
+    usuario, _ = User.objects.get_or_create(
+        username='sistema_agenda',
+        defaults={
+            'first_name': 'Sistema',
+            'last_name': 'Agenda',
+            'email': 'sistema@somacor.com',
+            'is_active': True
+        }
+    )
+    return usuario
+
+
+# Tipo de evento y color según el tipo de mantenimiento de la OT (preventivo por defecto).
+EVENTOS_POR_TIPO_OT = {
+    'Correctivo': ('correctivo', '#F59E0B'),  # Naranja
+    'Predictivo': ('predictivo', '#10B981'),  # Verde
+}
+EVENTO_OT_DEFECTO = ('preventivo', '#3B82F6')  # Azul
+# Tipo y color de los eventos de los planes; las tareas críticas van en rojo.
+EVENTO_PLAN = ('preventivo', '#3B82F6')  # Azul
+COLOR_EVENTO_CRITICO = '#dc3545'
+
+
+def _inicio_del_dia(fecha, hora):
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time(hora)))
+
+
+def _evento_orden(orden, usuario):
+    tipo_mantenimiento = orden.idtipomantenimientoot.nombretipomantenimientoot
+    tipo_evento, color_evento = EVENTOS_POR_TIPO_OT.get(tipo_mantenimiento, EVENTO_OT_DEFECTO)
+    equipo = orden.idequipo.nombreequipo
+
+    descripcion = f"OT: {orden.numeroot}\n"
+    descripcion += f"Equipo: {equipo}\n"
+    descripcion += f"Tipo: {tipo_mantenimiento}\n"
+    descripcion += f"Prioridad: {orden.prioridad}\n"
+    if orden.descripcionproblemareportado:
+        descripcion += f"Problema: {orden.descripcionproblemareportado}\n"
+    if orden.horometro:
+        descripcion += f"Horómetro: {orden.horometro}h\n"
+
+    # 8:00 AM del día de ejecución, 4 horas de duración por defecto
+    fecha_inicio = _inicio_del_dia(orden.fechaejecucion, 8)
+    return Agendas(
+        tituloevento=f"Mantenimiento {tipo_mantenimiento} - {equipo}",
+        fechahorainicio=fecha_inicio,
+        fechahorafin=fecha_inicio + timezone.timedelta(hours=4),
+        descripcionevento=descripcion,
+        tipoevento=tipo_evento,
+        colorevento=color_evento,
+        esdiacompleto=False,
+        idequipo=orden.idequipo,
+        idordentrabajo=orden,
+        idusuarioasignado_id=orden.idtecnicoasignado_id,
+        idusuariocreador=usuario,
+    )
+
+
+def sincronizar_ordenes(usuario=None):
+    """
+    Crea el evento de agenda de cada OT abierta o en progreso con fecha de
+    ejecución que aún no tiene uno: una consulta para las OTs (con su tipo y
+    equipo) y un bulk_create. Retorna los eventos creados.
+    """
+    ordenes = list(OrdenesTrabajo.objects.filter(
+        fechaejecucion__isnull=False,
+        idestadoot__nombreestadoot__in=['Abierta', 'En Progreso']
+    ).exclude(
+        Exists(Agendas.objects.filter(idordentrabajo=OuterRef('pk')))
+    ).select_related('idtipomantenimientoot', 'idequipo').order_by('fechaejecucion', 'idordentrabajo'))
+    if not ordenes:
+        return []
+
+    usuario = usuario or usuario_sistema()
+    eventos = [_evento_orden(orden, usuario) for orden in ordenes]
+    with transaction.atomic():
+        Agendas.objects.bulk_create(eventos, batch_size=500)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ids = dict(Agendas.objects.filter(
+                idordentrabajo__in=[orden.pk for orden in ordenes]
+            ).order_by().values_list('idordentrabajo', 'idagenda'))
+            for evento in eventos:
+                evento.idagenda = ids.get(evento.idordentrabajo_id)
+        invalidar_tags(tag_modelo(Agendas))
+    return eventos
+
+
+def evento_plan(equipo, plan, detalle, fecha, horometro_estimado, minutos, usuario):
+    """
+    Evento de agenda (sin guardar) del vencimiento de un detalle del plan en
+    `fecha`, con su clave natural. Lo usan todos los generadores de la agenda
+    preventiva, así que un mismo vencimiento queda igual venga de donde venga.
+    """
+    tarea = detalle.idtareaestandar.nombretarea
+    tipo_evento, color_evento = EVENTO_PLAN
+    descripcion = f"Plan: {plan.nombreplan}\n"
+    descripcion += f"Tarea: {tarea}\n"
+    descripcion += f"Intervalo: {detalle.intervalohorasoperacion}h\n"
+    descripcion += f"Equipo: {equipo.nombreequipo}\n"
+    descripcion += f"Horómetro estimado: {horometro_estimado}h"
+
+    fecha_inicio = _inicio_del_dia(fecha, HORA_INICIO_EVENTO)
+    return Agendas(
+        tituloevento=f"Mantenimiento Preventivo - {equipo.nombreequipo} - {tarea}",
+        fechahorainicio=fecha_inicio,
+        fechahorafin=fecha_inicio + timezone.timedelta(minutes=minutos),
+        descripcionevento=descripcion,
+        tipoevento=tipo_evento,
+        colorevento=COLOR_EVENTO_CRITICO if detalle.escritic else color_evento,
+        esdiacompleto=False,
+        idequipo=equipo,
+        idplanmantenimiento=plan,
+        iddetalleplan=detalle,
+        fechavencimiento=fecha,
+        idusuariocreador=usuario,
+    )
+
+
+def sincronizar_planes(usuario=None, dias_adelante=30, tamano_lote=500):
+    """
+    Crea los eventos del próximo vencimiento de cada tarea de los planes
+    activos para los equipos activos de su tipo, si cae en los próximos
+    `dias_adelante` días y aún no está en la agenda (por clave natural). Se leen
+    los planes con sus detalles y los equipos con su horómetro en tres consultas;
+    luego, por lotes de equipos, una consulta de existentes y un bulk_create.
+    Retorna los eventos creados.
+    """
+    planes = list(PlanesMantenimiento.objects.filter(activo=True).prefetch_related(Prefetch(
+        'detallesplanmantenimiento_set',
+        queryset=DetallesPlanMantenimiento.objects.filter(activo=True).select_related(
+            'idtareaestandar'
+        ).order_by('intervalohorasoperacion'),
+        to_attr='detalles_activos'
+    )))
+    equipos_por_tipo = defaultdict(list)
+    for equipo in equipos_con_horometro(Equipos.objects.filter(
+        activo=True, idtipoequipo__in={plan.idtipoequipo_id for plan in planes}
+    )):
+        equipos_por_tipo[equipo.idtipoequipo_id].append(equipo)
+
+    hoy = timezone.now().date()
+    creados = []
+    with transaction.atomic():
+        for plan in planes:
+            equipos = equipos_por_tipo[plan.idtipoequipo_id]
+            for inicio in range(0, len(equipos), tamano_lote):
+                proyeccion = vencimientos(
+                    equipos[inicio:inicio + tamano_lote], plan.detalles_activos, hoy,
+                    horizonte_dias=dias_adelante, max_ocurrencias=1,
+                    duracion_defecto=DURACION_EVENTO_DEFECTO
+                )
+                if not proyeccion:
+                    continue
+                usuario = usuario or usuario_sistema()
+                creados += insertar_faltantes([
+                    evento_plan(equipo, plan, detalle, fecha, horometro, minutos, usuario)
+                    for equipo, detalle, fecha, horometro, minutos in proyeccion
+                ], con_ids=True)
+    return creados
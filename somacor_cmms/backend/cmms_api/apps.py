@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CmmsApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cmms_api'
+
+    def ready(self):
+        # Registra los receptores que mantienen el resumen de conformidad y
+        # que invalidan la instantánea del dashboard, el registro de catálogos y
+        # los roles en caché.
+        from . import catalogos, conformidad, dashboard, permissions  # noqa: F401
+        from .cache import versionar_apps
+
+        # Versiones por modelo para los ETag de la API (ver condicional.py).
+        versionar_apps('cmms_api', 'auth', 'authtoken')
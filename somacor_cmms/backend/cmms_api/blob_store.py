@@ -0,0 +1,198 @@
+# cmms_api/blob_store.py
+# Almacenamiento de imágenes fuera de la base de datos, direccionado por contenido.
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+# Clave de un blob: SHA-256 del contenido + extensión. Ej: "9f86d0...0f00a08.jpg"
+PATRON_CLAVE = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]{1,5}$')
+
+TIPOS_CONTENIDO = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+    'bin': 'application/octet-stream',
+}
+
+
+class BlobNoEncontrado(Exception):
+    pass
+
+
+def detectar_extension(data):
+    """ Detecta la extensión de una imagen a partir de sus primeros bytes. """
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return 'bin'
+
+
+def decodificar_base64(valor):
+    """
+    Decodifica una imagen en base64, aceptando también el formato data URI
+    ("data:image/png;base64,...") que envía el frontend.
+    Lanza ValueError si el contenido no es base64 válido.
+    """
+    if ',' in valor and valor.lstrip().startswith('data:'):
+        valor = valor.split(',', 1)[1]
+    try:
+        return base64.b64decode(''.join(valor.split()), validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f'Imagen base64 inválida: {e}')
+
+
+class BaseBlobStore:
+    """
+    Interfaz mínima de un almacén de blobs. Las implementaciones deben ser
+    idempotentes: guardar el mismo contenido dos veces retorna la misma clave.
+    """
+
+    def save(self, data):
+        """ Guarda los bytes y retorna su clave. """
+        raise NotImplementedError
+
+    def open(self, key):
+        """ Retorna un archivo binario abierto para lectura o lanza BlobNoEncontrado. """
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def url(self, key):
+        """ URL relativa desde la que se sirve el blob. """
+        return reverse('blob', kwargs={'key': key})
+
+    def content_type(self, key):
+        return TIPOS_CONTENIDO.get(key.rsplit('.', 1)[-1], TIPOS_CONTENIDO['bin'])
+
+    def save_file(self, archivo):
+        """ Guarda el contenido de un archivo abierto. Las implementaciones pueden hacerlo por bloques. """
+        archivo.seek(0)
+        return self.save(archivo.read())
+
+    def save_base64(self, valor):
+        return self.save(decodificar_base64(valor))
+
+    @staticmethod
+    def calcular_clave(data):
+        return f"{hashlib.sha256(data).hexdigest()}.{detectar_extension(data)}"
+
+    @staticmethod
+    def validar_clave(key):
+        if not PATRON_CLAVE.match(key or ''):
+            raise BlobNoEncontrado(key)
+
+
+class LocalFileSystemBlobStore(BaseBlobStore):
+    """
+    Guarda cada blob en `location/ab/cd/<sha256>.<ext>`. Como la ruta depende solo
+    del contenido, las imágenes repetidas se almacenan una sola vez.
+    """
+
+    def __init__(self, location=None):
+        self.location = str(location or os.path.join(settings.MEDIA_ROOT, 'blobs'))
+
+    def path(self, key):
+        self.validar_clave(key)
+        return os.path.join(self.location, key[:2], key[2:4], key)
+
+    def save(self, data):
+        key = self.calcular_clave(data)
+        destino = self.path(key)
+        if os.path.exists(destino):
+            return key
+
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        # Escritura atómica: archivo temporal en el mismo directorio y luego rename.
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as archivo:
+                archivo.write(data)
+            os.replace(temporal, destino)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        return key
+
+    def save_file(self, archivo, chunk_size=64 * 1024):
+        """
+        Copia el archivo por bloques a un temporal mientras calcula su hash, de
+        modo que el contenido nunca se carga completo en memoria.
+        """
+        os.makedirs(self.location, exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=self.location, suffix='.tmp')
+        try:
+            sha256 = hashlib.sha256()
+            cabecera = b''
+            archivo.seek(0)
+            with os.fdopen(fd, 'wb') as destino:
+                for bloque in iter(lambda: archivo.read(chunk_size), b''):
+                    if len(cabecera) < 16:
+                        cabecera += bloque[:16]
+                    sha256.update(bloque)
+                    destino.write(bloque)
+            key = f"{sha256.hexdigest()}.{detectar_extension(cabecera)}"
+            destino_final = self.path(key)
+            if os.path.exists(destino_final):
+                os.remove(temporal)
+            else:
+                os.makedirs(os.path.dirname(destino_final), exist_ok=True)
+                os.replace(temporal, destino_final)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        return key
+
+    def open(self, key):
+        try:
+            return open(self.path(key), 'rb')
+        except FileNotFoundError:
+            raise BlobNoEncontrado(key)
+
+    def exists(self, key):
+        try:
+            return os.path.exists(self.path(key))
+        except BlobNoEncontrado:
+            return False
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except (FileNotFoundError, BlobNoEncontrado):
+            pass
+
+
+@lru_cache(maxsize=None)
+def get_blob_store():
+    """ Instancia el almacén configurado en settings.CMMS_BLOB_STORE. """
+    config = getattr(settings, 'CMMS_BLOB_STORE', {})
+    clase = import_string(config.get('BACKEND', 'cmms_api.blob_store.LocalFileSystemBlobStore'))
+    return clase(**config.get('OPTIONS', {}))
+
+
+@receiver(setting_changed)
+def reiniciar_blob_store(setting, **kwargs):
+    if setting == 'CMMS_BLOB_STORE':
+        get_blob_store.cache_clear()
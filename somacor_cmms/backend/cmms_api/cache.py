@@ -0,0 +1,226 @@
+# cmms_api/cache.py
+# Capa de caché de la API: helpers con versión por clave e invalidación por tags.
+#
+# Cada entrada se guarda junto con la versión de sus tags. Invalidar un tag solo
+# incrementa su contador; las entradas que dependían de la versión anterior dejan
+# de coincidir y se recalculan en la próxima lectura. Los contadores deben ser
+# los mismos para todos los workers: con memoria local (por proceso) un worker no
+# ve las invalidaciones de otro, así que contadores y entradas con tags duran
+# solo CMMS_CACHE_TTL_LOCAL segundos, salvo que se declare CMMS_CACHE_COMPARTIDA
+# (ver CACHES en settings.py).
+
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.response import Response
+
+
+def get_cache():
+    """ Caché configurada para la API (CMMS_CACHE_ALIAS, 'default' por defecto). """
+    return caches[getattr(settings, 'CMMS_CACHE_ALIAS', 'default')]
+
+
+def cache_compartida():
+    """
+    True si la caché la comparten todos los procesos, de modo que invalidar un
+    tag en un worker también invalida sus entradas en los demás. Se toma de
+    CMMS_CACHE_COMPARTIDA o, si no está definido, del backend configurado.
+    """
+    compartida = getattr(settings, 'CMMS_CACHE_COMPARTIDA', None)
+    if compartida is None:
+        compartida = not isinstance(get_cache(), (LocMemCache, DummyCache))
+    return compartida
+
+
+def ttl_por_defecto():
+    return getattr(settings, 'CMMS_CACHE_TTL', 300)
+
+
+def ttl_local():
+    """ Vida máxima de versiones y entradas con tags en una caché por proceso. """
+    return getattr(settings, 'CMMS_CACHE_TTL_LOCAL', 5)
+
+
+def _ttl_version_tag():
+    return None if cache_compartida() else ttl_local()
+
+
+def tag_modelo(modelo):
+    """ Tag que se invalida al guardar o eliminar instancias de `modelo`. """
+    return modelo._meta.label_lower
+
+
+def _clave_tag(tag):
+    return f'cmms_api:tag:{tag}'
+
+
+def _nueva_version_tag():
+    # Basada en el reloj: si el contador de un tag se pierde (expulsión, reinicio)
+    # el valor nuevo no coincide con el de entradas guardadas antes.
+    return time.time_ns()
+
+
+def versiones_tags(tags):
+    """ Versión actual de cada tag, inicializando las que aún no existen. """
+    if not tags:
+        return ()
+    cache = get_cache()
+    claves = [_clave_tag(tag) for tag in tags]
+    actuales = cache.get_many(claves)
+    for clave in claves:
+        if clave not in actuales:
+            cache.add(clave, _nueva_version_tag(), _ttl_version_tag())
+            actuales[clave] = cache.get(clave)
+    return tuple(actuales[clave] for clave in claves)
+
+
+def invalidar_tags(*tags):
+    """
+    Invalida todas las entradas asociadas a los tags. Se aplica de inmediato y de
+    nuevo al confirmar la transacción en curso, para que una lectura concurrente no
+    vuelva a guardar datos anteriores al commit.
+    """
+    def invalidar():
+        cache = get_cache()
+        for tag in tags:
+            try:
+                cache.incr(_clave_tag(tag))
+            except ValueError:
+                cache.set(_clave_tag(tag), _nueva_version_tag(), _ttl_version_tag())
+
+    invalidar()
+    transaction.on_commit(invalidar)
+
+
+def obtener(clave, tags=(), version=None):
+    """ Retorna (encontrado, valor). """
+    entrada = get_cache().get(clave, version=version)
+    if entrada is None or entrada[0] != versiones_tags(tags):
+        return False, None
+    return True, entrada[1]
+
+
+def guardar(clave, valor, ttl=None, tags=(), version=None):
+    """
+    Guarda `valor` con la versión actual de sus tags. Sin caché compartida (ver
+    cache_compartida) las entradas con tags viven a lo más ttl_local().
+    """
+    ttl = ttl_por_defecto() if ttl is None else ttl
+    if tags and not cache_compartida():
+        ttl = min(ttl, ttl_local())
+    get_cache().set(clave, (versiones_tags(tags), valor), ttl, version=version)
+
+
+def obtener_o_calcular(clave, calcular, ttl=None, tags=(), version=None):
+    """
+    Retorna el valor en caché para `clave` o lo calcula con `calcular()` y lo guarda.
+    `version` permite invalidar una clave puntual sin tocar sus tags.
+    """
+    encontrado, valor = obtener(clave, tags, version)
+    if not encontrado:
+        valor = calcular()
+        guardar(clave, valor, ttl, tags, version)
+    return valor
+
+
+def clave_solicitud(request, prefijo='vista', por_usuario=False):
+    """ Clave para una solicitud GET: ruta, parámetros y, opcionalmente, usuario. """
+    partes = [request.path, request.META.get('QUERY_STRING', '')]
+    if por_usuario:
+        partes.append(str(request.user.pk))
+    return f"cmms_api:{prefijo}:{hashlib.md5('|'.join(partes).encode()).hexdigest()}"
+
+
+def cachear_respuesta(tags=(), ttl=None, por_usuario=False):
+    """
+    Decorador para acciones GET de un viewset: guarda response.data en la caché y lo
+    reutiliza mientras no se invaliden los tags. `tags` puede ser una lista o una
+    función que recibe la vista. Los permisos se verifican antes de llegar a la acción.
+    """
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self, request, *args, **kwargs):
+            if request.method != 'GET':
+                return metodo(self, request, *args, **kwargs)
+            tags_vista = tags(self) if callable(tags) else tags
+            clave = clave_solicitud(request, por_usuario=por_usuario)
+            encontrado, datos = obtener(clave, tags_vista)
+            if encontrado:
+                return Response(datos)
+            response = metodo(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                guardar(clave, response.data, ttl, tags_vista)
+            return response
+        return envoltura
+    return decorador
+
+
+def invalidar_al_modificar(*modelos, tags=None):
+    """
+    Conecta post_save/post_delete de los modelos para invalidar sus tags
+    (por defecto, el tag de cada modelo).
+    """
+    for modelo in modelos:
+        tags_modelo = tuple(tags) if tags is not None else (tag_modelo(modelo),)
+
+        def receptor(sender, tags_modelo=tags_modelo, propio=tags is None, **kwargs):
+            # El tag propio del modelo ya lo invalida versionar_apps, si cubre su app.
+            if propio and sender._meta.app_label in _apps_versionadas:
+                return
+            invalidar_tags(*tags_modelo)
+
+        uid = f'cmms_api.cache:{modelo._meta.label_lower}:{",".join(tags_modelo)}'
+        post_save.connect(receptor, sender=modelo, weak=False, dispatch_uid=uid)
+        post_delete.connect(receptor, sender=modelo, weak=False, dispatch_uid=uid)
+
+
+def _modelo_modificado(sender, **kwargs):
+    if sender._meta.app_label in _apps_versionadas:
+        invalidar_tags(tag_modelo(sender))
+
+
+_apps_versionadas = set()
+
+
+def versionar_apps(*app_labels):
+    """
+    Mantiene el tag de cada modelo de las apps indicadas al día con cualquier
+    post_save/post_delete, aunque ninguna vista lo haya registrado aún en este
+    proceso (p. ej. escrituras desde comandos o desde otro worker). Las
+    escrituras masivas (bulk_create, update) no envían señales: quien las hace
+    debe llamar a invalidar_tags.
+    """
+    _apps_versionadas.update(app_labels)
+    post_save.connect(_modelo_modificado, weak=False, dispatch_uid='cmms_api.cache:versionar_apps')
+    post_delete.connect(_modelo_modificado, weak=False, dispatch_uid='cmms_api.cache:versionar_apps')
+
+
+class CatalogoCacheMixin:
+    """
+    Para viewsets de catálogos: list y retrieve se sirven desde la caché y se
+    invalidan al guardar o eliminar cualquier registro del modelo.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        queryset = getattr(cls, 'queryset', None)
+        if queryset is not None:
+            invalidar_al_modificar(queryset.model)
+
+    def _tags_catalogo(self):
+        return (tag_modelo(self.queryset.model),)
+
+    @cachear_respuesta(tags=lambda vista: vista._tags_catalogo())
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cachear_respuesta(tags=lambda vista: vista._tags_catalogo())
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,164 @@
+# cmms_api/campos.py
+# Campos parciales (?fields= / ?omit=) y representaciones compactas (?compacto=true)
+# para las lecturas de la API.
+#
+# ?fields=a,b limita la respuesta a esos campos; ?omit=c,d los quita. Además de
+# recortar la salida, el queryset deja de leer las columnas, joins y prefetch que
+# solo alimentaban los campos descartados.
+
+from rest_framework import permissions
+
+PARAM_CAMPOS = 'fields'
+PARAM_OMITIR = 'omit'
+PARAM_COMPACTO = 'compacto'
+
+
+def _lista_param(request, nombre):
+    valor = request.query_params.get(nombre) if request is not None else None
+    if not valor:
+        return None
+    return {campo.strip() for campo in valor.split(',') if campo.strip()}
+
+
+def seleccion_campos(request):
+    """
+    Retorna (incluir, omitir) según la solicitud: incluir es None si no se
+    limitaron los campos. Solo aplica a lecturas.
+    """
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return None, set()
+    return _lista_param(request, PARAM_CAMPOS), _lista_param(request, PARAM_OMITIR) or set()
+
+
+def pide_compacto(request):
+    valor = request.query_params.get(PARAM_COMPACTO, '') if request is not None else ''
+    return valor.lower() in ('1', 'true', 'si', 'sí')
+
+
+class CamposDinamicosMixin:
+    """
+    Para ModelSerializers: aplica ?fields= / ?omit= de la solicitud del contexto.
+    Solo afecta al serializer raíz (o al hijo de un listado); los anidados
+    conservan todos sus campos.
+    """
+
+    def _es_raiz(self):
+        padre = self.parent
+        return padre is None or (getattr(padre, 'child', None) is self and padre.parent is None)
+
+    def _seleccion(self):
+        if not hasattr(self, '_seleccion_campos'):
+            if self._es_raiz():
+                self._seleccion_campos = seleccion_campos(self.context.get('request'))
+            else:
+                self._seleccion_campos = (None, set())
+        return self._seleccion_campos
+
+    def campo_solicitado(self, nombre):
+        incluir, omitir = self._seleccion()
+        return (incluir is None or nombre in incluir) and nombre not in omitir
+
+    def get_fields(self):
+        fields = super().get_fields()
+        incluir, omitir = self._seleccion()
+        if incluir is None and not omitir:
+            return fields
+        return {nombre: campo for nombre, campo in fields.items() if self.campo_solicitado(nombre)}
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        incluir, omitir = self._seleccion()
+        if incluir is None and not omitir:
+            return data
+        # Claves agregadas fuera de los campos declarados (p. ej. URLs de imágenes).
+        for clave in [clave for clave in data if not self.campo_solicitado(clave)]:
+            del data[clave]
+        return data
+
+
+def _rutas_select_related(arbol, prefijo=''):
+    rutas = []
+    for nombre, hijos in arbol.items():
+        ruta = f'{prefijo}{nombre}'
+        rutas.append(ruta)
+        rutas.extend(_rutas_select_related(hijos, f'{ruta}__'))
+    return rutas
+
+
+def _ruta_prefetch(lookup):
+    return getattr(lookup, 'prefetch_through', lookup)
+
+
+def podar_queryset(queryset, serializer, protegidos=()):
+    """
+    Ajusta el queryset a los campos que va a leer `serializer`: difiere las
+    columnas locales que ningún campo usa y quita los select_related y
+    prefetch_related que solo servían a campos descartados. Los campos en
+    `protegidos` (orden, cursor) se leen siempre.
+    """
+    modelo = queryset.model
+    usados = set()
+    for campo in serializer.fields.values():
+        if campo.write_only:
+            continue
+        if campo.source == '*':
+            # SerializerMethodField u otro campo sobre la instancia completa:
+            # no se puede saber qué lee.
+            return queryset
+        usados.add(campo.source.split('.')[0])
+
+    # Columnas que se leen para agregar claves fuera de los campos declarados.
+    if hasattr(serializer, 'columnas_representacion'):
+        usados.update(serializer.columnas_representacion())
+
+    diferir = [
+        field.name for field in modelo._meta.concrete_fields
+        if not field.primary_key
+        and field.name not in usados and field.attname not in usados
+        and field.name not in protegidos
+    ]
+    if diferir:
+        queryset = queryset.defer(*diferir)
+
+    select_related = queryset.query.select_related
+    if isinstance(select_related, dict):
+        conservar = [ruta for ruta in _rutas_select_related(select_related) if ruta.split('__')[0] in usados]
+        queryset = queryset.select_related(None)
+        if conservar:
+            queryset = queryset.select_related(*conservar)
+
+    prefetch = queryset._prefetch_related_lookups
+    if prefetch:
+        conservar = [lookup for lookup in prefetch if _ruta_prefetch(lookup).split('__')[0] in usados]
+        queryset = queryset.prefetch_related(None)
+        if conservar:
+            queryset = queryset.prefetch_related(*conservar)
+    return queryset
+
+
+class CamposDinamicosViewSetMixin:
+    """
+    Para ModelViewSets: poda el queryset de list/retrieve según ?fields= / ?omit=
+    y, en listados con ?compacto=true, usa `serializer_class_compacto` si la vista
+    lo define.
+    """
+    serializer_class_compacto = None
+
+    def get_serializer_class(self):
+        if self.serializer_class_compacto is not None and self.action == 'list' and pide_compacto(self.request):
+            return self.serializer_class_compacto
+        return super().get_serializer_class()
+
+    def _campos_protegidos(self, queryset):
+        nombres = list(getattr(self, 'cursor_ordering', ()) or ())
+        nombres += list(queryset.query.order_by or queryset.model._meta.ordering or ())
+        return {str(nombre).lstrip('-').split('__')[0] for nombre in nombres}
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        incluir, omitir = seleccion_campos(self.request)
+        if incluir is None and not omitir:
+            return queryset
+        return podar_queryset(queryset, self.get_serializer(), self._campos_protegidos(queryset))
@@ -0,0 +1,77 @@
+# cmms_api/catalogos.py
+# Registro en memoria de filas de referencia (estados y tipos de OT) que se buscan
+# por nombre en cada flujo que crea o completa órdenes de trabajo.
+#
+# Cada proceso resuelve cada nombre una sola vez; guardar o eliminar una fila del
+# modelo vacía su registro. Las instancias son compartidas: solo deben usarse
+# para asignar claves foráneas, no modificarse.
+
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import EstadosOrdenTrabajo, TiposMantenimientoOT
+
+# Campo con el nombre de cada catálogo.
+CAMPOS_NOMBRE = {
+    EstadosOrdenTrabajo: 'nombreestadoot',
+    TiposMantenimientoOT: 'nombretipomantenimientoot',
+}
+
+_registro = {modelo: {} for modelo in CAMPOS_NOMBRE}
+_lock = threading.Lock()
+
+
+def obtener_catalogo(modelo, nombre, descripcion=None):
+    """
+    Retorna la fila de `modelo` con el nombre indicado, creándola (con
+    `descripcion`) si no existe. Una fila recién creada se registra recién al
+    confirmar la transacción, para no retener una que se revierta.
+    """
+    registro = _registro[modelo]
+    fila = registro.get(nombre)
+    if fila is not None:
+        return fila
+
+    fila, creada = modelo.objects.get_or_create(
+        **{CAMPOS_NOMBRE[modelo]: nombre}, defaults={'descripcion': descripcion}
+    )
+
+    def registrar():
+        with _lock:
+            registro[nombre] = fila
+
+    if creada:
+        transaction.on_commit(registrar)
+    else:
+        registrar()
+    return fila
+
+
+def estado_ot(nombre, descripcion=None):
+    """ EstadosOrdenTrabajo por nombre ('Abierta', 'Completada', ...). """
+    return obtener_catalogo(EstadosOrdenTrabajo, nombre, descripcion)
+
+
+def tipo_mantenimiento_ot(nombre, descripcion=None):
+    """ TiposMantenimientoOT por nombre ('Correctivo', 'Preventivo', ...). """
+    return obtener_catalogo(TiposMantenimientoOT, nombre, descripcion)
+
+
+def limpiar_catalogos(*modelos):
+    """ Vacía el registro de los modelos indicados (de todos si no se indica). """
+    with _lock:
+        for modelo in modelos or CAMPOS_NOMBRE:
+            _registro[modelo].clear()
+
+
+def _catalogo_modificado(sender, **kwargs):
+    limpiar_catalogos(sender)
+    # Si la modificación se revierte, la fila registrada entretanto sería incorrecta.
+    transaction.on_commit(lambda: limpiar_catalogos(sender))
+
+
+for _modelo in CAMPOS_NOMBRE:
+    post_save.connect(_catalogo_modificado, sender=_modelo, dispatch_uid=f'cmms_api.catalogos:{_modelo._meta.label_lower}')
+    post_delete.connect(_catalogo_modificado, sender=_modelo, dispatch_uid=f'cmms_api.catalogos:{_modelo._meta.label_lower}')
@@ -0,0 +1,84 @@
+# cmms_api/condicional.py
+# GET condicional (ETag / If-None-Match) por versiones de modelos para los
+# ModelViewSet de la API.
+#
+# El ETag de list/retrieve se arma con las versiones de los tags de los modelos
+# que muestra la vista (ver cache.versionar_apps), sin ejecutar la consulta: si
+# coincide con If-None-Match se responde 304 de inmediato. Se calcula dentro de
+# la acción, es decir, después de que DRF autenticó la solicitud y verificó los
+# permisos de la vista. Con una caché por proceso las versiones expiran a los
+# CMMS_CACHE_TTL_LOCAL segundos, que acotan lo que otro worker puede tardar en
+# dejar de responder 304 tras una escritura.
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from rest_framework.authtoken.models import Token
+
+from .cache import tag_modelo, versiones_tags
+from .models import Roles, Usuarios
+
+# Cambios en estos modelos pueden alterar quién ve qué: forman parte de todo ETag.
+MODELOS_ACCESO = (Token, User, Usuarios, Roles)
+
+
+def modelos_vista(vista):
+    """
+    Modelos de los que depende list/retrieve de la vista: el de su queryset, los
+    de sus claves foráneas y los de `modelos_etag` (relaciones anidadas en el
+    serializer).
+    """
+    modelo = vista.queryset.model
+    relacionados = [
+        campo.related_model for campo in modelo._meta.concrete_fields
+        if campo.is_relation and campo.related_model is not None
+    ]
+    return {modelo, *relacionados, *getattr(vista, 'modelos_etag', ())}
+
+
+def etag_version(request, modelos):
+    """
+    ETag débil de una lectura según la solicitud y las versiones de los modelos,
+    o None si la caché no conserva las versiones (p. ej. DummyCache).
+    """
+    tags = sorted({tag_modelo(modelo) for modelo in (*modelos, *MODELOS_ACCESO)})
+    versiones = versiones_tags(tags)
+    if None in versiones:
+        return None
+    partes = [
+        request.get_full_path(),
+        request.META.get('HTTP_AUTHORIZATION', ''),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+        request.META.get('HTTP_ACCEPT', ''),
+        repr(versiones),
+    ]
+    return 'W/"%s"' % hashlib.md5('|'.join(partes).encode()).hexdigest()
+
+
+class ETagVersionMixin:
+    """
+    Para ModelViewSets: list y retrieve responden 304 sin consultar la base de
+    datos si el ETag por versiones coincide con If-None-Match. Si la caché no
+    guarda versiones se ejecutan siempre y ETagMiddleware usa el hash del contenido.
+    """
+    modelos_etag = ()
+
+    def list(self, request, *args, **kwargs):
+        return self._lectura_condicional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._lectura_condicional(super().retrieve, request, *args, **kwargs)
+
+    def _lectura_condicional(self, accion, request, *args, **kwargs):
+        etag = etag_version(request, modelos_vista(self))
+        if etag is None:
+            return accion(request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = accion(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Accept', 'Authorization', 'Cookie'))
+        return response
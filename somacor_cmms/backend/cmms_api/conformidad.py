@@ -0,0 +1,261 @@
+# cmms_api/conformidad.py
+# Mantenimiento del resumen diario de conformidad de checklists (ConformidadDiariaChecklist).
+
+import threading
+
+from django.db import transaction
+from django.db.models import Count, F, FilteredRelation, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidar_tags, tag_modelo
+from .models import ChecklistAnswer, ChecklistInstance, ChecklistItem, ConformidadDiariaChecklist
+
+CAMPOS_CONTADORES = (
+    'total_checklists', 'checklists_conformes', 'checklists_con_fallas',
+    'fallas_criticas', 'fallas_no_criticas',
+)
+
+
+def contadores_conformidad():
+    """
+    Agregados de conformidad sobre un queryset de ChecklistInstance anotado con la
+    relación filtrada 'malas' (ver agregar_conformidad). Sirve tanto para
+    annotate() como para aggregate().
+    """
+    falla_critica = Q(malas__item__es_critico=True)
+    return {
+        'total_checklists': Count('id_instance', distinct=True),
+        'checklists_con_fallas': Count('id_instance', distinct=True, filter=Q(malas__isnull=False)),
+        'checklists_con_fallas_criticas': Count('id_instance', distinct=True, filter=falla_critica),
+        'fallas_criticas': Count('malas', filter=falla_critica),
+        'fallas_no_criticas': Count('malas', filter=Q(malas__item__es_critico=False)),
+    }
+
+
+def agregar_conformidad(instancias):
+    """
+    Prepara un queryset de checklists para agregarlo con contadores_conformidad().
+    El join con las respuestas se limita a las malas (condición en el ON).
+    """
+    return instancias.annotate(
+        malas=FilteredRelation('answers', condition=Q(answers__estado='malo'))
+    ).order_by()
+
+
+def _contadores(fila):
+    """ Convierte una fila agregada en los valores de los campos del resumen. """
+    return {
+        'total_checklists': fila['total_checklists'],
+        'checklists_conformes': fila['total_checklists'] - fila['checklists_con_fallas_criticas'],
+        'checklists_con_fallas': fila['checklists_con_fallas'],
+        'fallas_criticas': fila['fallas_criticas'],
+        'fallas_no_criticas': fila['fallas_no_criticas'],
+    }
+
+
+def registrar_checklist(instance, respuestas):
+    """
+    Suma un checklist recién creado a su resumen diario y al contador de fallas
+    de sus ítems. `respuestas` son las
+    ChecklistAnswer ya creadas (con su item cargado), así que no se vuelve a
+    consultar la base de datos para contarlas. Los incrementos se hacen con F()
+    para que dos checklists simultáneos del mismo equipo y día no se pisen.
+    Como los UPDATE no envían post_save, se invalidan a mano los tags de caché.
+    """
+    malas = [r for r in respuestas if r.estado == 'malo']
+    criticas = sum(1 for r in malas if r.item.es_critico)
+    incrementos = {
+        'total_checklists': 1,
+        'checklists_conformes': 0 if criticas else 1,
+        'checklists_con_fallas': 1 if malas else 0,
+        'fallas_criticas': criticas,
+        'fallas_no_criticas': len(malas) - criticas,
+    }
+    if malas:
+        # Como cada checklist responde una vez cada ítem, basta sumar 1 a cada ítem malo.
+        ChecklistItem.objects.filter(id_item__in=[r.item_id for r in malas]).update(
+            total_fallas=F('total_fallas') + 1
+        )
+        invalidar_tags(tag_modelo(ChecklistItem))
+
+    clave = {
+        'equipo_id': instance.equipo_id,
+        'template_id': instance.template_id,
+        'fecha': instance.fecha_inspeccion,
+    }
+    sumar = {campo: F(campo) + valor for campo, valor in incrementos.items()}
+    # Lo habitual es que el resumen del día ya exista: basta un UPDATE.
+    if not ConformidadDiariaChecklist.objects.filter(**clave).update(**sumar):
+        _, creado = ConformidadDiariaChecklist.objects.get_or_create(**clave, defaults=incrementos)
+        if not creado:
+            # Otro checklist lo creó entre el UPDATE y el INSERT.
+            ConformidadDiariaChecklist.objects.filter(**clave).update(**sumar)
+    invalidar_tags(tag_modelo(ConformidadDiariaChecklist))
+
+
+def recalcular_conformidad(equipo_id, template_id, fecha):
+    """
+    Recalcula desde las respuestas el resumen de un equipo, plantilla y día.
+    Se usa cuando se editan o eliminan checklists o respuestas ya registrados.
+    """
+    with transaction.atomic():
+        resumen, _ = ConformidadDiariaChecklist.objects.select_for_update().get_or_create(
+            equipo_id=equipo_id, template_id=template_id, fecha=fecha
+        )
+        fila = agregar_conformidad(ChecklistInstance.objects.filter(
+            equipo_id=equipo_id, template_id=template_id, fecha_inspeccion=fecha
+        )).aggregate(**contadores_conformidad())
+        if not fila['total_checklists']:
+            resumen.delete()
+            return
+        for campo, valor in _contadores(fila).items():
+            setattr(resumen, campo, valor)
+        resumen.save(update_fields=CAMPOS_CONTADORES)
+
+
+def recalcular_fallas_items(items=None):
+    """
+    Recalcula ChecklistItem.total_fallas de los ítems indicados (todos si es None)
+    con un solo UPDATE con subconsulta.
+    """
+    fallas = ChecklistAnswer.objects.filter(
+        item=OuterRef('pk'), estado='malo'
+    ).order_by().values('item').annotate(total=Count('pk')).values('total')
+    queryset = ChecklistItem.objects.all()
+    if items is not None:
+        queryset = queryset.filter(pk__in=items)
+    actualizados = queryset.update(total_fallas=Coalesce(Subquery(fallas), 0))
+    invalidar_tags(tag_modelo(ChecklistItem))
+    return actualizados
+
+
+def reconstruir_conformidad(desde=None, hasta=None, batch_size=1000):
+    """
+    Borra y vuelve a generar los resúmenes del rango de fechas indicado (todo el
+    historial si no se indica) con una sola consulta agrupada. Retorna la cantidad
+    de resúmenes creados.
+    """
+    instancias = ChecklistInstance.objects.all()
+    resumenes = ConformidadDiariaChecklist.objects.all()
+    if desde:
+        instancias = instancias.filter(fecha_inspeccion__gte=desde)
+        resumenes = resumenes.filter(fecha__gte=desde)
+    if hasta:
+        instancias = instancias.filter(fecha_inspeccion__lte=hasta)
+        resumenes = resumenes.filter(fecha__lte=hasta)
+
+    filas = agregar_conformidad(instancias).values(
+        'equipo_id', 'template_id', 'fecha_inspeccion'
+    ).annotate(**contadores_conformidad())
+    nuevos = [
+        ConformidadDiariaChecklist(
+            equipo_id=fila['equipo_id'], template_id=fila['template_id'],
+            fecha=fila['fecha_inspeccion'], **_contadores(fila)
+        )
+        for fila in filas
+    ]
+    with transaction.atomic():
+        resumenes.delete()
+        ConformidadDiariaChecklist.objects.bulk_create(nuevos, batch_size=batch_size)
+    invalidar_tags(tag_modelo(ConformidadDiariaChecklist))
+    return len(nuevos)
+
+
+# --- Invalidación por ediciones fuera de completar_checklist ---
+# Dentro de una transacción, los días afectados se acumulan en un lote que se
+# recalcula una sola vez al confirmarla: eliminar un checklist con 90 respuestas
+# dispara 91 señales, pero un solo recálculo.
+
+_local = threading.local()
+
+
+class _LoteRecalculo:
+    def __init__(self, conexion):
+        # La lista de hooks on_commit se reemplaza al confirmar o revertir; si ya
+        # no es la misma, el lote quedó de una transacción terminada.
+        self.hooks = conexion.run_on_commit
+        self.claves = set()
+        self.items = set()
+        self.por_instancia = {}
+
+    def ejecutar(self):
+        if getattr(_local, 'lote', None) is self:
+            _local.lote = None
+        for clave in self.claves:
+            recalcular_conformidad(*clave)
+        if self.items:
+            recalcular_fallas_items(self.items)
+
+
+def _lote_actual():
+    """ Lote de la transacción en curso, o None si no hay transacción. """
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        return None
+    lote = getattr(_local, 'lote', None)
+    if lote is None or lote.hooks is not conexion.run_on_commit:
+        lote = _local.lote = _LoteRecalculo(conexion)
+        transaction.on_commit(lote.ejecutar)
+    return lote
+
+
+def _marcar(clave, instance_id=None, item_id=None):
+    lote = _lote_actual()
+    if lote is None:
+        recalcular_conformidad(*clave)
+        if item_id is not None:
+            recalcular_fallas_items([item_id])
+        return
+    lote.claves.add(clave)
+    if instance_id is not None:
+        lote.por_instancia[instance_id] = clave
+    if item_id is not None:
+        lote.items.add(item_id)
+
+
+def _clave(instance):
+    return (instance.equipo_id, instance.template_id, instance.fecha_inspeccion)
+
+
+@receiver(pre_save, sender=ChecklistInstance)
+def recordar_clave_anterior(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    anterior = sender.objects.filter(pk=instance.pk).values_list(
+        'equipo_id', 'template_id', 'fecha_inspeccion'
+    ).first()
+    instance._clave_conformidad_anterior = anterior
+
+
+@receiver(post_save, sender=ChecklistInstance)
+def checklist_modificado(sender, instance, created, raw=False, **kwargs):
+    # Los checklists nuevos los suma registrar_checklist al crear sus respuestas.
+    if raw or created:
+        return
+    anterior = getattr(instance, '_clave_conformidad_anterior', None)
+    if anterior and tuple(anterior) != _clave(instance):
+        _marcar(tuple(anterior))
+    _marcar(_clave(instance), instance.pk)
+
+
+@receiver(post_delete, sender=ChecklistInstance)
+def checklist_eliminado(sender, instance, **kwargs):
+    _marcar(_clave(instance), instance.pk)
+
+
+@receiver(post_save, sender=ChecklistAnswer)
+@receiver(post_delete, sender=ChecklistAnswer)
+def respuesta_modificada(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    lote = _lote_actual()
+    clave = lote.por_instancia.get(instance.instance_id) if lote else None
+    if clave is None:
+        clave = ChecklistInstance.objects.filter(pk=instance.instance_id).values_list(
+            'equipo_id', 'template_id', 'fecha_inspeccion'
+        ).first()
+        if clave is None:
+            return
+    _marcar(tuple(clave), instance.instance_id, instance.item_id)
@@ -0,0 +1,102 @@
+# cmms_api/dashboard.py
+# KPIs del dashboard de mantenimiento, calculados en pocas consultas agrupadas y
+# servidos desde una instantánea en caché.
+
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .cache import invalidar_al_modificar, obtener_o_calcular, tag_modelo
+from .models import Agendas, Equipos, EstadosEquipo, OrdenesTrabajo, TiposMantenimientoOT
+
+ESTADOS_OT_ABIERTAS = ['Abierta', 'Asignada']
+
+# La instantánea se invalida al guardar o eliminar OTs, equipos o eventos de agenda.
+MODELOS_DASHBOARD = (OrdenesTrabajo, Equipos, Agendas)
+TAGS_DASHBOARD = tuple(tag_modelo(modelo) for modelo in MODELOS_DASHBOARD)
+invalidar_al_modificar(*MODELOS_DASHBOARD)
+
+
+def ttl_dashboard():
+    """ Segundos que dura la instantánea (y el max-age que se informa al cliente). """
+    return getattr(settings, 'CMMS_DASHBOARD_TTL', 30)
+
+
+def rango_dias(desde, dias, campo):
+    """
+    Filtro equivalente a `campo__date` entre `desde` y `desde + dias - 1` en la
+    zona horaria actual, expresado como rango sobre la columna.
+    """
+    inicio = timezone.make_aware(datetime.datetime.combine(desde, datetime.time.min))
+    fin = timezone.make_aware(datetime.datetime.combine(desde + datetime.timedelta(days=dias), datetime.time.min))
+    return {f'{campo}__gte': inicio, f'{campo}__lt': fin}
+
+
+def calcular_kpis(hoy=None):
+    """
+    Calcula los KPIs del dashboard con tres consultas: equipos agrupados por
+    estado, OTs agrupadas por tipo (con conteos condicionales de abiertas y
+    vencidas) y mantenimientos próximos.
+    """
+    hoy = hoy or timezone.now().date()
+
+    estados = list(EstadosEquipo.objects.annotate(
+        cantidad=Count('equipos'),
+        activos=Count('equipos', filter=Q(equipos__activo=True)),
+    ).order_by('nombreestado').values('nombreestado', 'cantidad', 'activos'))
+
+    ot_abierta = Q(ordenestrabajo__idestadoot__nombreestadoot__in=ESTADOS_OT_ABIERTAS)
+    tipos = list(TiposMantenimientoOT.objects.annotate(
+        cantidad=Count('ordenestrabajo'),
+        abiertas=Count('ordenestrabajo', filter=ot_abierta),
+        vencidas=Count('ordenestrabajo', filter=ot_abierta & Q(ordenestrabajo__fechaejecucion__lt=hoy)),
+    ).order_by('nombretipomantenimientoot').values('nombretipomantenimientoot', 'cantidad', 'abiertas', 'vencidas'))
+
+    # Mantenimientos próximos (próximos 7 días). Se compara contra límites de
+    # fecha-hora, no con __date, para que se use el índice (tipoevento, fechahorainicio).
+    mantenimientos_proximos = Agendas.objects.filter(
+        tipoevento='Mantenimiento Preventivo',
+        **rango_dias(hoy, 8, 'fechahorainicio')
+    ).count()
+
+    return {
+        'estadisticas_generales': {
+            'total_equipos': sum(estado['activos'] for estado in estados),
+            'equipos_operativos': sum(estado['activos'] for estado in estados if estado['nombreestado'] == 'Operativo'),
+            'ots_abiertas': sum(tipo['abiertas'] for tipo in tipos),
+            'ots_vencidas': sum(tipo['vencidas'] for tipo in tipos),
+            'mantenimientos_proximos': mantenimientos_proximos
+        },
+        'equipos_por_estado': [
+            {'nombreestado': estado['nombreestado'], 'cantidad': estado['cantidad']} for estado in estados
+        ],
+        'ots_por_tipo': [
+            {'nombretipomantenimientoot': tipo['nombretipomantenimientoot'], 'cantidad': tipo['cantidad']} for tipo in tipos
+        ],
+    }
+
+
+def obtener_snapshot_dashboard():
+    """
+    Retorna {'fecha', 'etag', 'datos'} desde la caché, recalculándola si expiró o
+    se invalidó. La clave incluye la fecha porque las OTs vencidas dependen de ella.
+    """
+    hoy = timezone.now().date()
+
+    def calcular():
+        datos = calcular_kpis(hoy)
+        contenido = json.dumps(datos, sort_keys=True, default=str).encode()
+        return {
+            'fecha': hoy,
+            'etag': '"%s"' % hashlib.md5(contenido).hexdigest(),
+            'datos': datos,
+        }
+
+    return obtener_o_calcular(
+        f'cmms_api:dashboard:kpis:{hoy.isoformat()}', calcular,
+        ttl=ttl_dashboard(), tags=TAGS_DASHBOARD
+    )
@@ -0,0 +1,98 @@
+# cmms_api/horometros.py
+# Historial de lecturas de horómetro y estimación de la tasa de uso de cada equipo.
+#
+# Las lecturas se guardan en HistorialHorometros (solo se agregan). Cada lectura
+# más reciente que la última conocida actualiza en el equipo el horómetro actual
+# y la tasa de uso diaria: un promedio móvil exponencial de las horas por día
+# entre lecturas consecutivas, que ponderado por el tiempo transcurrido olvida el
+# uso antiguo en unos CMMS_HOROMETRO_EWMA_DIAS días.
+
+import math
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import invalidar_tags, tag_modelo
+from .models import Equipos, HistorialHorometros
+
+# Un equipo no puede operar más de 24 horas por día: las muestras mayores son errores.
+MAX_HORAS_DIA = 24
+
+
+def dias_ewma():
+    return getattr(settings, 'CMMS_HOROMETRO_EWMA_DIAS', 7)
+
+
+def actualizar_tasa(tasa, horometro, fecha, nuevo_horometro, nueva_fecha, tau=None):
+    """
+    Tasa de uso (horas/día) tras una nueva lectura. Los retrocesos del horómetro
+    (cambio o reinicio del instrumento) no aportan muestra.
+    """
+    dias = (nueva_fecha - fecha).total_seconds() / 86400
+    if dias <= 0 or nuevo_horometro < horometro:
+        return tasa
+    muestra = min((nuevo_horometro - horometro) / dias, MAX_HORAS_DIA)
+    if tasa is None:
+        return muestra
+    alfa = 1 - math.exp(-dias / (tau or dias_ewma()))
+    return tasa + alfa * (muestra - tasa)
+
+
+def registrar_lecturas(lecturas):
+    """
+    Guarda las lecturas (equipo_id, fecha, horometro) y actualiza el horómetro y
+    la tasa de uso de sus equipos: una consulta para los equipos (bloqueados
+    hasta el final de la transacción), otra para las lecturas ya registradas, un
+    bulk_create y un bulk_update. Repetir una lectura no tiene efecto; las
+    anteriores a la última del equipo solo se agregan al historial.
+    Retorna {'registradas': n, 'equipos_actualizados': m}.
+    """
+    # Una lectura por equipo e instante (la última recibida)
+    lecturas = sorted((equipo_id, fecha, horometro) for (equipo_id, fecha), horometro in {
+        (equipo_id, fecha): horometro for equipo_id, fecha, horometro in lecturas
+    }.items())
+    if not lecturas:
+        return {'registradas': 0, 'equipos_actualizados': 0}
+
+    with transaction.atomic():
+        equipos = Equipos.objects.select_for_update().only(
+            'idequipo', 'horometroactual', 'fechahorometro', 'tasausodiaria'
+        ).in_bulk({equipo_id for equipo_id, _, _ in lecturas})
+        fechas = [fecha for _, fecha, _ in lecturas]
+        existentes = set(HistorialHorometros.objects.filter(
+            idequipo__in=list(equipos), fechalectura__range=(min(fechas), max(fechas))
+        ).order_by().values_list('idequipo', 'fechalectura'))
+
+        nuevas = [
+            HistorialHorometros(idequipo_id=equipo_id, fechalectura=fecha, horometro=horometro)
+            for equipo_id, fecha, horometro in lecturas
+            if equipo_id in equipos and (equipo_id, fecha) not in existentes
+        ]
+        HistorialHorometros.objects.bulk_create(nuevas, batch_size=1000, ignore_conflicts=True)
+
+        actualizados = []
+        for equipo_id, suyas in groupby(nuevas, key=lambda lectura: lectura.idequipo_id):
+            equipo = equipos[equipo_id]
+            modificado = False
+            for lectura in suyas:
+                if equipo.fechahorometro is not None and lectura.fechalectura <= equipo.fechahorometro:
+                    continue
+                if equipo.fechahorometro is not None:
+                    equipo.tasausodiaria = actualizar_tasa(
+                        equipo.tasausodiaria, equipo.horometroactual, equipo.fechahorometro,
+                        lectura.horometro, lectura.fechalectura
+                    )
+                equipo.horometroactual = lectura.horometro
+                equipo.fechahorometro = lectura.fechalectura
+                modificado = True
+            if modificado:
+                actualizados.append(equipo)
+        Equipos.objects.bulk_update(
+            actualizados, ['horometroactual', 'fechahorometro', 'tasausodiaria'], batch_size=500
+        )
+
+        # Las escrituras masivas no envían señales.
+        if nuevas:
+            invalidar_tags(tag_modelo(Equipos), tag_modelo(HistorialHorometros))
+    return {'registradas': len(nuevas), 'equipos_actualizados': len(actualizados)}
@@ -0,0 +1,98 @@
+# cmms_api/imagenes.py
+# Procesamiento de las fotos de evidencia antes de guardarlas en el blob store.
+
+from io import BytesIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .blob_store import get_blob_store
+
+# Lado mayor máximo (px) y tamaño máximo (bytes) de la imagen "original" que se conserva.
+LADO_MAXIMO_ORIGINAL = 2048
+PRESUPUESTO_ORIGINAL_BYTES = 600 * 1024
+
+# Derivados que se generan al subir una imagen: nombre -> lado mayor en px.
+DERIVADOS = {
+    'medio': 1024,
+    'miniatura': 256,
+}
+
+CALIDADES_JPEG = (85, 75, 65, 55)
+
+
+def _reducir(imagen, lado):
+    copia = imagen.copy()
+    copia.thumbnail((lado, lado), Image.LANCZOS)
+    return copia
+
+
+def _codificar_jpeg(imagen, presupuesto=None):
+    """
+    Codifica como JPEG progresivo (sin EXIF). Si hay presupuesto, baja la
+    calidad y luego la resolución hasta que la imagen quepa en él.
+    """
+    while True:
+        for calidad in CALIDADES_JPEG:
+            buffer = BytesIO()
+            imagen.save(buffer, format='JPEG', quality=calidad, optimize=True, progressive=True)
+            if presupuesto is None or buffer.tell() <= presupuesto:
+                return buffer.getvalue()
+        if max(imagen.size) <= DERIVADOS['miniatura']:
+            return buffer.getvalue()
+        imagen = _reducir(imagen, int(max(imagen.size) * 0.75))
+
+
+def _como_archivo(data):
+    """ Acepta bytes o un archivo abierto (p. ej. un upload ya escrito a disco). """
+    if isinstance(data, (bytes, bytearray)):
+        return BytesIO(data)
+    data.seek(0)
+    return data
+
+
+def procesar_imagen(data):
+    """
+    Normaliza una foto (orientación según EXIF, RGB, sin metadatos) y genera sus
+    derivados. Retorna {'original': bytes, 'medio': bytes, 'miniatura': bytes},
+    o None si el contenido no es una imagen que Pillow pueda leer.
+    `data` puede ser bytes o un archivo abierto en modo binario.
+    """
+    try:
+        imagen = Image.open(_como_archivo(data))
+        # En JPEG, decodifica directamente a la escala más cercana a la final:
+        # una foto de 12 MP no llega a ocupar su tamaño completo en memoria.
+        imagen.draft('RGB', (LADO_MAXIMO_ORIGINAL, LADO_MAXIMO_ORIGINAL))
+        imagen.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode in ('RGBA', 'LA', 'P'):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.getchannel('A'))
+        imagen = fondo
+    elif imagen.mode != 'RGB':
+        imagen = imagen.convert('RGB')
+
+    resultado = {
+        'original': _codificar_jpeg(_reducir(imagen, LADO_MAXIMO_ORIGINAL), PRESUPUESTO_ORIGINAL_BYTES)
+    }
+    for nombre, lado in DERIVADOS.items():
+        resultado[nombre] = _codificar_jpeg(_reducir(imagen, lado))
+    return resultado
+
+
+def guardar_imagen(data, store=None):
+    """
+    Procesa la imagen y guarda original y derivados en el blob store.
+    Retorna un dict nombre -> clave; si el contenido no es una imagen se
+    guarda tal cual y solo se retorna la clave 'original'.
+    """
+    store = store or get_blob_store()
+    versiones = procesar_imagen(data)
+    if versiones is None:
+        if isinstance(data, (bytes, bytearray)):
+            return {'original': store.save(data)}
+        return {'original': store.save_file(data)}
+    return {nombre: store.save(contenido) for nombre, contenido in versiones.items()}
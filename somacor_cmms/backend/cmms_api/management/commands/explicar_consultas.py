@@ -0,0 +1,80 @@
+# cmms_api/management/commands/explicar_consultas.py
+
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from cmms_api.dashboard import rango_dias
+from cmms_api.models import Agendas, ChecklistAnswer, ChecklistInstance, OrdenesTrabajo
+
+# Fragmentos del plan que indican acceso por índice en SQLite, PostgreSQL y MySQL.
+PATRON_INDICE = re.compile(
+    r'USING (COVERING )?INDEX|USING INTEGER PRIMARY KEY|INDEX (ONLY )?SCAN|BITMAP INDEX SCAN|\bref\b|\brange\b',
+    re.IGNORECASE,
+)
+# Recorridos completos de una tabla (en SQLite, SCAN aunque sea sobre un índice
+# usado solo para ordenar; SEARCH es una búsqueda por índice).
+PATRON_RECORRIDO = re.compile(r'\bSCAN \w+(?! USING (COVERING )?INDEX \w+ \()|Seq Scan|\bALL\b')
+
+
+def usa_indice(plan):
+    return bool(PATRON_INDICE.search(plan)) and not PATRON_RECORRIDO.search(plan)
+
+
+def consultas_frecuentes():
+    """
+    Consultas de los endpoints más usados, con valores de ejemplo. Retorna
+    una lista de (nombre, queryset).
+    """
+    hoy = timezone.now().date()
+    return [
+        ('OTs abiertas vencidas (dashboard)',
+         OrdenesTrabajo.objects.filter(idestadoot=1, fechaejecucion__lt=hoy)),
+        ('OTs pendientes por fecha de ejecución',
+         OrdenesTrabajo.objects.filter(fechacompletado__isnull=True, fechaejecucion__lte=hoy).order_by('fechaejecucion')),
+        ('Historial de OTs de un equipo',
+         OrdenesTrabajo.objects.filter(idequipo=1).order_by('-fechacreacionot')),
+        ('Agenda de un plan para un equipo',
+         Agendas.objects.filter(idequipo=1, idplanmantenimiento=1, fechahorainicio__gte=timezone.now())),
+        ('Mantenimientos preventivos próximos (dashboard)',
+         Agendas.objects.filter(tipoevento='Mantenimiento Preventivo', **rango_dias(hoy, 8, 'fechahorainicio'))),
+        ('Historial de checklists de un equipo',
+         ChecklistInstance.objects.filter(equipo=1, fecha_inspeccion__gte=hoy)),
+        ('Respuestas malas de un ítem',
+         ChecklistAnswer.objects.filter(estado='malo', item=1)),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta EXPLAIN sobre las consultas frecuentes de la API e informa si usan un índice'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--plan',
+            action='store_true',
+            help='Muestra el plan completo de cada consulta'
+        )
+        parser.add_argument(
+            '--estricto',
+            action='store_true',
+            help='Termina con error si alguna consulta no usa un índice'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Motor: {connection.vendor}')
+        sin_indice = []
+        for nombre, queryset in consultas_frecuentes():
+            plan = queryset.explain()
+            if usa_indice(plan):
+                self.stdout.write(self.style.SUCCESS(f'[índice]     {nombre}'))
+            else:
+                sin_indice.append(nombre)
+                self.stdout.write(self.style.WARNING(f'[sin índice] {nombre}'))
+            if options['plan']:
+                for linea in plan.splitlines():
+                    self.stdout.write(f'    {linea}')
+
+        if sin_indice and options['estricto']:
+            raise CommandError(f'{len(sin_indice)} consultas no usan índices: {", ".join(sin_indice)}')
@@ -1,13 +1,15 @@
 # cmms_api/management/commands/generar_agenda_preventiva.py
 
+from collections import defaultdict
+
 from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
 from django.utils import timezone
 from django.contrib.auth.models import User
-from cmms_api.models import (
-    PlanesMantenimiento, DetallesPlanMantenimiento, 
-    Equipos, Agendas, TiposEquipo
+from cmms_api.agenda import (
+    DURACION_EVENTO_DEFECTO, equipos_con_horometro, evento_plan, insertar_faltantes, vencimientos
 )
-import datetime
+from cmms_api.models import PlanesMantenimiento, DetallesPlanMantenimiento, Equipos
 
 class Command(BaseCommand):
     help = 'Genera agenda de mantenimiento preventivo basada en planes y horometros de equipos'
@@ -30,11 +32,18 @@ class Command(BaseCommand):
             default=8,
             help='Horas de operación diarias estimadas (default: 8)'
         )
+        parser.add_argument(
+            '--tamano-lote',
+            type=int,
+            default=500,
+            help='Equipos por lote al comparar con la agenda existente (default: 500)'
+        )
 
     def handle(self, *args, **options):
         tipo_equipo_id = options['tipo_equipo']
         dias_adelante = options['dias_adelante']
         horas_diarias = options['horas_diarias']
+        tamano_lote = max(1, options['tamano_lote'])
         
         self.stdout.write(
             self.style.SUCCESS(
@@ -47,100 +56,47 @@ class Command(BaseCommand):
         if tipo_equipo_id:
             equipos_query = equipos_query.filter(idtipoequipo_id=tipo_equipo_id)
 
+        equipos_por_tipo = defaultdict(list)
+        for equipo in equipos_con_horometro(equipos_query):
+            equipos_por_tipo[equipo.idtipoequipo_id].append(equipo)
+
         eventos_creados = 0
         usuario_sistema = User.objects.first()  # Usuario por defecto para crear eventos
-
-        for equipo in equipos_query:
-            self.stdout.write(f'Procesando equipo: {equipo.nombreequipo}')
-            
-            # Obtener planes de mantenimiento para este tipo de equipo
-            planes = PlanesMantenimiento.objects.filter(
-                idtipoequipo=equipo.idtipoequipo,
-                activo=True
-            )
-
-            for plan in planes:
-                detalles = DetallesPlanMantenimiento.objects.filter(
-                    idplanmantenimiento=plan,
-                    activo=True
-                ).order_by('intervalohorasoperacion')
-
-                for detalle in detalles:
-                    # Calcular próximas fechas de mantenimiento
-                    eventos_generados = self._generar_eventos_para_detalle(
-                        equipo, plan, detalle, dias_adelante, horas_diarias, usuario_sistema
-                    )
-                    eventos_creados += eventos_generados
+        hoy = timezone.now().date()
+
+        # Planes de mantenimiento de los tipos de equipo involucrados, con sus detalles
+        planes = PlanesMantenimiento.objects.filter(
+            idtipoequipo_id__in=equipos_por_tipo,
+            activo=True
+        ).prefetch_related(Prefetch(
+            'detallesplanmantenimiento_set',
+            queryset=DetallesPlanMantenimiento.objects.filter(activo=True).select_related(
+                'idtareaestandar'
+            ).order_by('intervalohorasoperacion'),
+            to_attr='detalles_activos'
+        ))
+
+        for plan in planes:
+            equipos = equipos_por_tipo[plan.idtipoequipo_id]
+            self.stdout.write(f'Procesando plan: {plan.nombreplan} ({len(equipos)} equipos)')
+
+            # Por lotes de equipos: proyección en memoria, una consulta de
+            # eventos existentes y la inserción de los que faltan
+            for inicio in range(0, len(equipos), tamano_lote):
+                proyeccion = vencimientos(
+                    equipos[inicio:inicio + tamano_lote], plan.detalles_activos, hoy,
+                    horizonte_dias=dias_adelante,
+                    horas_diarias=horas_diarias,
+                    duracion_defecto=DURACION_EVENTO_DEFECTO
+                )
+                eventos = [
+                    evento_plan(equipo, plan, detalle, fecha, horometro, minutos, usuario_sistema)
+                    for equipo, detalle, fecha, horometro, minutos in proyeccion
+                ]
+                eventos_creados += len(insertar_faltantes(eventos))
 
         self.stdout.write(
             self.style.SUCCESS(
                 f'Agenda generada exitosamente. {eventos_creados} eventos creados.'
             )
         )
-
-    def _generar_eventos_para_detalle(self, equipo, plan, detalle, dias_adelante, horas_diarias, usuario):
-        """
-        Genera eventos de agenda para un detalle específico del plan de mantenimiento
-        """
-        eventos_creados = 0
-        horometro_actual = equipo.horometroactual
-        intervalo = detalle.intervalohorasoperacion
-        
-        # Calcular el próximo mantenimiento
-        horas_desde_ultimo = horometro_actual % intervalo
-        horas_hasta_proximo = intervalo - horas_desde_ultimo
-        
-        # Si ya es tiempo de mantenimiento
-        if horas_hasta_proximo == intervalo:
-            horas_hasta_proximo = 0
-
-        fecha_actual = timezone.now().date()
-        fecha_limite = fecha_actual + datetime.timedelta(days=dias_adelante)
-
-        # Generar eventos dentro del período especificado
-        while True:
-            # Calcular fecha estimada del mantenimiento
-            dias_estimados = horas_hasta_proximo / horas_diarias
-            fecha_mantenimiento = fecha_actual + datetime.timedelta(days=int(dias_estimados))
-            
-            if fecha_mantenimiento > fecha_limite:
-                break
-
-            # Verificar si ya existe un evento similar en esa fecha
-            evento_existente = Agendas.objects.filter(
-                idequipo=equipo,
-                idplanmantenimiento=plan,
-                fechahorainicio__date=fecha_mantenimiento,
-                tituloevento__icontains=detalle.idtareaestandar.nombretarea
-            ).exists()
-
-            if not evento_existente:
-                # Crear evento de agenda
-                hora_inicio = datetime.time(8, 0)  # 8:00 AM por defecto
-                fecha_hora_inicio = datetime.datetime.combine(fecha_mantenimiento, hora_inicio)
-                fecha_hora_fin = fecha_hora_inicio + datetime.timedelta(
-                    minutes=detalle.idtareaestandar.tiempoestimadominutos or 60
-                )
-
-                Agendas.objects.create(
-                    tituloevento=f"Mantenimiento {detalle.idtareaestandar.nombretarea} - {equipo.nombreequipo}",
-                    fechahorainicio=fecha_hora_inicio,
-                    fechahorafin=fecha_hora_fin,
-                    descripcionevento=(
-                        f"Mantenimiento preventivo programado cada {intervalo} horas. "
-                        f"Horometro estimado: {horometro_actual + horas_hasta_proximo}h"
-                    ),
-                    tipoevento="Mantenimiento Preventivo",
-                    colorevento="#28a745" if not detalle.escritic else "#dc3545",
-                    idequipo=equipo,
-                    idplanmantenimiento=plan,
-                    idusuariocreador=usuario
-                )
-                eventos_creados += 1
-
-            # Preparar para el siguiente mantenimiento
-            horas_hasta_proximo += intervalo
-            horometro_actual += intervalo
-
-        return eventos_creados
-
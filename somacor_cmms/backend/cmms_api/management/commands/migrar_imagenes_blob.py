@@ -0,0 +1,108 @@
+# cmms_api/management/commands/migrar_imagenes_blob.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from cmms_api.blob_store import get_blob_store, decodificar_base64, BlobNoEncontrado
+from cmms_api.cache import invalidar_tags, tag_modelo
+from cmms_api.imagenes import guardar_imagen, DERIVADOS
+from cmms_api.models import ChecklistImage, EvidenciaOT, ChecklistInstance
+from cmms_api.serializers import campo_derivado
+
+# (modelo, campo base64, campo con la clave del blob)
+CAMPOS_A_MIGRAR = [
+    (ChecklistImage, 'imagen_base64', 'imagen_blob'),
+    (EvidenciaOT, 'imagen_base64', 'imagen_blob'),
+    (ChecklistInstance, 'imagen_evidencia', 'imagen_evidencia_blob'),
+]
+
+VERSIONES = ('original',) + tuple(DERIVADOS)
+
+class Command(BaseCommand):
+    help = 'Mueve las imágenes base64 guardadas en la base de datos al blob store y genera sus derivados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Cantidad de filas leídas por lote (default: 100)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa cuántas filas se migrarían'
+        )
+        parser.add_argument(
+            '--solo-derivados',
+            action='store_true',
+            help='Genera miniatura y versión media para imágenes que ya están en el blob store pero no los tienen'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        solo_derivados = options['solo_derivados']
+
+        for modelo, campo, campo_blob in CAMPOS_A_MIGRAR:
+            campo_miniatura = campo_derivado(campo_blob, 'miniatura', '_blob')
+            if solo_derivados:
+                pendientes = modelo.objects.exclude(**{campo_blob: ''}).filter(**{campo_miniatura: ''})
+                campo_origen = campo_blob
+            else:
+                pendientes = modelo.objects.filter(**{campo_blob: ''}).exclude(**{f'{campo}__isnull': True}).exclude(**{campo: ''})
+                campo_origen = campo
+            nombre = f'{modelo.__name__}.{campo}'
+
+            if dry_run:
+                self.stdout.write(f'{nombre}: {pendientes.count()} filas por procesar')
+                continue
+
+            migradas, invalidas = self._migrar(modelo, pendientes, campo, campo_blob, campo_origen, batch_size)
+            self.stdout.write(self.style.SUCCESS(f'{nombre}: {migradas} imágenes procesadas'))
+            if invalidas:
+                self.stdout.write(self.style.WARNING(f'{nombre}: {invalidas} filas con imagen inválida se dejaron intactas'))
+
+    def _leer_imagen(self, fila, campo_origen, campo_blob):
+        if campo_origen == campo_blob:
+            with get_blob_store().open(getattr(fila, campo_blob)) as archivo:
+                return archivo.read()
+        return decodificar_base64(getattr(fila, campo_origen))
+
+    def _migrar(self, modelo, pendientes, campo, campo_blob, campo_origen, batch_size):
+        """
+        Recorre las filas por lotes ordenados por PK (keyset), de modo que en
+        memoria nunca hay más de `batch_size` imágenes a la vez.
+        """
+        pk_name = modelo._meta.pk.name
+        campos_actualizados = [campo] + [campo_derivado(campo_blob, version, '_blob') for version in VERSIONES]
+        ultimo_pk = None
+        migradas = invalidas = 0
+
+        while True:
+            lote_qs = pendientes.order_by(pk_name)
+            if ultimo_pk is not None:
+                lote_qs = lote_qs.filter(**{f'{pk_name}__gt': ultimo_pk})
+            lote = list(lote_qs.only(pk_name, campo_origen)[:batch_size])
+            if not lote:
+                break
+            ultimo_pk = lote[-1].pk
+
+            actualizadas = []
+            for fila in lote:
+                try:
+                    claves = guardar_imagen(self._leer_imagen(fila, campo_origen, campo_blob))
+                except (ValueError, BlobNoEncontrado):
+                    invalidas += 1
+                    continue
+                for version in VERSIONES:
+                    setattr(fila, campo_derivado(campo_blob, version, '_blob'), claves.get(version, ''))
+                setattr(fila, campo, '')
+                actualizadas.append(fila)
+
+            with transaction.atomic():
+                modelo.objects.bulk_update(actualizadas, campos_actualizados)
+            # bulk_update no envía post_save.
+            invalidar_tags(tag_modelo(modelo))
+            migradas += len(actualizadas)
+
+        return migradas, invalidas
@@ -4,9 +4,9 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.db import transaction
+from cmms_api.catalogos import estado_ot, tipo_mantenimiento_ot
 from cmms_api.models import (
-    OrdenesTrabajo, ActividadesOrdenTrabajo, Equipos, 
-    EstadosOrdenTrabajo, TiposMantenimientoOT, Agendas
+    OrdenesTrabajo, ActividadesOrdenTrabajo, Equipos, Agendas
 )
 import datetime
 
@@ -71,15 +71,8 @@ class Command(BaseCommand):
         try:
             with transaction.atomic():
                 # Obtener estados y tipos necesarios
-                estado_abierta = EstadosOrdenTrabajo.objects.get_or_create(
-                    nombreestadoot='Abierta',
-                    defaults={'descripcion': 'OT recién creada'}
-                )[0]
-                
-                tipo_preventivo = TiposMantenimientoOT.objects.get_or_create(
-                    nombretipomantenimientoot='Preventivo',
-                    defaults={'descripcion': 'Mantenimiento planificado'}
-                )[0]
+                estado_abierta = estado_ot('Abierta', 'OT recién creada')
+                tipo_preventivo = tipo_mantenimiento_ot('Preventivo', 'Mantenimiento planificado')
                 
                 # Usuario sistema para crear la OT
                 usuario_sistema = User.objects.first()
@@ -0,0 +1,46 @@
+# cmms_api/management/commands/reconstruir_conformidad_checklist.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from cmms_api.conformidad import reconstruir_conformidad, recalcular_fallas_items
+
+class Command(BaseCommand):
+    help = ('Reconstruye el resumen diario de conformidad de checklists a partir de las respuestas; '
+            'sin rango de fechas también recalcula el contador de fallas de cada ítem')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            help='Fecha inicial (YYYY-MM-DD). Por defecto, todo el historial'
+        )
+        parser.add_argument(
+            '--hasta',
+            help='Fecha final (YYYY-MM-DD). Por defecto, todo el historial'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Cantidad de resúmenes insertados por lote (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        desde = self._fecha(options['desde'])
+        hasta = self._fecha(options['hasta'])
+
+        creados = reconstruir_conformidad(desde=desde, hasta=hasta, batch_size=options['batch_size'])
+        rango = f" entre {desde or 'el inicio'} y {hasta or 'hoy'}" if desde or hasta else ''
+        self.stdout.write(self.style.SUCCESS(f'{creados} resúmenes diarios reconstruidos{rango}'))
+
+        if not desde and not hasta:
+            items = recalcular_fallas_items()
+            self.stdout.write(self.style.SUCCESS(f'Contador de fallas recalculado para {items} ítems'))
+
+    def _fecha(self, valor):
+        if not valor:
+            return None
+        try:
+            return datetime.date.fromisoformat(valor)
+        except ValueError:
+            raise CommandError(f'Fecha inválida: {valor}. Use el formato YYYY-MM-DD')
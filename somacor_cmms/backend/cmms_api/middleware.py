@@ -0,0 +1,84 @@
+# cmms_api/middleware.py
+# Compresión de respuestas y GET condicional (ETag / If-None-Match) para la API.
+
+import hashlib
+import re
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+re_accepts_br = re.compile(r'\bbr\b')
+re_accepts_gzip = re.compile(r'\bgzip\b')
+
+TIPOS_COMPRIMIBLES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+
+def _etag_debil(etag):
+    return etag if etag.startswith('W/') else f'W/{etag}'
+
+
+class CompresionMiddleware:
+    """
+    Comprime con brotli (o gzip si el cliente no lo acepta) las respuestas de
+    texto mayores a CMMS_COMPRESION_MIN_BYTES. Como GZipMiddleware, convierte los
+    ETag fuertes en débiles, ya que el contenido cambia de bytes pero no de
+    significado. Las respuestas en streaming (imágenes del blob store) no se tocan.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.minimo = getattr(settings, 'CMMS_COMPRESION_MIN_BYTES', 1024)
+        self.calidad_brotli = getattr(settings, 'CMMS_COMPRESION_BROTLI_CALIDAD', 5)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming or response.has_header('Content-Encoding')
+                or len(response.content) < self.minimo
+                or not response.get('Content-Type', '').startswith(TIPOS_COMPRIMIBLES)):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        aceptadas = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re_accepts_br.search(aceptadas):
+            contenido, codificacion = brotli.compress(response.content, quality=self.calidad_brotli), 'br'
+        elif re_accepts_gzip.search(aceptadas):
+            contenido, codificacion = compress_string(response.content), 'gzip'
+        else:
+            return response
+
+        # No vale la pena si casi no se reduce.
+        if len(contenido) >= len(response.content):
+            return response
+        response.content = contenido
+        response['Content-Length'] = str(len(contenido))
+        response['Content-Encoding'] = codificacion
+        if response.has_header('ETag'):
+            response['ETag'] = _etag_debil(response['ETag'])
+        return response
+
+
+class ETagMiddleware:
+    """
+    GET condicional para las respuestas exitosas de la API. Las que no traen
+    ETag (el de ETagVersionMixin o el de la vista) reciben uno débil con el hash
+    del contenido, y se responde 304 si coincide con If-None-Match: ahorra
+    transferencia, no trabajo del servidor. Corre después de la vista, así que
+    la autenticación y los permisos ya se verificaron.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200 or response.streaming:
+            return response
+        if not response.has_header('ETag'):
+            response['ETag'] = 'W/"%s"' % hashlib.md5(response.content).hexdigest()
+        return get_conditional_response(request, etag=response['ETag'], response=response)
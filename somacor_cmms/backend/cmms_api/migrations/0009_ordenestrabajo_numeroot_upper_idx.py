@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:15
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0008_hacer_usuario_subida_opcional'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ordenestrabajo',
+            index=models.Index(django.db.models.functions.text.Upper('numeroot'), name='ot_numeroot_upper_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:16
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalizar_texto_busqueda(texto):
+    # Copia de models.normalizar_texto_busqueda al crear la migración: la de
+    # models puede cambiar y esta debe seguir llenando las columnas igual.
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto).strip().lower()
+
+
+def poblar_columnas_busqueda(apps, schema_editor):
+    Equipos = apps.get_model('cmms_api', 'Equipos')
+    equipos = list(Equipos.objects.only('idequipo', 'nombreequipo', 'codigointerno'))
+    for equipo in equipos:
+        equipo.nombrebusqueda = normalizar_texto_busqueda(equipo.nombreequipo)
+        equipo.codigobusqueda = normalizar_texto_busqueda(equipo.codigointerno)
+    Equipos.objects.bulk_update(equipos, ['nombrebusqueda', 'codigobusqueda'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0009_ordenestrabajo_numeroot_upper_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipos',
+            name='codigobusqueda',
+            field=models.CharField(blank=True, db_column='CodigoBusqueda', db_index=True, default='', editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='equipos',
+            name='nombrebusqueda',
+            field=models.CharField(blank=True, db_column='NombreBusqueda', db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(poblar_columnas_busqueda, migrations.RunPython.noop),
+    ]
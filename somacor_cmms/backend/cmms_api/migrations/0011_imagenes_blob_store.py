@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0010_equipos_busqueda_normalizada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checklistimage',
+            name='imagen_blob',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Clave de la imagen en el blob store', max_length=80),
+        ),
+        migrations.AddField(
+            model_name='checklistinstance',
+            name='imagen_evidencia_blob',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Clave de la imagen en el blob store', max_length=80),
+        ),
+        migrations.AddField(
+            model_name='evidenciaot',
+            name='imagen_blob',
+            field=models.CharField(blank=True, db_column='ImagenBlob', default='', editable=False, help_text='Clave de la imagen en el blob store', max_length=80),
+        ),
+        migrations.AlterField(
+            model_name='checklistimage',
+            name='imagen_base64',
+            field=models.TextField(blank=True, default='', help_text='Imagen en formato Base64 (solo registros anteriores al blob store)'),
+        ),
+        migrations.AlterField(
+            model_name='evidenciaot',
+            name='imagen_base64',
+            field=models.TextField(blank=True, db_column='ImagenBase64', default='', help_text='Imagen en formato Base64 (solo registros anteriores al blob store)'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0011_imagenes_blob_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checklistimage',
+            name='imagen_medio_blob',
+            field=models.CharField(blank=True, default='', editable=False, max_length=80),
+        ),
+        migrations.AddField(
+            model_name='checklistimage',
+            name='imagen_miniatura_blob',
+            field=models.CharField(blank=True, default='', editable=False, max_length=80),
+        ),
+        migrations.AddField(
+            model_name='checklistinstance',
+            name='imagen_evidencia_medio_blob',
+            field=models.CharField(blank=True, default='', editable=False, max_length=80),
+        ),
+        migrations.AddField(
+            model_name='checklistinstance',
+            name='imagen_evidencia_miniatura_blob',
+            field=models.CharField(blank=True, default='', editable=False, max_length=80),
+        ),
+        migrations.AddField(
+            model_name='evidenciaot',
+            name='imagen_medio_blob',
+            field=models.CharField(blank=True, db_column='ImagenMedioBlob', default='', editable=False, max_length=80),
+        ),
+        migrations.AddField(
+            model_name='evidenciaot',
+            name='imagen_miniatura_blob',
+            field=models.CharField(blank=True, db_column='ImagenMiniaturaBlob', default='', editable=False, max_length=80),
+        ),
+    ]
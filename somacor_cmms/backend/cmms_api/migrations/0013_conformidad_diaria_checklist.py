@@ -0,0 +1,64 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, FilteredRelation, Q
+
+
+def poblar_conformidad_diaria(apps, schema_editor):
+    # Misma agregación que conformidad.reconstruir_conformidad al crear la
+    # migración, con los modelos históricos.
+    ChecklistInstance = apps.get_model('cmms_api', 'ChecklistInstance')
+    ConformidadDiariaChecklist = apps.get_model('cmms_api', 'ConformidadDiariaChecklist')
+    falla_critica = Q(malas__item__es_critico=True)
+    filas = ChecklistInstance.objects.annotate(
+        malas=FilteredRelation('answers', condition=Q(answers__estado='malo'))
+    ).order_by().values('equipo_id', 'template_id', 'fecha_inspeccion').annotate(
+        total_checklists=Count('id_instance', distinct=True),
+        checklists_con_fallas=Count('id_instance', distinct=True, filter=Q(malas__isnull=False)),
+        checklists_con_fallas_criticas=Count('id_instance', distinct=True, filter=falla_critica),
+        fallas_criticas=Count('malas', filter=falla_critica),
+        fallas_no_criticas=Count('malas', filter=Q(malas__item__es_critico=False)),
+    )
+    ConformidadDiariaChecklist.objects.bulk_create([
+        ConformidadDiariaChecklist(
+            equipo_id=fila['equipo_id'],
+            template_id=fila['template_id'],
+            fecha=fila['fecha_inspeccion'],
+            total_checklists=fila['total_checklists'],
+            checklists_conformes=fila['total_checklists'] - fila['checklists_con_fallas_criticas'],
+            checklists_con_fallas=fila['checklists_con_fallas'],
+            fallas_criticas=fila['fallas_criticas'],
+            fallas_no_criticas=fila['fallas_no_criticas'],
+        )
+        for fila in filas
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0012_imagenes_derivados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConformidadDiariaChecklist',
+            fields=[
+                ('id_resumen', models.AutoField(primary_key=True, serialize=False)),
+                ('fecha', models.DateField(db_index=True)),
+                ('total_checklists', models.IntegerField(default=0)),
+                ('checklists_conformes', models.IntegerField(default=0, help_text='Checklists sin fallas en ítems críticos')),
+                ('checklists_con_fallas', models.IntegerField(default=0, help_text='Checklists con al menos un ítem en estado malo')),
+                ('fallas_criticas', models.IntegerField(default=0)),
+                ('fallas_no_criticas', models.IntegerField(default=0)),
+                ('equipo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conformidad_diaria', to='cmms_api.equipos')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conformidad_diaria', to='cmms_api.checklisttemplate')),
+            ],
+            options={
+                'ordering': ['-fecha'],
+                'unique_together': {('equipo', 'template', 'fecha')},
+            },
+        ),
+        migrations.RunPython(poblar_conformidad_diaria, migrations.RunPython.noop),
+    ]
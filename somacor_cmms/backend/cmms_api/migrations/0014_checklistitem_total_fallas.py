@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:32
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def poblar_total_fallas(apps, schema_editor):
+    # Igual que conformidad.recalcular_fallas_items al crear la migración.
+    ChecklistItem = apps.get_model('cmms_api', 'ChecklistItem')
+    ChecklistAnswer = apps.get_model('cmms_api', 'ChecklistAnswer')
+    fallas = ChecklistAnswer.objects.filter(
+        item=OuterRef('pk'), estado='malo'
+    ).order_by().values('item').annotate(total=Count('pk')).values('total')
+    ChecklistItem.objects.update(total_fallas=Coalesce(Subquery(fallas), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0013_conformidad_diaria_checklist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checklistitem',
+            name='total_fallas',
+            field=models.IntegerField(default=0, editable=False, help_text="Cantidad histórica de respuestas 'malo' (ver conformidad.py)"),
+        ),
+        migrations.RunPython(poblar_total_fallas, migrations.RunPython.noop),
+    ]
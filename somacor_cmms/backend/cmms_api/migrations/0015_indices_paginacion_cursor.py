@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0014_checklistitem_total_fallas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendas',
+            index=models.Index(fields=['fechahorainicio', 'idagenda'], name='agenda_inicio_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checklistinstance',
+            index=models.Index(fields=['fecha_inspeccion', 'id_instance'], name='checklist_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evidenciaot',
+            index=models.Index(fields=['fecha_subida', 'idevidencia'], name='evidencia_subida_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenestrabajo',
+            index=models.Index(fields=['fechacreacionot', 'idordentrabajo'], name='ot_creacion_id_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0015_indices_paginacion_cursor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendas',
+            index=models.Index(fields=['idequipo', 'idplanmantenimiento', 'fechahorainicio'], name='agenda_equipo_plan_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendas',
+            index=models.Index(fields=['tipoevento', 'fechahorainicio'], name='agenda_tipo_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendas',
+            index=models.Index(condition=models.Q(('tipoevento', 'Mantenimiento Preventivo')), fields=['idequipo', 'fechahorainicio'], name='agenda_preventivos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checklistanswer',
+            index=models.Index(fields=['estado', 'item'], name='answer_estado_item_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checklistanswer',
+            index=models.Index(condition=models.Q(('estado', 'malo')), fields=['item'], name='answer_malas_item_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checklistinstance',
+            index=models.Index(fields=['equipo', 'fecha_inspeccion'], name='checklist_equipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenestrabajo',
+            index=models.Index(fields=['idestadoot', 'fechaejecucion'], name='ot_estado_ejecucion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenestrabajo',
+            index=models.Index(fields=['idequipo', 'fechacreacionot'], name='ot_equipo_creacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenestrabajo',
+            index=models.Index(condition=models.Q(('fechacompletado__isnull', True)), fields=['fechaejecucion'], name='ot_pendientes_ejecucion_idx'),
+        ),
+    ]
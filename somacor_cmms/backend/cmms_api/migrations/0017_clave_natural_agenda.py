@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0016_indices_filtros_frecuentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agendas',
+            name='fechavencimiento',
+            field=models.DateField(blank=True, db_column='FechaVencimiento', help_text='Fecha proyectada de vencimiento de la tarea del plan', null=True),
+        ),
+        migrations.AddField(
+            model_name='agendas',
+            name='iddetalleplan',
+            field=models.ForeignKey(blank=True, db_column='IDDetallePlan', null=True, on_delete=django.db.models.deletion.CASCADE, to='cmms_api.detallesplanmantenimiento'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='agendas',
+            unique_together={('idequipo', 'idplanmantenimiento', 'iddetalleplan', 'fechavencimiento')},
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-17 13:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0017_clave_natural_agenda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipos',
+            name='fechahorometro',
+            field=models.DateTimeField(blank=True, db_column='FechaHorometro', editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='equipos',
+            name='horometroactual',
+            field=models.IntegerField(db_column='HorometroActual', default=0),
+        ),
+        migrations.AddField(
+            model_name='equipos',
+            name='tasausodiaria',
+            field=models.FloatField(blank=True, db_column='TasaUsoDiaria', editable=False, help_text='Horas de operación por día estimadas (promedio móvil exponencial)', null=True),
+        ),
+        migrations.CreateModel(
+            name='HistorialHorometros',
+            fields=[
+                ('idlectura', models.BigAutoField(db_column='IDLectura', primary_key=True, serialize=False)),
+                ('fechalectura', models.DateTimeField(db_column='FechaLectura')),
+                ('horometro', models.IntegerField(db_column='Horometro')),
+                ('idequipo', models.ForeignKey(db_column='IDEquipo', on_delete=django.db.models.deletion.CASCADE, related_name='lecturas_horometro', to='cmms_api.equipos')),
+            ],
+            options={
+                'db_table': 'historialhorometros',
+                'ordering': ['idequipo', 'fechalectura'],
+                'unique_together': {('idequipo', 'fechalectura')},
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.23 on 2026-10-17 13:20
+
+from collections import defaultdict
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def poblar_clave_natural(apps, schema_editor):
+    """
+    Completa la clave natural (detalle del plan y fecha de vencimiento) de los
+    eventos preventivos creados antes de 0017, para que generar_agenda_preventiva
+    y la sincronización no los vuelvan a insertar. Como hacía el comando
+    anterior, el detalle se reconoce por el nombre de su tarea en el título y el
+    vencimiento es el día de inicio del evento. Si varios eventos caen en la
+    misma clave, solo el más antiguo la recibe.
+    """
+    Agendas = apps.get_model('cmms_api', 'Agendas')
+    DetallesPlanMantenimiento = apps.get_model('cmms_api', 'DetallesPlanMantenimiento')
+
+    eventos = Agendas.objects.filter(
+        iddetalleplan__isnull=True, idplanmantenimiento__isnull=False,
+        idequipo__isnull=False, idordentrabajo__isnull=True,
+    ).order_by('idagenda').only('idagenda', 'tituloevento', 'fechahorainicio', 'idequipo', 'idplanmantenimiento')
+    planes = set(eventos.values_list('idplanmantenimiento', flat=True).distinct())
+    if not planes:
+        return
+
+    # Tareas de cada plan, las de nombre más largo primero ("Cambio de aceite
+    # motor" antes que "Cambio de aceite").
+    tareas_por_plan = defaultdict(list)
+    for detalle_id, plan_id, nombre in DetallesPlanMantenimiento.objects.filter(
+        idplanmantenimiento__in=planes
+    ).values_list('iddetalleplan', 'idplanmantenimiento', 'idtareaestandar__nombretarea'):
+        tareas_por_plan[plan_id].append((nombre.lower(), detalle_id))
+    for tareas in tareas_por_plan.values():
+        tareas.sort(key=lambda tarea: -len(tarea[0]))
+
+    usadas = set(Agendas.objects.filter(
+        idplanmantenimiento__in=planes, iddetalleplan__isnull=False
+    ).values_list('idequipo', 'idplanmantenimiento', 'iddetalleplan', 'fechavencimiento'))
+
+    completados = []
+    for evento in eventos.iterator(chunk_size=2000):
+        titulo = evento.tituloevento.lower()
+        detalle_id = next(
+            (detalle_id for nombre, detalle_id in tareas_por_plan[evento.idplanmantenimiento_id] if nombre in titulo),
+            None
+        )
+        if detalle_id is None:
+            continue
+        fecha = timezone.localtime(evento.fechahorainicio).date()
+        clave = (evento.idequipo_id, evento.idplanmantenimiento_id, detalle_id, fecha)
+        if clave in usadas:
+            continue
+        usadas.add(clave)
+        evento.iddetalleplan_id = detalle_id
+        evento.fechavencimiento = fecha
+        completados.append(evento)
+    Agendas.objects.bulk_update(completados, ['iddetalleplan', 'fechavencimiento'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmms_api', '0018_historial_horometros'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_clave_natural, migrations.RunPython.noop),
+    ]
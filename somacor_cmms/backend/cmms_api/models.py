@@ -1,5 +1,19 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
+import re
+import unicodedata
+
+def normalizar_texto_busqueda(texto):
+    """
+    Normaliza un texto para búsquedas: minúsculas, sin tildes y con espacios colapsados.
+    Ej: "Camión  Tolva N°3" -> "camion tolva n°3".
+    """
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto).strip().lower()
 
 # --- Modelos Anteriores (revisados y mantenidos para consistencia) ---
 class Roles(models.Model):
@@ -57,11 +71,45 @@ class Equipos(models.Model):
     idfaenaactual = models.ForeignKey(Faenas, on_delete=models.SET_NULL, db_column='IDFaenaActual', blank=True, null=True)
     idestadoactual = models.ForeignKey(EstadosEquipo, on_delete=models.PROTECT, db_column='IDEstadoActual')
     activo = models.BooleanField(db_column='Activo', default=True)
+
+    # Última lectura de horómetro y tasa de uso estimada a partir del historial (ver horometros.py)
+    horometroactual = models.IntegerField(db_column='HorometroActual', default=0)
+    fechahorometro = models.DateTimeField(db_column='FechaHorometro', blank=True, null=True, editable=False)
+    tasausodiaria = models.FloatField(db_column='TasaUsoDiaria', blank=True, null=True, editable=False, help_text="Horas de operación por día estimadas (promedio móvil exponencial)")
+
+    # Columnas normalizadas e indexadas para la búsqueda de equipos (ver normalizar_texto_busqueda)
+    nombrebusqueda = models.CharField(db_column='NombreBusqueda', max_length=150, blank=True, default='', editable=False, db_index=True)
+    codigobusqueda = models.CharField(db_column='CodigoBusqueda', max_length=50, blank=True, default='', editable=False, db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.nombrebusqueda = normalizar_texto_busqueda(self.nombreequipo)
+        self.codigobusqueda = normalizar_texto_busqueda(self.codigointerno)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'nombrebusqueda', 'codigobusqueda'}
+        super().save(*args, **kwargs)
+
     def __str__(self): return f"{self.nombreequipo} ({self.patente or self.codigointerno})"
     class Meta: 
         db_table = 'equipos'
         ordering = ['nombreequipo']
 
+class HistorialHorometros(models.Model):
+    """
+    Lecturas de horómetro de los equipos. Solo se agregan filas; la última
+    lectura y la tasa de uso quedan en el equipo.
+    """
+    idlectura = models.BigAutoField(db_column='IDLectura', primary_key=True)
+    idequipo = models.ForeignKey(Equipos, on_delete=models.CASCADE, db_column='IDEquipo', related_name='lecturas_horometro')
+    fechalectura = models.DateTimeField(db_column='FechaLectura')
+    horometro = models.IntegerField(db_column='Horometro')
+    def __str__(self): return f"{self.idequipo_id}: {self.horometro}h ({self.fechalectura:%Y-%m-%d %H:%M})"
+    class Meta:
+        db_table = 'historialhorometros'
+        ordering = ['idequipo', 'fechalectura']
+        # Una lectura por equipo e instante; también es el índice por equipo y fecha
+        unique_together = ('idequipo', 'fechalectura')
+
 # --- NUEVOS MODELOS PARA EL MÓDULO DE CHECKLISTS ---
 
 class ChecklistTemplate(models.Model):
@@ -105,6 +153,7 @@ class ChecklistItem(models.Model):
     texto = models.CharField(max_length=255)
     es_critico = models.BooleanField(default=False, help_text="Marcar si una falla en este ítem impide la operación del equipo.")
     orden = models.IntegerField(default=1)
+    total_fallas = models.IntegerField(default=0, editable=False, help_text="Cantidad histórica de respuestas 'malo' (ver conformidad.py)")
 
     class Meta:
         ordering = ['orden']
@@ -126,12 +175,21 @@ class ChecklistInstance(models.Model):
     observaciones_generales = models.TextField(blank=True, null=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     imagen_evidencia = models.TextField(blank=True, null=True)
+    imagen_evidencia_blob = models.CharField(max_length=80, blank=True, default='', editable=False, help_text="Clave de la imagen en el blob store")
+    imagen_evidencia_medio_blob = models.CharField(max_length=80, blank=True, default='', editable=False)
+    imagen_evidencia_miniatura_blob = models.CharField(max_length=80, blank=True, default='', editable=False)
 
     def __str__(self):
         return f"Checklist para {self.equipo.nombreequipo} - {self.fecha_inspeccion}"
     
     class Meta:
         ordering = ['-fecha_inspeccion']
+        indexes = [
+            # Paginación por cursor (fecha_inspeccion, id_instance)
+            models.Index(fields=['fecha_inspeccion', 'id_instance'], name='checklist_fecha_id_idx'),
+            # Historial de checklists de un equipo
+            models.Index(fields=['equipo', 'fecha_inspeccion'], name='checklist_equipo_fecha_idx'),
+        ]
 
 class ChecklistAnswer(models.Model):
     """
@@ -152,6 +210,35 @@ class ChecklistAnswer(models.Model):
     class Meta:
         unique_together = ('instance', 'item')
         ordering = ['item__orden']
+        indexes = [
+            models.Index(fields=['estado', 'item'], name='answer_estado_item_idx'),
+            # Solo las respuestas malas: ranking de fallas y contador por ítem
+            models.Index(fields=['item'], condition=models.Q(estado='malo'), name='answer_malas_item_idx'),
+        ]
+
+class ConformidadDiariaChecklist(models.Model):
+    """
+    Resumen diario de conformidad por equipo y plantilla. Se mantiene al completar
+    cada checklist (ver conformidad.py) y se puede reconstruir con el comando
+    reconstruir_conformidad_checklist. Los reportes leen de aquí en lugar de
+    recorrer las respuestas.
+    """
+    id_resumen = models.AutoField(primary_key=True)
+    equipo = models.ForeignKey(Equipos, on_delete=models.CASCADE, related_name='conformidad_diaria')
+    template = models.ForeignKey(ChecklistTemplate, on_delete=models.CASCADE, related_name='conformidad_diaria')
+    fecha = models.DateField(db_index=True)
+    total_checklists = models.IntegerField(default=0)
+    checklists_conformes = models.IntegerField(default=0, help_text="Checklists sin fallas en ítems críticos")
+    checklists_con_fallas = models.IntegerField(default=0, help_text="Checklists con al menos un ítem en estado malo")
+    fallas_criticas = models.IntegerField(default=0)
+    fallas_no_criticas = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Conformidad {self.equipo_id} / {self.template_id} - {self.fecha}"
+
+    class Meta:
+        unique_together = ('equipo', 'template', 'fecha')
+        ordering = ['-fecha']
 
 # --- NUEVOS MODELOS PARA AGENDA DE MANTENIMIENTO PREVENTIVO ---
 
@@ -275,6 +362,18 @@ class OrdenesTrabajo(models.Model):
     class Meta: 
         db_table = 'ordenestrabajo'
         ordering = ['-fechacreacionot']
+        indexes = [
+            # Paginación por cursor (fechacreacionot, idordentrabajo)
+            models.Index(fields=['fechacreacionot', 'idordentrabajo'], name='ot_creacion_id_idx'),
+            # OTs por estado y fecha de ejecución (abiertas / vencidas)
+            models.Index(fields=['idestadoot', 'fechaejecucion'], name='ot_estado_ejecucion_idx'),
+            # Historial de OTs de un equipo
+            models.Index(fields=['idequipo', 'fechacreacionot'], name='ot_equipo_creacion_idx'),
+            # Solo las OTs sin completar, por fecha de ejecución
+            models.Index(fields=['fechaejecucion'], condition=models.Q(fechacompletado__isnull=True), name='ot_pendientes_ejecucion_idx'),
+            # Búsqueda exacta sin distinguir mayúsculas (bot / consultas por número de OT)
+            models.Index(Upper('numeroot'), name='ot_numeroot_upper_idx'),
+        ]
 
 class ActividadesOrdenTrabajo(models.Model):
     """
@@ -330,10 +429,25 @@ class Agendas(models.Model):
     idusuarioasignado = models.ForeignKey(User, on_delete=models.SET_NULL, db_column='IDUsuarioAsignado', related_name='eventos_asignados', blank=True, null=True)
     idusuariocreador = models.ForeignKey(User, on_delete=models.PROTECT, db_column='IDUsuarioCreador', related_name='eventos_creados')
     
+    # Clave natural de los eventos proyectados desde un plan (equipo, plan, detalle, vencimiento)
+    iddetalleplan = models.ForeignKey(DetallesPlanMantenimiento, on_delete=models.CASCADE, db_column='IDDetallePlan', blank=True, null=True)
+    fechavencimiento = models.DateField(db_column='FechaVencimiento', blank=True, null=True, help_text="Fecha proyectada de vencimiento de la tarea del plan")
+    
     def __str__(self): return f"{self.tituloevento} - {self.fechahorainicio.strftime('%Y-%m-%d %H:%M')}"
     class Meta: 
         db_table = 'agendas'
         ordering = ['fechahorainicio']
+        # Un solo evento por vencimiento proyectado; los demás eventos la dejan en NULL
+        unique_together = ('idequipo', 'idplanmantenimiento', 'iddetalleplan', 'fechavencimiento')
+        indexes = [
+            # Paginación por cursor (fechahorainicio, idagenda)
+            models.Index(fields=['fechahorainicio', 'idagenda'], name='agenda_inicio_id_idx'),
+            # Eventos de un plan para un equipo (generación y sincronización de la agenda)
+            models.Index(fields=['idequipo', 'idplanmantenimiento', 'fechahorainicio'], name='agenda_equipo_plan_inicio_idx'),
+            models.Index(fields=['tipoevento', 'fechahorainicio'], name='agenda_tipo_inicio_idx'),
+            # Solo los preventivos: mantenimientos próximos por equipo
+            models.Index(fields=['idequipo', 'fechahorainicio'], condition=models.Q(tipoevento='Mantenimiento Preventivo'), name='agenda_preventivos_idx'),
+        ]
 
 
 # --- MODELO PARA EVIDENCIAS FOTOGRÁFICAS EN ÓRDENES DE TRABAJO ---
@@ -345,7 +459,10 @@ class EvidenciaOT(models.Model):
     idevidencia = models.AutoField(db_column='IDEvidencia', primary_key=True)
     idordentrabajo = models.ForeignKey(OrdenesTrabajo, on_delete=models.CASCADE, db_column='IDOrdenTrabajo', related_name='evidencias')
     descripcion = models.CharField(db_column='Descripcion', max_length=255, blank=True, null=True)
-    imagen_base64 = models.TextField(db_column='ImagenBase64', help_text="Imagen almacenada en formato Base64")
+    imagen_base64 = models.TextField(db_column='ImagenBase64', blank=True, default='', help_text="Imagen en formato Base64 (solo registros anteriores al blob store)")
+    imagen_blob = models.CharField(db_column='ImagenBlob', max_length=80, blank=True, default='', editable=False, help_text="Clave de la imagen en el blob store")
+    imagen_medio_blob = models.CharField(db_column='ImagenMedioBlob', max_length=80, blank=True, default='', editable=False)
+    imagen_miniatura_blob = models.CharField(db_column='ImagenMiniaturaBlob', max_length=80, blank=True, default='', editable=False)
     fecha_subida = models.DateTimeField(db_column='FechaSubida', auto_now_add=True)
     usuario_subida = models.ForeignKey(User, on_delete=models.PROTECT, db_column='UsuarioSubida', null=True, blank=True)
     
@@ -355,6 +472,10 @@ class EvidenciaOT(models.Model):
     class Meta:
         db_table = 'evidenciaot'
         ordering = ['-fecha_subida']
+        indexes = [
+            # Paginación por cursor (fecha_subida, idevidencia)
+            models.Index(fields=['fecha_subida', 'idevidencia'], name='evidencia_subida_id_idx'),
+        ]
 
 
 # --- MODELO PARA MÚLTIPLES IMÁGENES EN CHECKLISTS ---
@@ -366,7 +487,10 @@ class ChecklistImage(models.Model):
     id_imagen = models.AutoField(primary_key=True)
     instance = models.ForeignKey(ChecklistInstance, on_delete=models.CASCADE, related_name='imagenes')
     descripcion = models.CharField(max_length=255, blank=True, null=True, help_text="Descripción opcional de la imagen")
-    imagen_base64 = models.TextField(help_text="Imagen almacenada en formato Base64")
+    imagen_base64 = models.TextField(blank=True, default='', help_text="Imagen en formato Base64 (solo registros anteriores al blob store)")
+    imagen_blob = models.CharField(max_length=80, blank=True, default='', editable=False, help_text="Clave de la imagen en el blob store")
+    imagen_medio_blob = models.CharField(max_length=80, blank=True, default='', editable=False)
+    imagen_miniatura_blob = models.CharField(max_length=80, blank=True, default='', editable=False)
     fecha_subida = models.DateTimeField(auto_now_add=True)
     usuario_subida = models.ForeignKey(User, on_delete=models.PROTECT)
     
@@ -0,0 +1,194 @@
+# cmms_api/pagination.py
+# Paginación por cursor (keyset) para colecciones que crecen sin límite.
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagina por los valores de la última fila entregada en vez de por OFFSET, y
+    sin COUNT(*): cada página cuesta lo mismo sin importar su profundidad.
+
+    El orden se toma de `cursor_ordering` en la vista (p. ej.
+    ('-fechacreacionot', '-idordentrabajo')) y debe terminar en un campo único.
+    El cursor es opaco para el cliente; solo se siguen los enlaces next/previous.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, 'cursor_ordering', None) or ('-pk',))
+        self.page_size = self.get_page_size(request)
+        valores, reverso = self.decode_cursor(request, queryset.model)
+
+        orden = self.ordering if not reverso else tuple(_invertir(campo) for campo in self.ordering)
+        queryset = queryset.order_by(*orden)
+        if valores is not None:
+            queryset = queryset.filter(_despues_de(orden, valores))
+        filas = list(queryset[:self.page_size + 1])
+        hay_mas = len(filas) > self.page_size
+        filas = filas[:self.page_size]
+        if reverso:
+            filas.reverse()
+
+        # Ir hacia atrás desde un cursor implica que hay páginas siguientes, y viceversa.
+        self.has_next = hay_mas if not reverso else valores is not None
+        self.has_previous = valores is not None if not reverso else hay_mas
+        self.primera = filas[0] if filas else None
+        self.ultima = filas[-1] if filas else None
+        return filas
+
+    def get_page_size(self, request):
+        try:
+            solicitado = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(solicitado, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or self.ultima is None:
+            return None
+        return self.encode_cursor(self.ultima, reverso=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.primera is None:
+            return None
+        return self.encode_cursor(self.primera, reverso=True)
+
+    def encode_cursor(self, fila, reverso):
+        valores = [_valor_json(_leer_campo(fila, campo.lstrip('-'))) for campo in self.ordering]
+        contenido = json.dumps({'v': valores, 'r': reverso}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(contenido.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, modelo):
+        """
+        Valores y dirección del cursor de la solicitud, convertidos al tipo de cada
+        campo del orden; un cursor alterado responde 404 en vez de llegar a la consulta.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            contenido = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            datos = json.loads(contenido)
+            valores, reverso = datos['v'], bool(datos.get('r'))
+            if not isinstance(valores, list) or len(valores) != len(self.ordering):
+                raise ValueError
+            valores = [
+                _campo_orden(modelo, campo.lstrip('-')).to_python(valor)
+                for campo, valor in zip(self.ordering, valores)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in valores:
+            raise NotFound(self.invalid_cursor_message)
+        return valores, reverso
+
+
+class PaginacionSeleccionable(PageNumberPagination):
+    """
+    Paginación por número de página (la de siempre) o por cursor. El cliente elige
+    con ?paginacion=cursor|pagina (o enviando un ?cursor=); si no, se usa el
+    `paginacion` de la vista ('pagina' por defecto).
+    """
+    paginacion_query_param = 'paginacion'
+
+    def usa_cursor(self, request, view):
+        elegida = request.query_params.get(self.paginacion_query_param)
+        if elegida is None and request.query_params.get(KeysetPagination.cursor_query_param):
+            elegida = 'cursor'
+        if elegida is None:
+            elegida = getattr(view, 'paginacion', 'pagina')
+        return elegida == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = KeysetPagination() if self.usa_cursor(request, view) else None
+        if self.keyset is not None:
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_previous_link()
+        return super().get_previous_link()
+
+
+def _invertir(campo):
+    return campo[1:] if campo.startswith('-') else '-' + campo
+
+
+def _despues_de(orden, valores):
+    """
+    Condición de las filas posteriores a `valores` en el orden dado:
+    (a > x) OR (a = x AND b > y) OR ... con > o < según la dirección de cada campo.
+    """
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        condicion |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+        iguales[nombre] = valor
+    return condicion
+
+
+def _campo_orden(modelo, nombre):
+    """ Campo del modelo cuyo tipo tiene el valor guardado en el cursor. """
+    campo = modelo._meta.pk if nombre == 'pk' else modelo._meta.get_field(nombre)
+    # Las claves foráneas se guardan por su id (ver _leer_campo).
+    return campo.target_field if campo.is_relation else campo
+
+
+def _leer_campo(fila, nombre):
+    if nombre == 'pk':
+        return fila.pk
+    # Las claves foráneas se comparan por su id, sin cargar el objeto.
+    campo = fila._meta.get_field(nombre)
+    return getattr(fila, campo.attname)
+
+
+def _valor_json(valor):
+    return valor.isoformat() if hasattr(valor, 'isoformat') else valor
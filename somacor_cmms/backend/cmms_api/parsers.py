@@ -0,0 +1,54 @@
+# cmms_api/parsers.py
+# Parsers para cargas multipart con fotos y JSON con orjson.
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParser as DjangoMultiPartParser, MultiPartParserError
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, JSONParser, MultiPartParser
+
+from .renderers import JSONRapidoRenderer, orjson
+
+
+class JSONRapidoParser(JSONParser):
+    """
+    JSONParser que decodifica con orjson cuando está instalado. orjson rechaza
+    NaN e Infinity igual que el modo estricto de DRF. Si el cuerpo no viene en
+    UTF-8, o no hay orjson, se usa JSONParser tal cual.
+    """
+    renderer_class = JSONRapidoRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8') or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MultiPartEnDiscoParser(MultiPartParser):
+    """
+    Igual que MultiPartParser, pero cada parte de archivo se escribe a disco a
+    medida que llega, sin importar su tamaño (el handler por defecto mantiene en
+    memoria los archivos de hasta FILE_UPLOAD_MAX_MEMORY_SIZE). Así la memoria de
+    una solicitud no crece con la cantidad de fotos adjuntas: solo los campos de
+    texto se materializan, y esos siguen acotados por DATA_UPLOAD_MAX_MEMORY_SIZE.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context['request']
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta['CONTENT_TYPE'] = media_type
+        upload_handlers = [TemporaryFileUploadHandler(request)]
+
+        try:
+            parser = DjangoMultiPartParser(meta, stream, upload_handlers, encoding)
+            data, files = parser.parse()
+            return DataAndFiles(data, files)
+        except MultiPartParserError as exc:
+            raise ParseError('Multipart form parse error - %s' % str(exc))
@@ -1,75 +1,94 @@
 # cmms_api/permissions.py
 
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from rest_framework import permissions
-from .models import Usuarios
 
-class IsAdminRole(permissions.BasePermission):
+from .cache import get_cache, invalidar_al_modificar, obtener_o_calcular, tag_modelo
+from .models import Roles, Usuarios
+
+
+def _clave_rol(user_id):
+    return f'cmms_api:rol:{user_id}'
+
+
+def rol_usuario(user_id):
     """
-    Permiso personalizado para permitir acceso solo a usuarios con rol de Admin o Administrador.
+    Nombre del rol del usuario, o None si no tiene registro en Usuarios. Se
+    guarda en la caché por usuario; se invalida al modificar el usuario, su
+    registro en Usuarios o cualquier rol.
+    """
+    def calcular():
+        return Usuarios.objects.filter(user_id=user_id).values_list('idrol__nombrerol', flat=True).first()
+
+    return obtener_o_calcular(_clave_rol(user_id), calcular, tags=(tag_modelo(Roles),))
+
+
+def rol_solicitud(request):
+    """
+    Rol del usuario de la solicitud, resuelto una sola vez aunque se verifiquen
+    varias clases de permiso. La autenticación puede entregarlo ya resuelto.
+    """
+    if not request.user or not request.user.is_authenticated:
+        return None
+    if not hasattr(request, '_rol_cmms'):
+        request._rol_cmms = rol_usuario(request.user.pk)
+    return request._rol_cmms
+
+
+@receiver(post_save, sender=Usuarios)
+@receiver(post_delete, sender=Usuarios)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def usuario_modificado(sender, instance, **kwargs):
+    def invalidar():
+        get_cache().delete(_clave_rol(instance.pk))
+
+    invalidar()
+    transaction.on_commit(invalidar)
+
+
+invalidar_al_modificar(Roles)
+
+
+class RolPermission(permissions.BasePermission):
+    """
+    Base de los permisos por rol: permite el acceso si el rol del usuario está en `roles`.
     """
+    roles = ()
+
     def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
-            return False
-        
-        try:
-            usuario = Usuarios.objects.get(user=request.user)
-            return usuario.idrol.nombrerol in ['Admin', 'Administrador']
-        except Usuarios.DoesNotExist:
-            return False
+        return rol_solicitud(request) in self.roles
+
 
-class IsSupervisorRole(permissions.BasePermission):
+class IsAdminRole(RolPermission):
+    """
+    Permiso personalizado para permitir acceso solo a usuarios con rol de Admin o Administrador.
+    """
+    roles = ('Admin', 'Administrador')
+
+class IsSupervisorRole(RolPermission):
     """
     Permiso personalizado para permitir acceso solo a usuarios con rol de Supervisor.
     """
-    def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
-            return False
-        
-        try:
-            usuario = Usuarios.objects.get(user=request.user)
-            return usuario.idrol.nombrerol == 'Supervisor'
-        except Usuarios.DoesNotExist:
-            return False
+    roles = ('Supervisor',)
 
-class IsOperadorRole(permissions.BasePermission):
+class IsOperadorRole(RolPermission):
     """
     Permiso personalizado para permitir acceso solo a usuarios con rol de Operador.
     """
-    def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
-            return False
-        
-        try:
-            usuario = Usuarios.objects.get(user=request.user)
-            return usuario.idrol.nombrerol == 'Operador'
-        except Usuarios.DoesNotExist:
-            return False
+    roles = ('Operador',)
 
-class IsAdminOrSupervisorRole(permissions.BasePermission):
+class IsAdminOrSupervisorRole(RolPermission):
     """
     Permiso personalizado para permitir acceso a usuarios con rol de Admin, Administrador o Supervisor.
     """
-    def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
-            return False
-        
-        try:
-            usuario = Usuarios.objects.get(user=request.user)
-            return usuario.idrol.nombrerol in ['Admin', 'Administrador', 'Supervisor']
-        except Usuarios.DoesNotExist:
-            return False
+    roles = ('Admin', 'Administrador', 'Supervisor')
 
-class IsAnyRole(permissions.BasePermission):
+class IsAnyRole(RolPermission):
     """
     Permiso personalizado para permitir acceso a cualquier usuario autenticado con rol asignado.
     """
-    def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
-            return False
-        
-        try:
-            usuario = Usuarios.objects.get(user=request.user)
-            return usuario.idrol.nombrerol in ['Admin', 'Administrador', 'Supervisor', 'Operador', 'Técnico']
-        except Usuarios.DoesNotExist:
-            return False
-
+    roles = ('Admin', 'Administrador', 'Supervisor', 'Operador', 'Técnico')
@@ -0,0 +1,91 @@
+# cmms_api/pronostico.py
+# Pronóstico vectorizado de mantenimientos preventivos por horómetro.
+#
+# Cada tarea de un plan vence cuando el horómetro del equipo llega a un múltiplo
+# de su intervalo. Con el horómetro actual y la tasa de uso (horas por día) de
+# cada equipo se calculan, para todas las combinaciones equipo × detalle de una
+# vez, los días en que vence cada ocurrencia dentro de un horizonte.
+
+from typing import NamedTuple
+
+import numpy as np
+
+# Tasa de uso supuesta cuando no se conoce la de un equipo.
+HORAS_DIARIAS_DEFECTO = 8
+
+
+class Vencimientos(NamedTuple):
+    """
+    Una fila por ocurrencia, ordenadas por equipo, detalle y fecha. `equipo` y
+    `detalle` son índices en los arreglos de entrada; `dias` se cuenta desde hoy
+    y `horometro` es el horómetro estimado al vencer.
+    """
+    equipo: np.ndarray
+    detalle: np.ndarray
+    dias: np.ndarray
+    horometro: np.ndarray
+    minutos: np.ndarray
+
+
+def horas_hasta_vencer(horometros, intervalos):
+    """
+    Matriz equipo × detalle con las horas que faltan para el próximo múltiplo
+    del intervalo (0 si el horómetro está justo en uno: ya vence).
+    """
+    horometros = np.asarray(horometros, dtype=np.int64)[:, None]
+    intervalos = np.maximum(np.asarray(intervalos, dtype=np.int64), 1)[None, :]
+    return (intervalos - horometros % intervalos) % intervalos
+
+
+def pronosticar(horometros, tasas, intervalos, duraciones, horizonte_dias=None, max_ocurrencias=None):
+    """
+    Vencimientos de cada detalle (intervalo en horas, duración en minutos) para
+    cada equipo (horómetro, tasa en horas/día) hasta `horizonte_dias` inclusive.
+    El día de una ocurrencia es la parte entera de horas / tasa, como en los
+    cálculos originales. Con `max_ocurrencias` se limita la cantidad por par
+    (p. ej. 1 para obtener solo el próximo vencimiento, sin horizonte). Los
+    equipos sin uso (tasa <= 0) solo registran lo que ya vence hoy y los
+    detalles sin intervalo no vencen.
+    """
+    if horizonte_dias is None and max_ocurrencias is None:
+        raise ValueError('Se requiere un horizonte o un máximo de ocurrencias.')
+    horometros = np.asarray(horometros, dtype=np.int64)
+    tasas = np.asarray(tasas, dtype=np.float64)
+    intervalos = np.asarray(intervalos, dtype=np.int64)
+    duraciones = np.asarray(duraciones, dtype=np.int64)
+    horizonte = np.inf if horizonte_dias is None else horizonte_dias
+    vacio = np.empty(0, dtype=np.int64)
+    if not horometros.size or not intervalos.size or horizonte < 0:
+        return Vencimientos(vacio, vacio, vacio, vacio, vacio)
+
+    primeras = horas_hasta_vencer(horometros, intervalos)  # (E, D)
+    pasos = np.maximum(intervalos, 1)
+
+    # int(h / tasa) <= horizonte  <=>  h < (horizonte + 1) * tasa
+    with np.errstate(divide='ignore', invalid='ignore'):
+        limite = np.where(tasas > 0, (horizonte + 1) * tasas, 0)[:, None]
+        cantidad = np.where(primeras < limite, np.ceil((limite - primeras) / pasos[None, :]), 0)
+    cantidad = np.where(tasas[:, None] > 0, cantidad, primeras == 0)
+    cantidad = np.where(intervalos[None, :] > 0, cantidad, 0)
+    if max_ocurrencias is not None:
+        cantidad = np.minimum(cantidad, max_ocurrencias)
+    cantidad = cantidad.astype(np.int64).ravel()
+
+    # Una fila por ocurrencia: el par (equipo, detalle) repetido y su número k.
+    pares = np.repeat(np.arange(cantidad.size), cantidad)
+    k = np.arange(pares.size) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+
+    equipo, detalle = np.divmod(pares, intervalos.size)
+    horas = primeras.ravel()[pares] + k * pasos[detalle]
+    tasa = tasas[equipo]
+    dias = np.floor_divide(horas, tasa, where=tasa > 0, out=np.zeros(horas.size)).astype(np.int64)
+
+    # El conteo en punto flotante puede pasarse por una ocurrencia en el borde.
+    dentro = dias <= horizonte
+    return Vencimientos(
+        equipo=equipo[dentro],
+        detalle=detalle[dentro],
+        dias=dias[dentro],
+        horometro=(horometros[equipo] + horas)[dentro],
+        minutos=duraciones[detalle][dentro],
+    )
@@ -0,0 +1,39 @@
+# cmms_api/renderers.py
+# Renderer JSON rápido basado en orjson, con el JSONRenderer de DRF como respaldo.
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+OPCIONES_ORJSON = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+)
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """
+    Mismo resultado que JSONRenderer, pero serializado con orjson cuando está
+    instalado. Las fechas, fechas-hora (con zona horaria), Decimal y textos
+    traducibles se convierten con el encoder de DRF, para que la salida sea
+    idéntica a la del renderer estándar. Sin orjson, con indentación, o si orjson
+    no puede serializar algún valor, se usa JSONRenderer tal cual.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        encoder = self.encoder_class()
+        try:
+            ret = orjson.dumps(data, default=encoder.default, option=OPCIONES_ORJSON)
+        except (TypeError, orjson.JSONEncodeError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Igual que JSONRenderer: U+2028 y U+2029 escapados para que sea JavaScript válido.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
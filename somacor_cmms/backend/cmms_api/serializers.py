@@ -3,7 +3,13 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.db import transaction
+from django.db.models import Prefetch
 import json
+from .blob_store import get_blob_store, decodificar_base64
+from .campos import CamposDinamicosMixin
+from .imagenes import guardar_imagen, DERIVADOS
+from .cache import invalidar_tags, tag_modelo
+from .conformidad import registrar_checklist
 from .models import (
     Roles, Usuarios, TiposEquipo, Faenas, EstadosEquipo, Equipos,
     ChecklistTemplate, ChecklistCategory, ChecklistItem,
@@ -13,19 +19,122 @@ from .models import (
     EvidenciaOT
 )
 
+# --- Mixin para imágenes almacenadas en el blob store ---
+def campo_derivado(campo, version, sufijo):
+    """ 'imagen_blob', 'miniatura', '_blob' -> 'imagen_miniatura_blob' """
+    if version == 'original':
+        return campo
+    return f"{campo[:-len(sufijo)]}_{version}{sufijo}"
+
+class ImagenField(serializers.CharField):
+    """ Imagen recibida como texto base64 o, en cargas multipart, como archivo subido. """
+    def to_internal_value(self, data):
+        if hasattr(data, 'read'):
+            return data
+        return super().to_internal_value(data)
+
+class ImagenBlobMixin:
+    """
+    Al validar, decodifica las imágenes recibidas en base64 (o toma el archivo
+    subido); al crear o actualizar, recién entonces las procesa (ver
+    imagenes.guardar_imagen), guarda original y derivados en el blob store y
+    conserva solo sus claves, de modo que una solicitud rechazada no deja blobs
+    huérfanos. Al leer, expone las URLs de los blobs en lugar del contenido.
+    `campos_imagen` mapea: campo base64 -> (campo con la clave, campo de salida con la URL).
+    Los campos de derivados siguen la convención imagen_blob -> imagen_miniatura_blob
+    e imagen_url -> imagen_miniatura_url.
+
+    Con `solo_miniaturas` en el contexto (listados, historial) solo se expone la
+    URL de la miniatura. Los registros antiguos que aún no se migran siguen
+    devolviendo su base64, salvo en ese modo.
+    """
+    campos_imagen = {'imagen_base64': ('imagen_blob', 'imagen_url')}
+    versiones_imagen = ('original',) + tuple(DERIVADOS)
+
+    def build_standard_field(self, field_name, model_field):
+        field_class, field_kwargs = super().build_standard_field(field_name, model_field)
+        if field_name in self.campos_imagen:
+            field_class = ImagenField
+        return field_class, field_kwargs
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        for campo in self.campos_imagen:
+            valor = attrs.get(campo)
+            if valor and not hasattr(valor, 'read'):
+                try:
+                    attrs[campo] = decodificar_base64(valor)
+                except ValueError as e:
+                    raise serializers.ValidationError({campo: str(e)})
+        return attrs
+
+    def guardar_imagenes(self, validated_data):
+        """ Guarda en el blob store las imágenes ya validadas y deja sus claves en los datos. """
+        for campo, (campo_blob, _) in self.campos_imagen.items():
+            datos = validated_data.get(campo)
+            if datos:
+                claves = guardar_imagen(datos)
+                for version in self.versiones_imagen:
+                    validated_data[campo_derivado(campo_blob, version, '_blob')] = claves.get(version, '')
+                validated_data[campo] = ''
+        return validated_data
+
+    def create(self, validated_data):
+        return super().create(self.guardar_imagenes(validated_data))
+
+    def update(self, instance, validated_data):
+        return super().update(instance, self.guardar_imagenes(validated_data))
+
+    def _url_blob(self, clave):
+        if not clave:
+            return None
+        url = get_blob_store().url(clave)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def _versiones_expuestas(self, campo_url):
+        """ Versiones cuya URL se incluye en la respuesta (ver campos.CamposDinamicosMixin). """
+        versiones = ('miniatura',) if self.context.get('solo_miniaturas', False) else self.versiones_imagen
+        solicitado = getattr(self, 'campo_solicitado', lambda nombre: True)
+        return [v for v in versiones if solicitado(campo_derivado(campo_url, v, '_url'))]
+
+    def columnas_representacion(self):
+        """ Columnas del modelo que lee to_representation para las imágenes. """
+        columnas = []
+        for campo, (campo_blob, campo_url) in self.campos_imagen.items():
+            versiones = self._versiones_expuestas(campo_url)
+            columnas += [campo_derivado(campo_blob, version, '_blob') for version in versiones]
+            if 'original' in versiones:
+                columnas += [campo_blob, campo]
+        return columnas
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        solo_miniaturas = self.context.get('solo_miniaturas', False)
+        for campo, (campo_blob, campo_url) in self.campos_imagen.items():
+            versiones = self._versiones_expuestas(campo_url)
+            for version in versiones:
+                clave = getattr(instance, campo_derivado(campo_blob, version, '_blob'), '')
+                data[campo_derivado(campo_url, version, '_url')] = self._url_blob(clave)
+            if not solo_miniaturas and 'original' in versiones and not getattr(instance, campo_blob, ''):
+                legado = getattr(instance, campo, None)
+                if legado:
+                    data[campo] = legado
+        return data
+
 # --- Serializers Anteriores ---
-class RolSerializer(serializers.ModelSerializer):
+class RolSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Roles
         fields = '__all__'
 
-class UsuariosSerializer(serializers.ModelSerializer):
+class UsuariosSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     nombrerol = serializers.CharField(source='idrol.nombrerol', read_only=True)
     class Meta:
         model = Usuarios
         fields = ('idrol', 'nombrerol', 'departamento')
         
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuarios = UsuariosSerializer(required=False, allow_null=True)
     idrol = serializers.PrimaryKeyRelatedField(queryset=Roles.objects.all(), write_only=True, required=False, allow_null=True)
     nombrerol = serializers.CharField(source='usuarios.idrol.nombrerol', read_only=True)
@@ -89,46 +198,61 @@ class UserSerializer(serializers.ModelSerializer):
 
         return instance
 
-class TipoEquipoSerializer(serializers.ModelSerializer):
+class TipoEquipoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = TiposEquipo
         fields = '__all__'
 
-class FaenaSerializer(serializers.ModelSerializer):
+class FaenaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Faenas
         fields = '__all__'
 
-class EstadoEquipoSerializer(serializers.ModelSerializer):
+class EstadoEquipoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = EstadosEquipo
         fields = '__all__'
 
-class EquipoSerializer(serializers.ModelSerializer):
+class EquipoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     tipo_equipo_nombre = serializers.CharField(source='idtipoequipo.nombretipo', read_only=True)
     faena_nombre = serializers.CharField(source='idfaenaactual.nombrefaena', read_only=True)
     estado_nombre = serializers.CharField(source='idestadoactual.nombreestado', read_only=True)
     
     class Meta:
         model = Equipos
-        fields = '__all__'
+        exclude = ('nombrebusqueda', 'codigobusqueda')
+
+class EquipoBusquedaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """ Representación compacta de un equipo para resultados de búsqueda. """
+    tipo_equipo_nombre = serializers.CharField(source='idtipoequipo.nombretipo', read_only=True)
+    faena_nombre = serializers.CharField(source='idfaenaactual.nombrefaena', read_only=True)
+
+    class Meta:
+        model = Equipos
+        fields = ['idequipo', 'codigointerno', 'nombreequipo', 'patente', 'tipo_equipo_nombre', 'faena_nombre']
+
+class LecturaHorometroSerializer(serializers.Serializer):
+    """ Una lectura de la carga masiva de horómetros; sin fecha, se toma la actual. """
+    equipo_id = serializers.IntegerField()
+    horometro = serializers.IntegerField(min_value=0)
+    fecha = serializers.DateTimeField(required=False)
 
 # --- SERIALIZERS PARA EL MÓDULO DE CHECKLISTS ---
 
-class ChecklistItemSerializer(serializers.ModelSerializer):
+class ChecklistItemSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """ Serializer para un ítem individual del checklist. """
     class Meta:
         model = ChecklistItem
         fields = ['id_item', 'texto', 'es_critico', 'orden']
 
-class ChecklistCategorySerializer(serializers.ModelSerializer):
+class ChecklistCategorySerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """ Serializer para una categoría, incluyendo sus ítems anidados. """
     items = ChecklistItemSerializer(many=True, read_only=True)
     class Meta:
         model = ChecklistCategory
         fields = ['id_category', 'nombre', 'orden', 'items']
 
-class ChecklistTemplateSerializer(serializers.ModelSerializer):
+class ChecklistTemplateSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para la plantilla de checklist. Se usa para leer la plantilla
     completa con todas sus categorías e ítems.
@@ -139,14 +263,14 @@ class ChecklistTemplateSerializer(serializers.ModelSerializer):
         model = ChecklistTemplate
         fields = ['id_template', 'nombre', 'tipo_equipo', 'tipo_equipo_nombre', 'activo', 'categories']
 
-class ChecklistAnswerSerializer(serializers.ModelSerializer):
+class ChecklistAnswerSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """ Serializer para procesar las respuestas de un checklist. """
     item = serializers.IntegerField()
     class Meta:
         model = ChecklistAnswer
         fields = ['item', 'estado', 'observacion_item']
 
-class ChecklistImageSerializer(serializers.ModelSerializer):
+class ChecklistImageSerializer(CamposDinamicosMixin, ImagenBlobMixin, serializers.ModelSerializer):
     """ Serializer para procesar las imágenes de un checklist. """
     usuario_subida_nombre = serializers.CharField(source='usuario_subida.get_full_name', read_only=True)
     
@@ -154,8 +278,9 @@ class ChecklistImageSerializer(serializers.ModelSerializer):
         model = ChecklistImage
         fields = ['id_imagen', 'descripcion', 'imagen_base64', 'fecha_subida', 'usuario_subida_nombre']
         read_only_fields = ['id_imagen', 'fecha_subida', 'usuario_subida_nombre']
+        extra_kwargs = {'imagen_base64': {'write_only': True, 'required': True, 'allow_blank': False}}
 
-class ChecklistInstanceSerializer(serializers.ModelSerializer):
+class ChecklistInstanceSerializer(CamposDinamicosMixin, ImagenBlobMixin, serializers.ModelSerializer):
     """
     Serializer principal para crear y leer un checklist completado.
     Maneja la creación anidada de las respuestas y la subida de múltiples imágenes.
@@ -170,7 +295,9 @@ class ChecklistInstanceSerializer(serializers.ModelSerializer):
     imagenes_list = ChecklistImageSerializer(source='imagenes', many=True, read_only=True)
     
     # Mantener compatibilidad con imagen_evidencia para casos legacy
-    imagen_evidencia = serializers.CharField(allow_null=True, allow_blank=True, required=False)
+    imagen_evidencia = ImagenField(allow_null=True, allow_blank=True, required=False, write_only=True)
+
+    campos_imagen = {'imagen_evidencia': ('imagen_evidencia_blob', 'imagen_evidencia_url')}
 
     class Meta:
         model = ChecklistInstance
@@ -181,13 +308,60 @@ class ChecklistInstanceSerializer(serializers.ModelSerializer):
             'template_nombre', 'imagenes_list', 'imagen_evidencia'
         ]
 
+    def validate(self, attrs):
+        """
+        Valida en memoria que cada respuesta corresponda a un ítem de la plantilla
+        y que no haya ítems repetidos, usando un único mapa de ítems precargado.
+        """
+        answers_data = attrs.get('answers')
+        if answers_data is None:
+            return super().validate(attrs)
+
+        # En un PATCH sin plantilla se valida contra la de la instancia.
+        template = attrs.get('template') or getattr(self.instance, 'template', None)
+        self._items_por_id = ChecklistItem.objects.filter(category__template=template).in_bulk()
+
+        errores = []
+        vistos = set()
+        for answer_data in answers_data:
+            item_id = answer_data['item']
+            if item_id not in self._items_por_id:
+                errores.append(f"El ítem {item_id} no pertenece a la plantilla seleccionada.")
+            elif item_id in vistos:
+                errores.append(f"El ítem {item_id} tiene más de una respuesta.")
+            vistos.add(item_id)
+        if errores:
+            raise serializers.ValidationError({'answers': errores})
+        return super().validate(attrs)
+
+    @staticmethod
+    def setup_eager_loading(queryset, solo_miniaturas=False):
+        """
+        Precarga operador, equipo, plantilla e imágenes. En modo miniaturas no se
+        leen las columnas base64 heredadas, que pueden pesar megabytes por fila.
+        """
+        imagenes = ChecklistImage.objects.select_related('usuario_subida')
+        if solo_miniaturas:
+            imagenes = imagenes.defer('imagen_base64')
+            queryset = queryset.defer('imagen_evidencia')
+        return queryset.select_related('operador', 'equipo', 'template').prefetch_related(
+            Prefetch('imagenes', queryset=imagenes)
+        )
+
     def create(self, validated_data):
         """
         Sobrescribe el método de creación para manejar la creación anidada de
         la instancia del checklist, sus respuestas y múltiples imágenes.
+        Respuestas e imágenes se insertan con bulk_create, y el checklist se suma
+        al resumen diario de conformidad en la misma transacción.
         """
         answers_data = validated_data.pop('answers')
         imagenes_data = validated_data.pop('imagenes', [])
+        items_por_id = getattr(self, '_items_por_id', None)
+        if items_por_id is None:
+            items_por_id = ChecklistItem.objects.filter(
+                category__template=validated_data['template']
+            ).in_bulk()
         
         # Asignamos el usuario de la solicitud actual como el operador.
         user = self.context["request"].user
@@ -195,40 +369,73 @@ class ChecklistInstanceSerializer(serializers.ModelSerializer):
             validated_data["operador"] = user
         else:
             raise serializers.ValidationError("Usuario no autenticado para asignar como operador.")
-        
+
+        # Las fotos se escriben en el blob store recién ahora que todo validó.
+        self.guardar_imagenes(validated_data)
+        serializer_imagen = self.fields['imagenes'].child
+        for imagen_data in imagenes_data:
+            serializer_imagen.guardar_imagenes(imagen_data)
+
         with transaction.atomic():
             instance = ChecklistInstance.objects.create(**validated_data)
             
             # Crear respuestas
-            for answer_data in answers_data:
-                item_id = answer_data.pop('item')
-                item = ChecklistItem.objects.get(id_item=item_id)
-                ChecklistAnswer.objects.create(instance=instance, item=item, **answer_data)
-            
-            # Crear imágenes
-            for imagen_data in imagenes_data:
-                ChecklistImage.objects.create(
+            respuestas = ChecklistAnswer.objects.bulk_create([
+                ChecklistAnswer(
                     instance=instance,
-                    usuario_subida=user,
-                    **imagen_data
+                    item=items_por_id[answer_data['item']],
+                    estado=answer_data['estado'],
+                    observacion_item=answer_data.get('observacion_item')
                 )
-                
+                for answer_data in answers_data
+            ])
+            registrar_checklist(instance, respuestas)
+            
+            # Crear imágenes
+            ChecklistImage.objects.bulk_create([
+                ChecklistImage(instance=instance, usuario_subida=user, **imagen_data)
+                for imagen_data in imagenes_data
+            ])
+            # bulk_create no envía post_save: se invalidan a mano sus tags.
+            invalidar_tags(tag_modelo(ChecklistAnswer), tag_modelo(ChecklistImage))
+
         return instance
 
+class ChecklistInstanceCompactoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """ Representación compacta de un checklist completado para listados. """
+    operador_nombre = serializers.CharField(source='operador.get_full_name', read_only=True)
+    equipo_nombre = serializers.CharField(source='equipo.nombreequipo', read_only=True)
+    template_nombre = serializers.CharField(source='template.nombre', read_only=True)
+
+    class Meta:
+        model = ChecklistInstance
+        fields = [
+            'id_instance', 'template', 'equipo', 'fecha_inspeccion', 'horometro_inspeccion',
+            'operador_nombre', 'equipo_nombre', 'template_nombre'
+        ]
+
+    @staticmethod
+    def setup_eager_loading(queryset, solo_miniaturas=False):
+        return queryset.select_related('operador', 'equipo', 'template').only(
+            'id_instance', 'template', 'equipo', 'fecha_inspeccion', 'horometro_inspeccion',
+            'operador__first_name', 'operador__last_name',
+            'equipo__nombreequipo', 'template__nombre'
+        )
+
 # --- SERIALIZERS PARA AGENDA DE MANTENIMIENTO PREVENTIVO ---
 
-class TipoTareaSerializer(serializers.ModelSerializer):
+class TipoTareaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = TiposTarea
         fields = '__all__'
 
-class TareaEstandarSerializer(serializers.ModelSerializer):
+class TareaEstandarSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     tipo_tarea_nombre = serializers.CharField(source='idtipotarea.nombretipotarea', read_only=True)
     class Meta:
         model = TareasEstandar
         fields = '__all__'
 
-class PlanMantenimientoSerializer(serializers.ModelSerializer):
+class PlanMantenimientoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     tipo_equipo_nombre = serializers.CharField(source='idtipoequipo.nombretipo', read_only=True)
     detalles = serializers.SerializerMethodField()
     
@@ -240,7 +447,7 @@ class PlanMantenimientoSerializer(serializers.ModelSerializer):
         detalles = DetallesPlanMantenimiento.objects.filter(idplanmantenimiento=obj)
         return [{'intervalohorasoperacion': detalle.intervalohorasoperacion} for detalle in detalles]
 
-class DetallesPlanMantenimientoSerializer(serializers.ModelSerializer):
+class DetallesPlanMantenimientoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     plan_nombre = serializers.CharField(source='idplanmantenimiento.nombreplan', read_only=True)
     tarea_nombre = serializers.CharField(source='idtareaestandar.nombretarea', read_only=True)
     tarea_estandar = TareaEstandarSerializer(source='idtareaestandar', read_only=True)
@@ -249,19 +456,19 @@ class DetallesPlanMantenimientoSerializer(serializers.ModelSerializer):
         model = DetallesPlanMantenimiento
         fields = '__all__'
 
-class TipoMantenimientoOTSerializer(serializers.ModelSerializer):
+class TipoMantenimientoOTSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = TiposMantenimientoOT
         fields = '__all__'
 
-class EstadoOrdenTrabajoSerializer(serializers.ModelSerializer):
+class EstadoOrdenTrabajoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = EstadosOrdenTrabajo
         fields = '__all__'
 
 # --- SERIALIZERS PARA REGISTRO DE MANTENIMIENTOS ---
 
-class ActividadOrdenTrabajoSerializer(serializers.ModelSerializer):
+class ActividadOrdenTrabajoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     orden_trabajo_numero = serializers.CharField(source='idordentrabajo.numeroot', read_only=True)
     tarea_nombre = serializers.CharField(source='idtareaestandar.nombretarea', read_only=True)
     tecnico_nombre = serializers.CharField(source='idtecnicoejecutor.get_full_name', read_only=True)
@@ -270,7 +477,7 @@ class ActividadOrdenTrabajoSerializer(serializers.ModelSerializer):
         model = ActividadesOrdenTrabajo
         fields = '__all__'
 
-class OrdenTrabajoSerializer(serializers.ModelSerializer):
+class OrdenTrabajoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     equipo_nombre = serializers.CharField(source='idequipo.nombreequipo', read_only=True)
     plan_nombre = serializers.CharField(source='idplanorigen.nombreplan', read_only=True)
     tipo_mantenimiento_nombre = serializers.CharField(source='idtipomantenimientoot.nombretipomantenimientoot', read_only=True)
@@ -283,7 +490,52 @@ class OrdenTrabajoSerializer(serializers.ModelSerializer):
         model = OrdenesTrabajo
         fields = '__all__'
 
-class AgendaSerializer(serializers.ModelSerializer):
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Carga en bloque todas las relaciones que recorre el serializer para que
+        una página de OTs cueste un número constante de consultas.
+        """
+        actividades = ActividadesOrdenTrabajo.objects.select_related(
+            'idtareaestandar', 'idtecnicoejecutor'
+        )
+        return queryset.select_related(
+            'idequipo', 'idplanorigen', 'idtipomantenimientoot',
+            'idestadoot', 'idsolicitante', 'idtecnicoasignado'
+        ).prefetch_related(
+            Prefetch('actividadesordentrabajo_set', queryset=actividades)
+        )
+
+class OrdenTrabajoEstadoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """ Proyección liviana de una OT para consultas de estado (bot, notificaciones). """
+    equipo_nombre = serializers.CharField(source='idequipo.nombreequipo', read_only=True)
+    tipo_mantenimiento_nombre = serializers.CharField(source='idtipomantenimientoot.nombretipomantenimientoot', read_only=True)
+    estado_nombre = serializers.CharField(source='idestadoot.nombreestadoot', read_only=True)
+    tecnico_nombre = serializers.CharField(source='idtecnicoasignado.get_full_name', read_only=True)
+
+    class Meta:
+        model = OrdenesTrabajo
+        fields = [
+            'idordentrabajo', 'numeroot', 'estado_nombre', 'equipo_nombre',
+            'tipo_mantenimiento_nombre', 'tecnico_nombre', 'prioridad',
+            'fechaemision', 'fechaejecucion', 'fechacompletado',
+            'descripcionproblemareportado'
+        ]
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related(
+            'idequipo', 'idtipomantenimientoot', 'idestadoot', 'idtecnicoasignado'
+        ).only(
+            'idordentrabajo', 'numeroot', 'prioridad', 'fechaemision', 'fechaejecucion',
+            'fechacompletado', 'descripcionproblemareportado',
+            'idequipo__nombreequipo',
+            'idtipomantenimientoot__nombretipomantenimientoot',
+            'idestadoot__nombreestadoot',
+            'idtecnicoasignado__first_name', 'idtecnicoasignado__last_name'
+        )
+
+class AgendaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     equipo_nombre = serializers.CharField(source='idequipo.nombreequipo', read_only=True)
     orden_trabajo_numero = serializers.CharField(source='idordentrabajo.numeroot', read_only=True)
     plan_nombre = serializers.CharField(source='idplanmantenimiento.nombreplan', read_only=True)
@@ -293,16 +545,45 @@ class AgendaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Agendas
         fields = '__all__'
+        read_only_fields = ['iddetalleplan', 'fechavencimiento']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related(
+            'idequipo', 'idordentrabajo', 'idplanmantenimiento',
+            'idusuarioasignado', 'idusuariocreador'
+        )
+
+class AgendaCompactoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """ Representación compacta de un evento para calendarios y tablas. """
+    equipo_nombre = serializers.CharField(source='idequipo.nombreequipo', read_only=True)
+
+    class Meta:
+        model = Agendas
+        fields = [
+            'idagenda', 'tituloevento', 'fechahorainicio', 'fechahorafin', 'tipoevento',
+            'colorevento', 'esdiacompleto', 'idequipo', 'equipo_nombre',
+            'idordentrabajo', 'idplanmantenimiento'
+        ]
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('idequipo').only(
+            'idagenda', 'tituloevento', 'fechahorainicio', 'fechahorafin', 'tipoevento',
+            'colorevento', 'esdiacompleto', 'idordentrabajo', 'idplanmantenimiento',
+            'idequipo__nombreequipo'
+        )
 
 # --- SERIALIZER PARA EVIDENCIAS FOTOGRÁFICAS ---
 
-class EvidenciaOTSerializer(serializers.ModelSerializer):
+class EvidenciaOTSerializer(CamposDinamicosMixin, ImagenBlobMixin, serializers.ModelSerializer):
     usuario_subida_nombre = serializers.CharField(source='usuario_subida.get_full_name', read_only=True)
     orden_trabajo_numero = serializers.CharField(source='idordentrabajo.numeroot', read_only=True)
     
     class Meta:
         model = EvidenciaOT
-        fields = '__all__'
+        exclude = ('imagen_blob', 'imagen_medio_blob', 'imagen_miniatura_blob')
+        extra_kwargs = {'imagen_base64': {'write_only': True, 'required': True, 'allow_blank': False}}
         
     def create(self, validated_data):
         # Obtener o crear usuario por defecto si no hay autenticación
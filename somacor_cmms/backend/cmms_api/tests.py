@@ -1,8 +1,70 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.core.management import call_command
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
-from cmms_api.models import Equipos, TiposEquipo, EstadosEquipo, Faenas, Roles, Usuarios
+from django.db import IntegrityError, connection, transaction
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from datetime import timedelta
+from unittest import skipUnless
+import base64
+import brotli
+import numpy as np
+import gzip
+import io
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import time
+from cmms_project.authentication import tokens_en_cache
+from rest_framework.authtoken.models import Token
+from cmms_api.blob_store import get_blob_store
+from cmms_api.parsers import JSONRapidoParser
+from cmms_api.renderers import JSONRapidoRenderer
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from django.utils.translation import gettext_lazy
+from decimal import Decimal
+import datetime
+import uuid
+from urllib.parse import urlencode
+from cmms_api.cache import invalidar_tags, obtener, obtener_o_calcular, tag_modelo, versiones_tags
+from cmms_api.catalogos import estado_ot, limpiar_catalogos, tipo_mantenimiento_ot
+from cmms_api.agenda import equipos_con_horometro, vencimientos
+from cmms_api.horometros import actualizar_tasa, registrar_lecturas
+from cmms_api.pronostico import pronosticar
+from cmms_api.conformidad import reconstruir_conformidad, recalcular_fallas_items, CAMPOS_CONTADORES
+from cmms_api.serializers import ChecklistInstanceSerializer
+from cmms_api.models import (
+    Equipos, TiposEquipo, EstadosEquipo, Faenas, Roles, Usuarios, TiposTarea, TareasEstandar,
+    PlanesMantenimiento, DetallesPlanMantenimiento, TiposMantenimientoOT, EstadosOrdenTrabajo, OrdenesTrabajo,
+    ActividadesOrdenTrabajo, ChecklistTemplate, ChecklistCategory, ChecklistItem, ChecklistInstance,
+    ChecklistAnswer, ChecklistImage, EvidenciaOT, ConformidadDiariaChecklist, Agendas, HistorialHorometros
+)
+
+# Los benchmarks informan sus tiempos por aquí (ver LOGGING en settings.py).
+logger = logging.getLogger(__name__)
+
+
+class BlobStoreTemporalMixin:
+    """ Redirige el blob store a un directorio temporal durante cada prueba. """
+    def setUp(self):
+        super().setUp()
+        self.blob_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.blob_root, ignore_errors=True)
+        ajuste = self.settings(CMMS_BLOB_STORE={
+            'BACKEND': 'cmms_api.blob_store.LocalFileSystemBlobStore',
+            'OPTIONS': {'location': self.blob_root},
+        })
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
 
 class RolesModelTest(TestCase):
     def test_rol_creation(self):
@@ -120,4 +182,1486 @@ class EquipoAPITest(TestCase):
     def test_delete_equipo(self):
         response = self.client.delete(f"/api/equipos/{self.equipo.idequipo}/")
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(Equipos.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(Equipos.objects.count(), 0)
+
+class OrdenTrabajoQueryCountTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='tecnico', password='tecnico', first_name='Juan', last_name='Pérez')
+        self.tipo_equipo = TiposEquipo.objects.create(nombretipo="Camión")
+        self.estado_equipo = EstadosEquipo.objects.create(nombreestado="Operativo")
+        self.tipo_ot = TiposMantenimientoOT.objects.create(nombretipomantenimientoot="Preventivo")
+        self.estado_ot = EstadosOrdenTrabajo.objects.create(nombreestadoot="Abierta")
+        self.tipo_tarea = TiposTarea.objects.create(nombretipotarea="Inspección")
+        self.tarea = TareasEstandar.objects.create(nombretarea="Revisar aceite", idtipotarea=self.tipo_tarea)
+        self.plan = PlanesMantenimiento.objects.create(nombreplan="Plan Camión", idtipoequipo=self.tipo_equipo)
+
+    def crear_ots(self, cantidad, actividades_por_ot):
+        inicio = OrdenesTrabajo.objects.count()
+        for i in range(inicio, inicio + cantidad):
+            equipo = Equipos.objects.create(
+                codigointerno=f"EQ{i:03d}",
+                nombreequipo=f"Camión {i}",
+                idtipoequipo=self.tipo_equipo,
+                idestadoactual=self.estado_equipo
+            )
+            ot = OrdenesTrabajo.objects.create(
+                numeroot=f"OT-{i:03d}",
+                idequipo=equipo,
+                idplanorigen=self.plan,
+                idtipomantenimientoot=self.tipo_ot,
+                idestadoot=self.estado_ot,
+                idsolicitante=self.user,
+                idtecnicoasignado=self.user
+            )
+            for secuencia in range(actividades_por_ot):
+                ActividadesOrdenTrabajo.objects.create(
+                    idordentrabajo=ot,
+                    idtareaestandar=self.tarea,
+                    secuencia=secuencia,
+                    descripcionactividad=f"Actividad {secuencia}",
+                    idtecnicoejecutor=self.user
+                )
+
+    def test_listado_con_consultas_constantes(self):
+        # COUNT de paginación + página de OTs + prefetch de actividades
+        self.crear_ots(2, 1)
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/ordenes-trabajo/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.crear_ots(20, 5)
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/ordenes-trabajo/")
+        self.assertEqual(len(response.data["results"]), 22)
+        actividad = response.data["results"][0]["actividades"][0]
+        self.assertEqual(actividad["tarea_nombre"], "Revisar aceite")
+        self.assertEqual(actividad["tecnico_nombre"], "Juan Pérez")
+        self.assertEqual(actividad["orden_trabajo_numero"], response.data["results"][0]["numeroot"])
+
+    def test_detalle_con_consultas_constantes(self):
+        self.crear_ots(1, 10)
+        ot = OrdenesTrabajo.objects.get()
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/ordenes-trabajo/{ot.idordentrabajo}/")
+        self.assertEqual(response.data["equipo_nombre"], "Camión 0")
+        self.assertEqual(response.data["plan_nombre"], "Plan Camión")
+        self.assertEqual(len(response.data["actividades"]), 10)
+
+    def test_busqueda_por_numero_sin_distinguir_mayusculas(self):
+        self.crear_ots(3, 2)
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/ordenes-trabajo/by-numero/ot-001/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["numeroot"], "OT-001")
+        self.assertEqual(response.data["estado_nombre"], "Abierta")
+        self.assertEqual(response.data["equipo_nombre"], "Camión 1")
+        self.assertEqual(response.data["tecnico_nombre"], "Juan Pérez")
+        self.assertNotIn("actividades", response.data)
+
+    def test_busqueda_por_numero_inexistente(self):
+        response = self.client.get("/api/ordenes-trabajo/by-numero/OT-999/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_campos_parciales_podan_consulta(self):
+        self.crear_ots(3, 2)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get("/api/ordenes-trabajo/", {'fields': 'idordentrabajo,numeroot,estado_nombre'})
+        # COUNT + página; sin prefetch de actividades ni joins que no se usan.
+        self.assertEqual(len(consultas.captured_queries), 2)
+        pagina = consultas.captured_queries[1]['sql']
+        self.assertNotIn('DescripcionProblemaReportado', pagina)
+        self.assertNotIn('"equipos"', pagina)
+        self.assertEqual(set(response.data['results'][0]), {'idordentrabajo', 'numeroot', 'estado_nombre'})
+        self.assertEqual(response.data['results'][0]['estado_nombre'], 'Abierta')
+
+    def test_omitir_campos(self):
+        self.crear_ots(2, 2)
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/ordenes-trabajo/", {'omit': 'actividades'})
+        self.assertNotIn('actividades', response.data['results'][0])
+        self.assertEqual(response.data['results'][0]['equipo_nombre'], 'Camión 1')
+
+    def test_listado_compacto(self):
+        self.crear_ots(2, 2)
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/ordenes-trabajo/", {'compacto': 'true', 'fields': 'numeroot,tecnico_nombre'})
+        self.assertEqual(response.data['results'][0], {'numeroot': 'OT-001', 'tecnico_nombre': 'Juan Pérez'})
+        response = self.client.get("/api/ordenes-trabajo/", {'compacto': 'true'})
+        self.assertNotIn('actividades', response.data['results'][0])
+        self.assertIn('estado_nombre', response.data['results'][0])
+
+
+class EquipoBusquedaAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='operador', password='operador')
+        Usuarios.objects.create(user=self.user, idrol=Roles.objects.create(nombrerol="Operador"))
+        self.client.force_authenticate(user=self.user)
+        tipo_equipo = TiposEquipo.objects.create(nombretipo="Camión")
+        estado_equipo = EstadosEquipo.objects.create(nombreestado="Operativo")
+        self.faena = Faenas.objects.create(nombrefaena="Faena Norte")
+        for codigo, nombre in [("CT-01", "Camión Tolva 1"), ("CT-02", "Camión Tolva 2"),
+                               ("MC-01", "Minicargador Bobcat"), ("EX-01", "Excavadora Tolva Larga")]:
+            Equipos.objects.create(
+                codigointerno=codigo,
+                nombreequipo=nombre,
+                idtipoequipo=tipo_equipo,
+                idestadoactual=estado_equipo,
+                idfaenaactual=self.faena
+            )
+
+    def test_columnas_normalizadas(self):
+        equipo = Equipos.objects.get(codigointerno="CT-01")
+        self.assertEqual(equipo.nombrebusqueda, "camion tolva 1")
+        self.assertEqual(equipo.codigobusqueda, "ct-01")
+
+    def test_busqueda_por_codigo_exacto_primero(self):
+        response = self.client.get("/api/equipos/search/", {"q": "ct-02"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["resultados"][0]["codigointerno"], "CT-02")
+
+    def test_busqueda_sin_tildes_ordena_prefijos_antes_que_parciales(self):
+        response = self.client.get("/api/equipos/search/", {"q": "TOLVA", "limit": 10})
+        nombres = [r["nombreequipo"] for r in response.data["resultados"]]
+        self.assertEqual(nombres, ["Camión Tolva 1", "Camión Tolva 2", "Excavadora Tolva Larga"])
+
+        response = self.client.get("/api/equipos/search/", {"q": "m", "limit": 10})
+        nombres = [r["nombreequipo"] for r in response.data["resultados"]]
+        self.assertEqual(nombres, ["Minicargador Bobcat", "Camión Tolva 1", "Camión Tolva 2"])
+
+        response = self.client.get("/api/equipos/search/", {"q": "camion", "limit": 1})
+        self.assertEqual(len(response.data["resultados"]), 1)
+        self.assertEqual(response.data["resultados"][0]["faena_nombre"], "Faena Norte")
+
+    def test_busqueda_sin_termino(self):
+        response = self.client.get("/api/equipos/search/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filtro_por_faena(self):
+        response = self.client.get("/api/equipos/search/", {"q": "tolva", "faena": self.faena.pk, "limit": 10})
+        self.assertEqual(len(response.data["resultados"]), 3)
+        response = self.client.get("/api/equipos/search/", {"q": "tolva", "faena": "norte"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ChecklistCompletarTest(BlobStoreTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='operador', password='operador')
+        self.client.force_authenticate(user=self.user)
+        self.tipo_equipo = TiposEquipo.objects.create(nombretipo="Minicargador")
+        estado_equipo = EstadosEquipo.objects.create(nombreestado="Operativo")
+        self.equipo = Equipos.objects.create(
+            codigointerno="MC-01",
+            nombreequipo="Minicargador 1",
+            idtipoequipo=self.tipo_equipo,
+            idestadoactual=estado_equipo
+        )
+        self.template = ChecklistTemplate.objects.create(nombre="Check List Minicargador", tipo_equipo=self.tipo_equipo)
+        category = ChecklistCategory.objects.create(template=self.template, nombre="Motor", orden=1)
+        self.items = [
+            ChecklistItem.objects.create(category=category, texto=f"Ítem {i}", orden=i)
+            for i in range(90)
+        ]
+        otra_template = ChecklistTemplate.objects.create(nombre="Check List Camioneta", tipo_equipo=self.tipo_equipo)
+        otra_category = ChecklistCategory.objects.create(template=otra_template, nombre="Luces", orden=1)
+        self.item_ajeno = ChecklistItem.objects.create(category=otra_category, texto="Luces altas", orden=1)
+
+    def payload(self, items, fecha='2025-07-01'):
+        return {
+            'template': self.template.id_template,
+            'equipo': self.equipo.idequipo,
+            'fecha_inspeccion': fecha,
+            'horometro_inspeccion': 1200,
+            'answers': [{'item': item.id_item, 'estado': 'bueno'} for item in items],
+            'imagenes': [{'descripcion': 'Frontal', 'imagen_base64': 'aGVsbG8='}],
+        }
+
+    def test_consultas_independientes_de_la_cantidad_de_respuestas(self):
+        with CaptureQueriesContext(connection) as pocas:
+            response = self.client.post("/api/checklist-workflow/completar-checklist/", self.payload(self.items[:2]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as todas:
+            # Otra fecha, para que ambas solicitudes creen su resumen diario.
+            response = self.client.post("/api/checklist-workflow/completar-checklist/", self.payload(self.items, '2025-07-02'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(pocas), len(todas))
+        self.assertLessEqual(len(todas), 18)
+
+        instance = ChecklistInstance.objects.get(id_instance=response.data['id_instance'])
+        self.assertEqual(instance.answers.count(), 90)
+        self.assertEqual(instance.imagenes.count(), 1)
+
+    def test_item_de_otra_plantilla_es_rechazado(self):
+        response = self.client.post(
+            "/api/checklist-workflow/completar-checklist/",
+            self.payload([self.items[0], self.item_ajeno]),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('answers', response.data)
+        self.assertEqual(ChecklistInstance.objects.count(), 0)
+
+    def test_item_repetido_es_rechazado(self):
+        response = self.client.post(
+            "/api/checklist-workflow/completar-checklist/",
+            self.payload([self.items[0], self.items[0]]),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_patch_sin_plantilla_valida_contra_la_de_la_instancia(self):
+        response = self.client.post("/api/checklist-workflow/completar-checklist/", self.payload(self.items[:1]), format='json')
+        instance = ChecklistInstance.objects.get(id_instance=response.data['id_instance'])
+
+        serializer = ChecklistInstanceSerializer(instance, data={'answers': [{'item': self.items[1].id_item, 'estado': 'malo'}]}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer = ChecklistInstanceSerializer(instance, data={'answers': [{'item': self.item_ajeno.id_item, 'estado': 'malo'}]}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('answers', serializer.errors)
+
+    def test_multipart_con_fotos_como_archivos(self):
+        from PIL import Image
+        fotos = []
+        for color in ((255, 0, 0), (0, 0, 255)):
+            buffer = io.BytesIO()
+            Image.new('RGB', (640, 480), color).save(buffer, format='JPEG')
+            fotos.append(SimpleUploadedFile('foto.jpg', buffer.getvalue(), content_type='image/jpeg'))
+
+        datos = self.payload(self.items[:3])
+        datos.pop('imagenes')
+        datos['answers'] = json.dumps(datos['answers'])
+        datos['imagenes_descripciones'] = json.dumps(['Frontal', 'Trasera'])
+        datos['imagenes'] = fotos
+        response = self.client.post("/api/checklist-workflow/completar-checklist/", datos, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        instance = ChecklistInstance.objects.get(id_instance=response.data['id_instance'])
+        self.assertEqual(instance.answers.count(), 3)
+        imagenes = list(instance.imagenes.order_by('descripcion'))
+        self.assertEqual([i.descripcion for i in imagenes], ['Frontal', 'Trasera'])
+        for imagen in imagenes:
+            self.assertEqual(imagen.imagen_base64, '')
+            self.assertTrue(get_blob_store().exists(imagen.imagen_blob))
+            self.assertTrue(get_blob_store().exists(imagen.imagen_miniatura_blob))
+
+    def test_multipart_con_answers_invalido(self):
+        datos = self.payload(self.items[:1])
+        datos.pop('imagenes')
+        datos['answers'] = '[{"item": '
+        response = self.client.post("/api/checklist-workflow/completar-checklist/", datos, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ChecklistInstance.objects.count(), 0)
+
+    @override_settings(CMMS_CACHE_COMPARTIDA=True)
+    def test_escrituras_masivas_invalidan_tags(self):
+        tags = [tag_modelo(modelo) for modelo in (ChecklistAnswer, ChecklistImage, ChecklistItem, ConformidadDiariaChecklist)]
+        antes = versiones_tags(tags)
+        datos = self.payload(self.items[:2])
+        datos['answers'][0]['estado'] = 'malo'
+        response = self.client.post("/api/checklist-workflow/completar-checklist/", datos, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        despues = versiones_tags(tags)
+        self.assertTrue(all(a != d for a, d in zip(antes, despues)), (antes, despues))
+
+        recalcular_fallas_items()
+        self.assertNotEqual(versiones_tags([tag_modelo(ChecklistItem)]), despues[2:3])
+
+    def test_rechazado_no_deja_blobs(self):
+        response = self.client.post(
+            "/api/checklist-workflow/completar-checklist/",
+            self.payload([self.items[0], self.item_ajeno]),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([archivos for _, _, archivos in os.walk(self.blob_root) if archivos], [])
+
+    def test_formulario_url_encoded(self):
+        datos = self.payload(self.items[:2])
+        datos.pop('imagenes')
+        datos['answers'] = json.dumps(datos['answers'])
+        response = self.client.post(
+            "/api/checklist-workflow/completar-checklist/",
+            urlencode(datos),
+            content_type='application/x-www-form-urlencoded'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        instance = ChecklistInstance.objects.get(id_instance=response.data['id_instance'])
+        self.assertEqual(instance.answers.count(), 2)
+
+
+class ConformidadDatosMixin:
+    """ Equipos, plantilla y checklists de prueba para los reportes de conformidad. """
+    URL = "/api/checklist-workflow/reportes/conformidad/"
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='supervisor', password='supervisor')
+        self.client.force_authenticate(user=self.user)
+        self.tipo_equipo = TiposEquipo.objects.create(nombretipo="Camión")
+        estado_equipo = EstadosEquipo.objects.create(nombreestado="Operativo")
+        self.equipos = [
+            Equipos.objects.create(codigointerno=f"CT-{i:02d}", nombreequipo=f"Camión {i}", idtipoequipo=self.tipo_equipo, idestadoactual=estado_equipo)
+            for i in range(1, 3)
+        ]
+        self.template = ChecklistTemplate.objects.create(nombre="Check List Camión", tipo_equipo=self.tipo_equipo)
+        category = ChecklistCategory.objects.create(template=self.template, nombre="Frenos", orden=1)
+        self.critico = ChecklistItem.objects.create(category=category, texto="Freno de servicio", orden=1, es_critico=True)
+        self.no_critico = ChecklistItem.objects.create(category=category, texto="Espejos", orden=2)
+
+    def crear_checklists(self, cantidad, fecha):
+        """
+        Crea `cantidad` checklists repartidos entre los equipos con bulk_create:
+        uno de cada tres con falla crítica y uno de cada dos con falla no crítica.
+        """
+        instancias = ChecklistInstance.objects.bulk_create([
+            ChecklistInstance(
+                template=self.template, equipo=self.equipos[i % len(self.equipos)],
+                operador=self.user, fecha_inspeccion=fecha, horometro_inspeccion=i
+            )
+            for i in range(cantidad)
+        ], batch_size=5000)
+        ChecklistAnswer.objects.bulk_create([
+            ChecklistAnswer(instance=instancia, item=item, estado=estado)
+            for i, instancia in enumerate(instancias)
+            for item, estado in (
+                (self.critico, 'malo' if i % 3 == 0 else 'bueno'),
+                (self.no_critico, 'malo' if i % 2 == 0 else 'bueno'),
+            )
+        ], batch_size=5000)
+        # bulk_create no pasa por completar_checklist: se reconstruyen resumen y contadores.
+        reconstruir_conformidad()
+        recalcular_fallas_items()
+        return instancias
+
+
+class ReporteConformidadTest(ConformidadDatosMixin, TestCase):
+    def test_conformidad_por_equipo_en_una_consulta(self):
+        hoy = timezone.now().date()
+        self.crear_checklists(6, hoy)
+        # Fuera del período: no debe contarse.
+        self.crear_checklists(2, hoy - timedelta(days=60))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_checklists_periodo'], 6)
+        # Camión 1 recibe los checklists 0, 2 y 4; Camión 2 los 1, 3 y 5.
+        self.assertEqual(response.data['conformidad_por_equipo'], {
+            'Camión 1 (CT-01)': {
+                'total_checklists': 3, 'checklists_conformes': 2, 'fallas_criticas': 1,
+                'fallas_no_criticas': 3, 'porcentaje_conformidad': 66.67,
+            },
+            'Camión 2 (CT-02)': {
+                'total_checklists': 3, 'checklists_conformes': 2, 'fallas_criticas': 1,
+                'fallas_no_criticas': 0, 'porcentaje_conformidad': 66.67,
+            },
+        })
+
+    def test_filtra_por_tipo_de_equipo(self):
+        self.crear_checklists(4, timezone.now().date())
+        otro_tipo = TiposEquipo.objects.create(nombretipo="Cargador")
+        response = self.client.get(self.URL, {'tipo_equipo': otro_tipo.idtipoequipo})
+        self.assertEqual(response.data['total_checklists_periodo'], 0)
+        self.assertEqual(response.data['conformidad_por_equipo'], {})
+
+    def test_completar_checklist_actualiza_resumen(self):
+        hoy = timezone.now().date()
+        for estados in (('malo', 'malo'), ('bueno', 'malo'), ('bueno', 'bueno')):
+            response = self.client.post("/api/checklist-workflow/completar-checklist/", {
+                'template': self.template.id_template,
+                'equipo': self.equipos[0].idequipo,
+                'fecha_inspeccion': hoy.isoformat(),
+                'horometro_inspeccion': 100,
+                'answers': [
+                    {'item': self.critico.id_item, 'estado': estados[0]},
+                    {'item': self.no_critico.id_item, 'estado': estados[1]},
+                ],
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        resumen = ConformidadDiariaChecklist.objects.get(equipo=self.equipos[0], template=self.template, fecha=hoy)
+        self.assertEqual(
+            (resumen.total_checklists, resumen.checklists_conformes, resumen.checklists_con_fallas,
+             resumen.fallas_criticas, resumen.fallas_no_criticas),
+            (3, 2, 2, 1, 2)
+        )
+        # El resumen incremental coincide con uno reconstruido desde cero.
+        reconstruir_conformidad()
+        reconstruido = ConformidadDiariaChecklist.objects.get(equipo=self.equipos[0], template=self.template, fecha=hoy)
+        self.assertEqual(
+            [getattr(reconstruido, campo) for campo in CAMPOS_CONTADORES],
+            [getattr(resumen, campo) for campo in CAMPOS_CONTADORES]
+        )
+
+        self.critico.refresh_from_db()
+        self.no_critico.refresh_from_db()
+        self.assertEqual((self.critico.total_fallas, self.no_critico.total_fallas), (1, 2))
+
+        historial = self.client.get(f"/api/checklist-workflow/historial-equipo/{self.equipos[0].idequipo}/")
+        self.assertEqual(historial.data['estadisticas'], {
+            'total_checklists': 3,
+            'checklists_con_fallas': 2,
+            'checklists_con_fallas_criticas': 1,
+            'porcentaje_conformidad': 33.33,
+        })
+
+    def test_editar_y_eliminar_checklists_recalcula_resumen(self):
+        hoy = timezone.now().date()
+        instancias = self.crear_checklists(2, hoy)
+        instancia = instancias[0]  # Camión 1, con falla crítica y no crítica
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ChecklistAnswer.objects.filter(instance=instancia, item=self.critico).update(estado='bueno')
+            respuesta = ChecklistAnswer.objects.get(instance=instancia, item=self.critico)
+            respuesta.save()
+        resumen = ConformidadDiariaChecklist.objects.get(equipo=self.equipos[0])
+        self.assertEqual((resumen.checklists_conformes, resumen.fallas_criticas), (1, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            instancia.fecha_inspeccion = hoy - timedelta(days=1)
+            instancia.save()
+        self.assertFalse(ConformidadDiariaChecklist.objects.filter(equipo=self.equipos[0], fecha=hoy).exists())
+        self.assertEqual(ConformidadDiariaChecklist.objects.get(equipo=self.equipos[0]).fecha, hoy - timedelta(days=1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            instancia.delete()
+        self.assertFalse(ConformidadDiariaChecklist.objects.filter(equipo=self.equipos[0]).exists())
+
+    def test_comando_reconstruye_rango(self):
+        hoy = timezone.now().date()
+        self.crear_checklists(4, hoy)
+        ConformidadDiariaChecklist.objects.all().delete()
+        call_command('reconstruir_conformidad_checklist', desde=hoy.isoformat(), stdout=io.StringIO())
+        self.assertEqual(ConformidadDiariaChecklist.objects.count(), 2)
+        self.assertEqual(sum(ConformidadDiariaChecklist.objects.values_list('total_checklists', flat=True)), 4)
+
+    def test_elementos_mas_fallidos_agrupa_en_la_base_de_datos(self):
+        self.crear_checklists(6, timezone.now().date())
+        url = "/api/checklist-workflow/elementos-mas-fallidos/"
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        elementos = response.data['elementos_mas_fallidos']
+        self.assertEqual([e['elemento'] for e in elementos], ['Espejos', 'Freno de servicio'])
+        self.assertEqual(elementos[0]['cantidad_fallas'], 3)
+        self.assertEqual(elementos[0]['equipos_afectados'], ['Camión 1'])
+        self.assertEqual(elementos[1]['cantidad_fallas'], 2)
+        self.assertEqual(elementos[1]['equipos_afectados'], ['Camión 1', 'Camión 2'])
+        self.assertTrue(elementos[1]['es_critico'])
+
+        response = self.client.get(url, {'limit': 1})
+        self.assertEqual(len(response.data['elementos_mas_fallidos']), 1)
+
+        faena = Faenas.objects.create(nombrefaena="Faena Norte")
+        Equipos.objects.filter(pk=self.equipos[1].pk).update(idfaenaactual=faena)
+        response = self.client.get(url, {'faena': faena.idfaena})
+        self.assertEqual(
+            [(e['elemento'], e['cantidad_fallas']) for e in response.data['elementos_mas_fallidos']],
+            [('Freno de servicio', 1)]
+        )
+
+    def test_elementos_mas_fallidos_acumulado_usa_contador(self):
+        self.crear_checklists(6, timezone.now().date() - timedelta(days=400))
+        url = "/api/checklist-workflow/elementos-mas-fallidos/"
+        self.assertEqual(self.client.get(url).data['elementos_mas_fallidos'], [])
+
+        response = self.client.get(url, {'acumulado': 'true'})
+        self.assertEqual(
+            [(e['elemento'], e['cantidad_fallas']) for e in response.data['elementos_mas_fallidos']],
+            [('Espejos', 3), ('Freno de servicio', 2)]
+        )
+        # Los equipos afectados sí se limitan al período.
+        self.assertEqual([e['equipos_afectados'] for e in response.data['elementos_mas_fallidos']], [[], []])
+        hasta = timezone.now().date()
+        response = self.client.get(url, {
+            'acumulado': 'true', 'fecha_inicio': hasta - timedelta(days=500), 'fecha_fin': hasta,
+        })
+        self.assertEqual(
+            [e['equipos_afectados'] for e in response.data['elementos_mas_fallidos']],
+            [['Camión 1'], ['Camión 1', 'Camión 2']]
+        )
+
+        # El contador no distingue faenas.
+        faena = Faenas.objects.create(nombrefaena="Faena Norte")
+        response = self.client.get(url, {'acumulado': 'true', 'faena': faena.idfaena})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(os.environ.get('CMMS_BENCHMARK'), "Benchmark: definir CMMS_BENCHMARK=1 para ejecutarlo")
+class ReporteConformidadBenchmarkTest(ConformidadDatosMixin, TestCase):
+    """ 50.000 checklists en el período: el reporte debe responder en menos de un segundo. """
+
+    def test_benchmark_50k_checklists(self):
+        self.crear_checklists(50000, timezone.now().date())
+        inicio = time.perf_counter()
+        response = self.client.get(self.URL)
+        duracion = time.perf_counter() - inicio
+        self.assertEqual(response.data['total_checklists_periodo'], 50000)
+        logger.info("reporte_conformidad con 50k checklists: %.0f ms", duracion * 1000)
+        self.assertLess(duracion, 1.0)
+
+
+class ImagenesBlobStoreTest(BlobStoreTemporalMixin, TestCase):
+    PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 32
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='tecnico', password='tecnico')
+        self.client.force_authenticate(user=self.user)
+        tipo_equipo = TiposEquipo.objects.create(nombretipo="Camión")
+        estado_equipo = EstadosEquipo.objects.create(nombreestado="Operativo")
+        equipo = Equipos.objects.create(codigointerno="CT-01", nombreequipo="Camión 1", idtipoequipo=tipo_equipo, idestadoactual=estado_equipo)
+        self.ot = OrdenesTrabajo.objects.create(
+            numeroot="OT-001",
+            idequipo=equipo,
+            idtipomantenimientoot=TiposMantenimientoOT.objects.create(nombretipomantenimientoot="Correctivo"),
+            idestadoot=EstadosOrdenTrabajo.objects.create(nombreestadoot="Abierta"),
+            idsolicitante=self.user
+        )
+        self.base64_png = 'data:image/png;base64,' + base64.b64encode(self.PNG).decode()
+
+    def test_evidencia_se_guarda_en_blob_store_y_retorna_url(self):
+        response = self.client.post("/api/evidencias-ot/", {
+            'idordentrabajo': self.ot.idordentrabajo,
+            'descripcion': 'Antes',
+            'imagen_base64': self.base64_png,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('imagen_base64', response.data)
+
+        evidencia = EvidenciaOT.objects.get()
+        self.assertEqual(evidencia.imagen_base64, '')
+        self.assertTrue(evidencia.imagen_blob.endswith('.png'))
+        self.assertTrue(response.data['imagen_url'].endswith(f'/api/blobs/{evidencia.imagen_blob}/'))
+
+        imagen = self.client.get(f'/api/blobs/{evidencia.imagen_blob}/')
+        self.assertEqual(imagen.status_code, status.HTTP_200_OK)
+        self.assertEqual(imagen['Content-Type'], 'image/png')
+        self.assertEqual(b''.join(imagen.streaming_content), self.PNG)
+        self.assertEqual(imagen['Cache-Control'], 'private, max-age=31536000, immutable')
+
+        # Conocer el hash no basta: se requiere autenticación.
+        anonimo = APIClient().get(f'/api/blobs/{evidencia.imagen_blob}/')
+        self.assertEqual(anonimo.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_imagenes_repetidas_se_almacenan_una_vez(self):
+        for descripcion in ('Antes', 'Después'):
+            self.client.post("/api/evidencias-ot/", {
+                'idordentrabajo': self.ot.idordentrabajo,
+                'descripcion': descripcion,
+                'imagen_base64': self.base64_png,
+            }, format='json')
+        claves = set(EvidenciaOT.objects.values_list('imagen_blob', flat=True))
+        self.assertEqual(len(claves), 1)
+
+    def test_base64_invalido_es_rechazado(self):
+        response = self.client.post("/api/evidencias-ot/", {
+            'idordentrabajo': self.ot.idordentrabajo,
+            'imagen_base64': 'esto no es base64!',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_guardar_archivo_por_bloques_usa_la_misma_clave(self):
+        store = get_blob_store()
+        contenido = self.PNG + b'\x01' * 200000
+        clave = store.save_file(io.BytesIO(contenido))
+        self.assertEqual(clave, store.calcular_clave(contenido))
+        with store.open(clave) as archivo:
+            self.assertEqual(archivo.read(), contenido)
+
+    def test_clave_invalida_retorna_404(self):
+        response = self.client.get('/api/blobs/..%2F..%2Fsettings.py/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_comando_migra_registros_existentes(self):
+        legado = EvidenciaOT.objects.create(idordentrabajo=self.ot, imagen_base64=self.base64_png, usuario_subida=self.user)
+        EvidenciaOT.objects.create(idordentrabajo=self.ot, imagen_base64='no-es-base64!', usuario_subida=self.user)
+
+        response = self.client.get(f"/api/evidencias-ot/{legado.idevidencia}/")
+        self.assertIsNone(response.data['imagen_url'])
+        self.assertEqual(response.data['imagen_base64'], self.base64_png)
+
+        call_command('migrar_imagenes_blob', batch_size=1, stdout=io.StringIO())
+        legado.refresh_from_db()
+        self.assertEqual(legado.imagen_base64, '')
+        self.assertTrue(legado.imagen_blob.endswith('.png'))
+        self.assertEqual(EvidenciaOT.objects.filter(imagen_blob='').count(), 1)
+
+
+class ImagenesDerivadosTest(BlobStoreTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='tecnico', password='tecnico')
+        self.client.force_authenticate(user=self.user)
+        tipo_equipo = TiposEquipo.objects.create(nombretipo="Camión")
+        estado_equipo = EstadosEquipo.objects.create(nombreestado="Operativo")
+        equipo = Equipos.objects.create(codigointerno="CT-01", nombreequipo="Camión 1", idtipoequipo=tipo_equipo, idestadoactual=estado_equipo)
+        self.ot = OrdenesTrabajo.objects.create(
+            numeroot="OT-001",
+            idequipo=equipo,
+            idtipomantenimientoot=TiposMantenimientoOT.objects.create(nombretipomantenimientoot="Correctivo"),
+            idestadoot=EstadosOrdenTrabajo.objects.create(nombreestadoot="Abierta"),
+            idsolicitante=self.user
+        )
+
+    @staticmethod
+    def _foto_con_exif(ancho=3000, alto=2000):
+        from PIL import Image
+        imagen = Image.new('RGB', (ancho, alto), (200, 30, 30))
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientación: rotada 90°
+        exif[0x010F] = 'Camara de prueba'
+        buffer = io.BytesIO()
+        imagen.save(buffer, format='JPEG', exif=exif.tobytes())
+        return buffer.getvalue()
+
+    def _leer_blob(self, clave):
+        from PIL import Image
+        with get_blob_store().open(clave) as archivo:
+            return Image.open(io.BytesIO(archivo.read()))
+
+    def test_genera_derivados_sin_exif_y_orientados(self):
+        foto = 'data:image/jpeg;base64,' + base64.b64encode(self._foto_con_exif()).decode()
+        response = self.client.post("/api/evidencias-ot/", {
+            'idordentrabajo': self.ot.idordentrabajo,
+            'imagen_base64': foto,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        evidencia = EvidenciaOT.objects.get()
+
+        original = self._leer_blob(evidencia.imagen_blob)
+        medio = self._leer_blob(evidencia.imagen_medio_blob)
+        miniatura = self._leer_blob(evidencia.imagen_miniatura_blob)
+        # La orientación EXIF se aplica a los píxeles: la foto queda vertical.
+        self.assertEqual(original.size[1], 2048)
+        self.assertLess(original.size[0], original.size[1])
+        self.assertEqual(max(medio.size), 1024)
+        self.assertEqual(max(miniatura.size), 256)
+        for imagen in (original, medio, miniatura):
+            self.assertEqual(imagen.format, 'JPEG')
+            self.assertEqual(len(imagen.getexif()), 0)
+
+        self.assertTrue(response.data['imagen_miniatura_url'].endswith(f'/api/blobs/{evidencia.imagen_miniatura_blob}/'))
+        self.assertTrue(response.data['imagen_medio_url'].endswith(f'/api/blobs/{evidencia.imagen_medio_blob}/'))
+
+    def test_listado_retorna_solo_miniaturas(self):
+        foto = 'data:image/jpeg;base64,' + base64.b64encode(self._foto_con_exif(400, 300)).decode()
+        self.client.post("/api/evidencias-ot/", {
+            'idordentrabajo': self.ot.idordentrabajo,
+            'imagen_base64': foto,
+        }, format='json')
+        evidencia = EvidenciaOT.objects.get()
+
+        response = self.client.get("/api/evidencias-ot/")
+        resultado = response.data['results'][0] if 'results' in response.data else response.data[0]
+        self.assertTrue(resultado['imagen_miniatura_url'].endswith(f'/api/blobs/{evidencia.imagen_miniatura_blob}/'))
+        self.assertNotIn('imagen_url', resultado)
+        self.assertNotIn('imagen_base64', resultado)
+
+        detalle = self.client.get(f"/api/evidencias-ot/{evidencia.idevidencia}/")
+        self.assertIn('imagen_url', detalle.data)
+
+    def test_comando_genera_derivados_faltantes(self):
+        clave = get_blob_store().save(self._foto_con_exif(600, 400))
+        evidencia = EvidenciaOT.objects.create(idordentrabajo=self.ot, imagen_blob=clave, usuario_subida=self.user)
+
+        call_command('migrar_imagenes_blob', solo_derivados=True, stdout=io.StringIO())
+        evidencia.refresh_from_db()
+        self.assertNotEqual(evidencia.imagen_miniatura_blob, '')
+        self.assertEqual(max(self._leer_blob(evidencia.imagen_miniatura_blob).size), 256)
+
+
+# Las pruebas corren en un solo proceso: la caché en memoria local sirve como compartida.
+@override_settings(CMMS_CACHE_COMPARTIDA=True)
+class DashboardKPIsTest(TestCase):
+    URL = "/api/mantenimiento-workflow/dashboard/"
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='supervisor', password='supervisor')
+        self.client.force_authenticate(user=self.user)
+        tipo_equipo = TiposEquipo.objects.create(nombretipo="Camión")
+        operativo = EstadosEquipo.objects.create(nombreestado="Operativo")
+        EstadosEquipo.objects.create(nombreestado="En Reparación")
+        self.equipos = [
+            Equipos.objects.create(codigointerno=f"CT-{i}", nombreequipo=f"Camión {i}", idtipoequipo=tipo_equipo, idestadoactual=operativo, activo=i < 2)
+            for i in range(3)
+        ]
+        correctivo = TiposMantenimientoOT.objects.create(nombretipomantenimientoot="Correctivo")
+        TiposMantenimientoOT.objects.create(nombretipomantenimientoot="Preventivo")
+        self.abierta = EstadosOrdenTrabajo.objects.create(nombreestadoot="Abierta")
+        ayer = timezone.now().date() - timedelta(days=1)
+        for i, fecha in enumerate((ayer, None)):
+            OrdenesTrabajo.objects.create(
+                numeroot=f"OT-{i}", idequipo=self.equipos[0], idtipomantenimientoot=correctivo,
+                idestadoot=self.abierta, idsolicitante=self.user, fechaejecucion=fecha
+            )
+        cache.clear()
+
+    def test_kpis_en_consultas_agrupadas(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(self.URL)
+        self.assertEqual(response.data['estadisticas_generales'], {
+            'total_equipos': 2,
+            'equipos_operativos': 2,
+            'ots_abiertas': 2,
+            'ots_vencidas': 1,
+            'mantenimientos_proximos': 0,
+        })
+        self.assertEqual(response.data['equipos_por_estado'], [
+            {'nombreestado': 'En Reparación', 'cantidad': 0},
+            {'nombreestado': 'Operativo', 'cantidad': 3},
+        ])
+        self.assertEqual(response.data['ots_por_tipo'], [
+            {'nombretipomantenimientoot': 'Correctivo', 'cantidad': 2},
+            {'nombretipomantenimientoot': 'Preventivo', 'cantidad': 0},
+        ])
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_snapshot_en_cache_y_etag(self):
+        primera = self.client.get(self.URL)
+        etag = primera['ETag']
+
+        with self.assertNumQueries(0):
+            no_modificado = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(no_modificado.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(no_modificado['ETag'], etag)
+
+        # Guardar una OT invalida la instantánea.
+        OrdenesTrabajo.objects.filter(numeroot="OT-0").get().delete()
+        actualizada = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(actualizada.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(actualizada['ETag'], etag)
+        self.assertEqual(actualizada.data['estadisticas_generales']['ots_abiertas'], 1)
+
+
+@override_settings(CMMS_CACHE_COMPARTIDA=True)
+class CacheAPITest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='operador', password='operador')
+        Usuarios.objects.create(user=self.user, idrol=Roles.objects.create(nombrerol="Operador"))
+        self.client.force_authenticate(user=self.user)
+        Faenas.objects.create(nombrefaena="Faena Norte")
+
+    def test_invalidacion_por_tag(self):
+        calculos = []
+
+        def calcular():
+            calculos.append(1)
+            return len(calculos)
+
+        self.assertEqual(obtener_o_calcular('prueba:a', calcular, tags=['x', 'y']), 1)
+        self.assertEqual(obtener_o_calcular('prueba:a', calcular, tags=['x', 'y']), 1)
+        invalidar_tags('z')
+        self.assertEqual(obtener_o_calcular('prueba:a', calcular, tags=['x', 'y']), 1)
+        invalidar_tags('y')
+        self.assertEqual(obtener_o_calcular('prueba:a', calcular, tags=['x', 'y']), 2)
+
+    @override_settings(CMMS_CACHE_COMPARTIDA=False, CMMS_CACHE_TTL_LOCAL=1)
+    def test_sin_cache_compartida_entradas_con_tags_de_vida_corta(self):
+        calculos = []
+
+        def calcular():
+            calculos.append(1)
+            return len(calculos)
+
+        self.assertEqual(obtener_o_calcular('prueba:c', calcular, tags=['x']), 1)
+        self.assertEqual(obtener_o_calcular('prueba:c', calcular, tags=['x']), 1)
+        self.assertEqual(obtener_o_calcular('prueba:d', calcular), 2)
+        # Otro worker no vería una invalidación: las entradas con tags expiran pronto.
+        time.sleep(1.1)
+        self.assertEqual(obtener_o_calcular('prueba:c', calcular, tags=['x']), 3)
+        self.assertEqual(obtener_o_calcular('prueba:d', calcular), 2)
+
+    def test_version_por_clave(self):
+        obtener_o_calcular('prueba:b', lambda: 'v1', version=1)
+        self.assertEqual(obtener('prueba:b', version=1), (True, 'v1'))
+        self.assertEqual(obtener('prueba:b', version=2), (False, None))
+        self.assertEqual(obtener_o_calcular('prueba:b', lambda: 'v2', version=2), 'v2')
+
+    def test_catalogo_en_cache_e_invalidado_al_guardar(self):
+        response = self.client.get("/api/faenas/")
+        self.assertEqual(response.data['count'], 1)
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get("/api/faenas/")
+        self.assertEqual(response.data['count'], 1)
+        self.assertFalse([q for q in consultas.captured_queries if '"faenas"' in q['sql']])
+
+        Faenas.objects.create(nombrefaena="Faena Sur")
+        response = self.client.get("/api/faenas/")
+        self.assertEqual(response.data['count'], 2)
+
+
+class CacheConfiguracionPorDefectoTest(TestCase):
+    """ Con la configuración de settings.py, sin CMMS_CACHE_COMPARTIDA ni Redis. """
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='operador', password='operador')
+        Usuarios.objects.create(user=self.user, idrol=Roles.objects.create(nombrerol="Operador"))
+        self.client.force_authenticate(user=self.user)
+        Faenas.objects.create(nombrefaena="Faena Norte")
+
+    def test_catalogo_en_cache(self):
+        self.client.get("/api/faenas/")
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get("/api/faenas/")
+        self.assertEqual(response.data['count'], 1)
+        self.assertFalse([q for q in consultas.captured_queries if '"faenas"' in q['sql']])
+
+        Faenas.objects.create(nombrefaena="Faena Sur")
+        self.assertEqual(self.client.get("/api/faenas/").data['count'], 2)
+
+
+@override_settings(CMMS_CACHE_COMPARTIDA=True)
+class RolesEnCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='operador', password='operador')
+        self.usuario = Usuarios.objects.create(user=self.user, idrol=Roles.objects.create(nombrerol="Operador"))
+        self.client.force_authenticate(user=self.user)
+
+    def test_permisos_sin_consultas_con_rol_en_cache(self):
+        self.client.get("/api/faenas/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/faenas/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cambio_de_rol_invalida_la_cache(self):
+        self.assertEqual(self.client.get("/api/faenas/").status_code, status.HTTP_200_OK)
+        self.usuario.idrol = Roles.objects.create(nombrerol="Invitado")
+        self.usuario.save()
+        self.assertEqual(self.client.get("/api/faenas/").status_code, status.HTTP_403_FORBIDDEN)
+
+        # Renombrar el rol también invalida la caché.
+        rol = self.usuario.idrol
+        rol.nombrerol = "Técnico"
+        rol.save()
+        self.assertEqual(self.client.get("/api/faenas/").status_code, status.HTTP_200_OK)
+
+
+@override_settings(CMMS_CACHE_COMPARTIDA=True)
+class TokenEnCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        tokens_en_cache.limpiar()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='operador', password='operador')
+        self.usuario = Usuarios.objects.create(user=self.user, idrol=Roles.objects.create(nombrerol="Operador"))
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_y_rol_sin_consultas(self):
+        self.assertEqual(self.client.get("/api/faenas/").status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/faenas/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_logout_invalida_el_token(self):
+        self.assertEqual(self.client.get("/api/faenas/").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post("/api/logout/").status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(tokens_en_cache), 0)
+        self.assertEqual(self.client.get("/api/faenas/").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rotacion_y_cambio_de_rol(self):
+        self.client.get("/api/faenas/")
+        self.usuario.idrol = Roles.objects.create(nombrerol="Invitado")
+        self.usuario.save()
+        self.assertEqual(self.client.get("/api/faenas/").status_code, status.HTTP_403_FORBIDDEN)
+
+        self.token.delete()
+        nuevo = Token.objects.create(user=self.user)
+        self.assertEqual(self.client.get("/api/faenas/").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {nuevo.key}')
+        self.assertEqual(self.client.get("/api/faenas/").status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PaginacionCursorTest(TestCase):
+    URL = "/api/agendas/"
+
+    def setUp(self):
+        self.client = APIClient()
+        creador = User.objects.create_user(username='planificador', password='planificador')
+        inicio = timezone.now().replace(microsecond=0)
+        # Dos eventos por hora, para que el cursor tenga que desempatar por id.
+        self.agendas = [
+            Agendas.objects.create(
+                tituloevento=f"Evento {i}", fechahorainicio=inicio + timedelta(hours=i // 2),
+                fechahorafin=inicio + timedelta(hours=i // 2, minutes=30), idusuariocreador=creador
+            )
+            for i in range(7)
+        ]
+
+    def ids(self, response):
+        return [evento['idagenda'] for evento in response.data['results']]
+
+    def test_por_defecto_paginacion_por_numero(self):
+        response = self.client.get(self.URL)
+        self.assertEqual(response.data['count'], 7)
+
+    def test_recorre_todas_las_paginas_sin_count(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.URL, {'paginacion': 'cursor', 'page_size': 3})
+        self.assertNotIn('count', response.data)
+        self.assertFalse([q for q in consultas.captured_queries if 'COUNT(' in q['sql'].upper()])
+        self.assertIsNone(response.data['previous'])
+
+        vistos = self.ids(response)
+        paginas = [response]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            vistos += self.ids(response)
+            paginas.append(response)
+        self.assertEqual(vistos, [agenda.idagenda for agenda in self.agendas])
+        self.assertEqual(len(paginas), 3)
+
+        anterior = self.client.get(paginas[-1].data['previous'])
+        self.assertEqual(self.ids(anterior), self.ids(paginas[1]))
+        self.assertIsNotNone(anterior.data['next'])
+
+    def test_cursor_invalido(self):
+        response = self.client.get(self.URL, {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_con_valores_de_otro_tipo(self):
+        for valores in (['ayer', 1], ['2025-07-01T08:00:00+00:00', 'uno'], [None, 1], [{}, 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps({'v': valores}).encode()).decode()
+            response = self.client.get(self.URL, {'paginacion': 'cursor', 'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, valores)
+
+
+class IndicesConsultasFrecuentesTest(TestCase):
+    def test_consultas_frecuentes_usan_indices(self):
+        salida = io.StringIO()
+        call_command('explicar_consultas', '--estricto', stdout=salida)
+        self.assertNotIn('[sin índice]', salida.getvalue())
+
+
+def payload_representativo(filas):
+    """ Filas al estilo del calendario / historial, con los tipos que no son JSON nativos. """
+    ahora = timezone.now()
+    return {
+        'count': filas,
+        'results': [
+            {
+                'idordentrabajo': i,
+                'numeroot': f'OT-CORR-{i:06d}',
+                'equipo_nombre': f'Camión Tolva {i % 40}',
+                'estado_nombre': 'Abierta',
+                'prioridad': 'Alta',
+                'medicionvalor': Decimal('12.50') + i,
+                'fechaejecucion': ahora.date() + datetime.timedelta(days=i % 30),
+                'fechacreacionot': ahora - datetime.timedelta(minutes=i),
+                'descripcionproblemareportado': 'Pérdida de presión en circuito hidráulico ' * 3,
+                'actividades': [{'secuencia': s, 'completada': bool(s % 2)} for s in range(3)],
+            }
+            for i in range(filas)
+        ],
+    }
+
+
+class JSONRapidoTest(TestCase):
+    def test_misma_salida_que_json_renderer(self):
+        datos = payload_representativo(5)
+        datos['extra'] = {
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'mensaje': gettext_lazy('Invalid token.'),
+            'separador': 'línea\u2028siguiente',
+            1: 'clave numérica',
+            'utc': datetime.datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        }
+        self.assertEqual(JSONRapidoRenderer().render(datos), JSONRenderer().render(datos))
+
+    def test_indentacion_usa_renderer_estandar(self):
+        datos = payload_representativo(2)
+        tipo = 'application/json; indent=4'
+        self.assertEqual(JSONRapidoRenderer().render(datos, tipo), JSONRenderer().render(datos, tipo))
+
+    def test_parser(self):
+        contenido = '{"texto": "válvula", "valores": [1, 2.5, null]}'.encode()
+        self.assertEqual(JSONRapidoParser().parse(io.BytesIO(contenido)), JSONParser().parse(io.BytesIO(contenido)))
+        with self.assertRaises(ParseError):
+            JSONRapidoParser().parse(io.BytesIO(b'{"valor": NaN}'))
+
+
+@skipUnless(os.environ.get('CMMS_BENCHMARK'), "Benchmark: definir CMMS_BENCHMARK=1 para ejecutarlo")
+class JSONRapidoBenchmarkTest(TestCase):
+    """ Compara el tiempo de render de ambos renderers sobre páginas grandes. """
+
+    def test_benchmark_render(self):
+        for filas in (50, 1000, 10000):
+            datos = payload_representativo(filas)
+            tiempos = {}
+            for renderer in (JSONRenderer(), JSONRapidoRenderer()):
+                inicio = time.perf_counter()
+                for _ in range(5):
+                    renderer.render(datos)
+                tiempos[type(renderer).__name__] = (time.perf_counter() - inicio) / 5
+            logger.info("render de %d filas: JSONRenderer %.1f ms, JSONRapidoRenderer %.1f ms",
+                        filas, tiempos['JSONRenderer'] * 1000, tiempos['JSONRapidoRenderer'] * 1000)
+            self.assertLess(tiempos['JSONRapidoRenderer'], tiempos['JSONRenderer'])
+
+
+class CatalogosOTTest(TestCase):
+    def setUp(self):
+        limpiar_catalogos()
+        self.abierta = EstadosOrdenTrabajo.objects.create(nombreestadoot="Abierta")
+
+    def test_resuelve_una_vez_por_proceso(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(estado_ot('Abierta'), self.abierta)
+        with self.assertNumQueries(0):
+            self.assertEqual(estado_ot('Abierta'), self.abierta)
+
+    def test_invalidado_al_modificar(self):
+        estado_ot('Abierta')
+        self.abierta.descripcion = "OT recién creada."
+        self.abierta.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(estado_ot('Abierta').descripcion, "OT recién creada.")
+
+    def test_fila_creada_se_registra_al_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            correctivo = tipo_mantenimiento_ot('Correctivo', 'Mantenimiento por falla no planificada.')
+            self.assertEqual(correctivo.descripcion, 'Mantenimiento por falla no planificada.')
+        with self.assertNumQueries(0):
+            self.assertEqual(tipo_mantenimiento_ot('Correctivo'), correctivo)
+
+
+@override_settings(CMMS_CACHE_COMPARTIDA=True)
+class CompresionETagTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='operador', password='operador')
+        Usuarios.objects.create(user=self.user, idrol=Roles.objects.create(nombrerol="Operador"))
+        self.client.force_authenticate(user=self.user)
+        for numero in range(40):
+            Faenas.objects.create(nombrefaena=f"Faena {numero:02d}", ubicacion="Región de Antofagasta")
+
+    def test_comprime_respuestas_grandes(self):
+        for codificacion, descomprimir in (('br', brotli.decompress), ('gzip', gzip.decompress)):
+            response = self.client.get("/api/faenas/", HTTP_ACCEPT_ENCODING=codificacion)
+            self.assertEqual(response['Content-Encoding'], codificacion)
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertEqual(json.loads(descomprimir(response.content))['count'], 40)
+
+    def test_no_comprime_respuestas_pequenas(self):
+        faena = Faenas.objects.first()
+        response = self.client.get(f"/api/faenas/{faena.pk}/", HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.json()['nombrefaena'], faena.nombrefaena)
+
+    def test_304_por_version_sin_consultas(self):
+        etag = self.client.get("/api/faenas/")['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/faenas/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        # Otro filtro u otro modelo modificado cambian el ETag.
+        self.assertEqual(self.client.get("/api/faenas/?omit=ubicacion", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        Faenas.objects.create(nombrefaena="Faena Sur")
+        response = self.client.get("/api/faenas/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_304_solo_despues_de_autenticar(self):
+        etag = self.client.get("/api/faenas/")['ETag']
+        # Sin credenciales la solicitud produce el mismo ETag, pero no pasa la autenticación.
+        response = APIClient().get("/api/faenas/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(CMMS_CACHE_COMPARTIDA=False, CMMS_CACHE_TTL_LOCAL=1)
+    def test_sin_cache_compartida_etag_de_vida_corta(self):
+        etag = self.client.get("/api/faenas/")['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/faenas/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Las versiones expiran: una escritura en otro worker se nota a lo más en CMMS_CACHE_TTL_LOCAL.
+        time.sleep(1.1)
+        response = self.client.get("/api/faenas/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_sin_versiones_etag_por_contenido(self):
+        etag = self.client.get("/api/faenas/")['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get("/api/faenas/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertTrue([q for q in consultas.captured_queries if '"faenas"' in q['sql']])
+
+        Faenas.objects.create(nombrefaena="Faena Sur")
+        self.assertEqual(self.client.get("/api/faenas/", HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_etag_incluye_modelos_relacionados(self):
+        tipo = TiposEquipo.objects.create(nombretipo="Camión")
+        Equipos.objects.create(
+            codigointerno="CT-01", nombreequipo="Camión Tolva 1", idtipoequipo=tipo,
+            idestadoactual=EstadosEquipo.objects.create(nombreestado="Operativo"),
+        )
+        etag = self.client.get("/api/equipos/")['ETag']
+        self.assertEqual(self.client.get("/api/equipos/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        tipo.nombretipo = "Camión Tolva"
+        tipo.save()
+        self.assertEqual(self.client.get("/api/equipos/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_por_contenido_fuera_de_los_viewsets(self):
+        response = self.client.get("/api/equipos/search/?q=faena")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        response = self.client.get("/api/equipos/search/?q=faena", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class GenerarAgendaPlanTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='supervisor', password='supervisor')
+        self.client.force_authenticate(user=self.user)
+        self.tipo_equipo = TiposEquipo.objects.create(nombretipo="Camión")
+        self.estado_equipo = EstadosEquipo.objects.create(nombreestado="Operativo")
+        tipo_tarea = TiposTarea.objects.create(nombretipotarea="Preventiva")
+        self.plan = PlanesMantenimiento.objects.create(nombreplan="Plan Camión", idtipoequipo=self.tipo_equipo)
+        for nombre, intervalo, minutos in [("Cambio de aceite", 250, 60), ("Revisión frenos", 500, 90)]:
+            DetallesPlanMantenimiento.objects.create(
+                idplanmantenimiento=self.plan, intervalohorasoperacion=intervalo,
+                idtareaestandar=TareasEstandar.objects.create(
+                    nombretarea=nombre, idtipotarea=tipo_tarea, tiempoestimadominutos=minutos
+                ),
+            )
+        self.correctivo = TiposMantenimientoOT.objects.create(nombretipomantenimientoot="Correctivo")
+        self.abierta = EstadosOrdenTrabajo.objects.create(nombreestadoot="Abierta")
+
+    def crear_equipos(self, cantidad):
+        inicio = Equipos.objects.count()
+        equipos = []
+        for i in range(inicio, inicio + cantidad):
+            equipo = Equipos.objects.create(
+                codigointerno=f"CT-{i:03d}", nombreequipo=f"Camión {i:03d}",
+                idtipoequipo=self.tipo_equipo, idestadoactual=self.estado_equipo
+            )
+            # La OT más reciente es la que define el horómetro.
+            for numero, horometro in enumerate([100, 240 + i]):
+                ot = OrdenesTrabajo.objects.create(
+                    numeroot=f"OT-{i}-{numero}", idequipo=equipo, idtipomantenimientoot=self.correctivo,
+                    idestadoot=self.abierta, idsolicitante=self.user, horometro=horometro
+                )
+                OrdenesTrabajo.objects.filter(pk=ot.pk).update(
+                    fechacreacionot=timezone.now() - timedelta(days=10 - numero)
+                )
+            equipos.append(equipo)
+        return equipos
+
+    def test_eventos_proyectados(self):
+        self.crear_equipos(2)
+        response = self.client.post(f"/api/planes-mantenimiento/{self.plan.pk}/generar-agenda/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['message'], 'Se crearon 4 eventos de agenda')
+        self.assertEqual(response.data['equipos_afectados'], 2)
+        self.assertEqual(Agendas.objects.filter(idplanmantenimiento=self.plan).count(), 4)
+
+        primero = response.data['eventos'][0]
+        evento = Agendas.objects.get(pk=primero['id'])
+        self.assertEqual(primero['tarea'], "Cambio de aceite")
+        self.assertEqual(evento.idequipo.nombreequipo, primero['equipo'])
+        # Horómetro 240 con intervalo de 250: faltan 10 horas, es decir, 1 día.
+        inicio = timezone.localtime(primero['fechahorainicio'])
+        self.assertEqual((inicio.date(), inicio.hour), (timezone.now().date() + timedelta(days=1), 8))
+        self.assertEqual(primero['fechahorafin'] - primero['fechahorainicio'], timedelta(minutes=60))
+        self.assertEqual((evento.tipoevento, evento.colorevento), ('preventivo', '#3B82F6'))
+        self.assertEqual(evento.iddetalleplan.idtareaestandar.nombretarea, "Cambio de aceite")
+        self.assertEqual(evento.fechavencimiento, timezone.now().date() + timedelta(days=1))
+
+        # Generar de nuevo no duplica los eventos ya proyectados.
+        response = self.client.post(f"/api/planes-mantenimiento/{self.plan.pk}/generar-agenda/")
+        self.assertEqual(response.data['eventos'], [])
+        self.assertEqual(Agendas.objects.filter(idplanmantenimiento=self.plan).count(), 4)
+
+    def test_mismo_evento_desde_todos_los_generadores(self):
+        self.crear_equipos(1)
+        self.client.post(f"/api/planes-mantenimiento/{self.plan.pk}/generar-agenda/")
+        campos = ('tituloevento', 'fechahorainicio', 'fechahorafin', 'tipoevento', 'colorevento', 'fechavencimiento')
+        generado = Agendas.objects.filter(iddetalleplan__intervalohorasoperacion=250).values(*campos).get()
+
+        Agendas.objects.all().delete()
+        call_command('generar_agenda_preventiva', dias_adelante=30, stdout=io.StringIO())
+        self.assertEqual(Agendas.objects.values(*campos).get(), generado)
+
+        Agendas.objects.all().delete()
+        self.client.post("/api/agendas/sincronizar-mantenciones/")
+        self.assertEqual(Agendas.objects.values(*campos).get(), generado)
+
+    def test_consultas_constantes(self):
+        self.crear_equipos(2)
+        with CaptureQueriesContext(connection) as pocos:
+            self.client.post(f"/api/planes-mantenimiento/{self.plan.pk}/generar-agenda/")
+        self.crear_equipos(10)
+        with CaptureQueriesContext(connection) as muchos:
+            response = self.client.post(f"/api/planes-mantenimiento/{self.plan.pk}/generar-agenda/")
+        # Los 2 primeros equipos ya tienen sus eventos: solo se crean los de los 10 nuevos.
+        self.assertEqual(len(response.data['eventos']), 20)
+        self.assertEqual(Agendas.objects.count(), 24)
+        self.assertEqual(len(pocos), len(muchos))
+
+    def test_comando_generar_agenda_preventiva(self):
+        self.crear_equipos(1)
+        call_command('generar_agenda_preventiva', dias_adelante=30, stdout=io.StringIO())
+        # Horómetro 240: el cambio de aceite (250 h) vence en 1 día y a las 8 h/día
+        # el siguiente (500 h) cae fuera del período; los frenos vencen en 32 días.
+        evento = Agendas.objects.get()
+        self.assertEqual(timezone.localtime(evento.fechahorainicio).date(), timezone.now().date() + timedelta(days=1))
+        self.assertIn("Horómetro estimado: 250h", evento.descripcionevento)
+
+        self.assertEqual(evento.iddetalleplan.intervalohorasoperacion, 250)
+        self.assertEqual(evento.fechavencimiento, timezone.now().date() + timedelta(days=1))
+
+        # Volver a ejecutarlo no duplica eventos.
+        call_command('generar_agenda_preventiva', dias_adelante=30, stdout=io.StringIO())
+        self.assertEqual(Agendas.objects.count(), 1)
+
+    def test_comando_inserta_solo_faltantes_por_lote(self):
+        self.crear_equipos(6)
+        call_command('generar_agenda_preventiva', dias_adelante=90, stdout=io.StringIO())
+        total = Agendas.objects.count()
+        Agendas.objects.filter(pk__in=Agendas.objects.order_by('?').values('pk')[:3]).delete()
+
+        # Por lote: una consulta de existentes y un INSERT de los faltantes.
+        with CaptureQueriesContext(connection) as consultas:
+            call_command('generar_agenda_preventiva', dias_adelante=90, tamano_lote=3, stdout=io.StringIO())
+        self.assertEqual(Agendas.objects.count(), total)
+        sql = [q['sql'] for q in consultas.captured_queries if '"agendas"' in q['sql']]
+        self.assertEqual(len([q for q in sql if q.startswith('SELECT')]), 2)
+        self.assertLessEqual(len([q for q in sql if q.startswith('INSERT')]), 2)
+
+    def test_clave_natural_unica(self):
+        equipo, = self.crear_equipos(1)
+        detalle = DetallesPlanMantenimiento.objects.first()
+        datos = dict(
+            tituloevento="Mantenimiento", fechahorainicio=timezone.now(), fechahorafin=timezone.now(),
+            idequipo=equipo, idplanmantenimiento=self.plan, idusuariocreador=self.user
+        )
+        # Los eventos que no vienen de una proyección no tienen clave natural.
+        Agendas.objects.create(**datos)
+        Agendas.objects.create(**datos)
+        Agendas.objects.create(**datos, iddetalleplan=detalle, fechavencimiento=timezone.now().date())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Agendas.objects.create(**datos, iddetalleplan=detalle, fechavencimiento=timezone.now().date())
+
+        # La API sigue creando eventos manuales sin la clave.
+        response = self.client.post("/api/agendas/", {
+            'tituloevento': "Reunión", 'fechahorainicio': timezone.now().isoformat(),
+            'fechahorafin': timezone.now().isoformat(), 'idequipo': equipo.pk,
+            'idplanmantenimiento': self.plan.pk, 'idusuariocreador': self.user.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+
+    def programar_ots(self, equipos):
+        predictivo, _ = TiposMantenimientoOT.objects.get_or_create(nombretipomantenimientoot="Predictivo")
+        for equipo in equipos:
+            OrdenesTrabajo.objects.create(
+                numeroot=f"OT-P-{equipo.pk}", idequipo=equipo, idtipomantenimientoot=predictivo,
+                idestadoot=self.abierta, idsolicitante=self.user, idtecnicoasignado=self.user,
+                fechaejecucion=timezone.now().date() + timedelta(days=2)
+            )
+
+    def test_sincronizar_mantenciones(self):
+        equipos = self.crear_equipos(2)
+        self.programar_ots(equipos)
+        # Un evento sin OT no debe impedir la sincronización de las OTs.
+        Agendas.objects.create(
+            tituloevento="Reunión", fechahorainicio=timezone.now(), fechahorafin=timezone.now(),
+            idusuariocreador=self.user
+        )
+        response = self.client.post("/api/agendas/sincronizar-mantenciones/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Por equipo: su OT programada y el cambio de aceite, que vence en 1 o 2 días.
+        self.assertEqual(response.data['creados'], {'ordenes_trabajo': 2, 'planes_mantenimiento': 2})
+        ot = next(e for e in response.data['eventos'] if 'orden_trabajo' in e)
+        evento = Agendas.objects.get(pk=ot['id'])
+        self.assertEqual((evento.tipoevento, evento.colorevento), ('predictivo', '#10B981'))
+        self.assertEqual(evento.idusuarioasignado, self.user)
+        self.assertEqual(evento.idusuariocreador.username, 'sistema_agenda')
+        plan = next(e for e in response.data['eventos'] if 'plan' in e)
+        self.assertEqual(Agendas.objects.get(pk=plan['id']).iddetalleplan.intervalohorasoperacion, 250)
+
+        # Una segunda sincronización no crea nada.
+        response = self.client.post("/api/agendas/sincronizar-mantenciones/")
+        self.assertEqual(response.data['creados'], {'ordenes_trabajo': 0, 'planes_mantenimiento': 0})
+
+    def test_sincronizar_mantenciones_consultas_constantes(self):
+        self.programar_ots(self.crear_equipos(2))
+        self.client.post("/api/agendas/sincronizar-mantenciones/")
+        Agendas.objects.all().delete()
+        with CaptureQueriesContext(connection) as pocos:
+            self.client.post("/api/agendas/sincronizar-mantenciones/")
+        Agendas.objects.all().delete()
+        self.programar_ots(self.crear_equipos(10))
+        with CaptureQueriesContext(connection) as muchos:
+            response = self.client.post("/api/agendas/sincronizar-mantenciones/")
+        self.assertEqual(response.data['creados']['ordenes_trabajo'], 12)
+        self.assertEqual(len(pocos), len(muchos))
+
+
+def vencimientos_escalares(horometros, tasas, intervalos, horizonte_dias):
+    """ El cálculo original, ocurrencia por ocurrencia, como referencia. """
+    filas = []
+    for e, (horometro, tasa) in enumerate(zip(horometros, tasas)):
+        for d, intervalo in enumerate(intervalos):
+            horas = intervalo - horometro % intervalo
+            if horas == intervalo:
+                horas = 0
+            while int(horas / tasa) <= horizonte_dias:
+                filas.append((e, d, int(horas / tasa), horometro + horas))
+                horas += intervalo
+    return filas
+
+
+class PronosticoTest(TestCase):
+    def test_coincide_con_el_calculo_escalar(self):
+        rng = np.random.default_rng(7)
+        horometros = rng.integers(0, 5000, 40)
+        tasas = rng.choice([4, 8, 12.5, 24], 40)
+        intervalos = rng.choice([10, 250, 500, 1000], 15)
+        resultado = pronosticar(horometros, tasas, intervalos, np.full(15, 60), horizonte_dias=90)
+        filas = list(zip(*(columna.tolist() for columna in resultado[:4])))
+        self.assertEqual(filas, vencimientos_escalares(horometros, tasas, intervalos, 90))
+
+    def test_proximo_vencimiento_y_casos_borde(self):
+        resultado = pronosticar([500, 240, 100], [8, 8, 0], [250, 0], [60, 30], max_ocurrencias=1)
+        # 500 h ya vence hoy; 240 h vence en 10 h; sin uso solo vence lo que ya venció;
+        # un intervalo 0 nunca vence.
+        self.assertEqual(resultado.equipo.tolist(), [0, 1])
+        self.assertEqual(resultado.dias.tolist(), [0, 1])
+        self.assertEqual(resultado.horometro.tolist(), [500, 250])
+        self.assertEqual(resultado.minutos.tolist(), [60, 60])
+        with self.assertRaises(ValueError):
+            pronosticar([0], [8], [250], [60])
+
+
+@skipUnless(os.environ.get('CMMS_BENCHMARK'), "Benchmark: definir CMMS_BENCHMARK=1 para ejecutarlo")
+class PronosticoBenchmarkTest(TestCase):
+    """ Pronóstico de 5.000 equipos × 50 tareas a 365 días. """
+
+    def test_benchmark_pronostico(self):
+        rng = np.random.default_rng(0)
+        horometros = rng.integers(0, 20000, 5000)
+        tasas = rng.uniform(4, 20, 5000)
+        intervalos = rng.choice([250, 500, 1000, 2000], 50)
+
+        inicio = time.perf_counter()
+        resultado = pronosticar(horometros, tasas, intervalos, np.full(50, 60), horizonte_dias=365)
+        vectorizado = time.perf_counter() - inicio
+
+        # El cálculo escalar sobre 100 equipos, extrapolado a la flota completa.
+        inicio = time.perf_counter()
+        vencimientos_escalares(horometros[:100], tasas[:100], intervalos, 365)
+        escalar = (time.perf_counter() - inicio) * 50
+        logger.info("pronóstico de %d vencimientos: vectorizado %.0f ms, escalar (estimado) %.0f ms",
+                    len(resultado.dias), vectorizado * 1000, escalar * 1000)
+        self.assertLess(vectorizado, escalar)
+
+
+class HistorialHorometrosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='operador', password='operador')
+        self.client.force_authenticate(user=self.user)
+        tipo_equipo = TiposEquipo.objects.create(nombretipo="Camión")
+        estado_equipo = EstadosEquipo.objects.create(nombreestado="Operativo")
+        self.equipos = [
+            Equipos.objects.create(
+                codigointerno=f"CT-{i:02d}", nombreequipo=f"Camión {i:02d}",
+                idtipoequipo=tipo_equipo, idestadoactual=estado_equipo
+            )
+            for i in range(3)
+        ]
+        self.inicio = timezone.now() - timedelta(days=10)
+
+    def lectura(self, equipo, dias, horometro):
+        return {
+            'equipo_id': equipo.pk, 'horometro': horometro,
+            'fecha': (self.inicio + timedelta(days=dias)).isoformat()
+        }
+
+    def test_tasa_de_uso(self):
+        self.assertEqual(actualizar_tasa(None, 100, self.inicio, 112, self.inicio + timedelta(days=1)), 12)
+        # Con tau = 1 día, una muestra tras 1 día pesa 1 - e^-1.
+        tasa = actualizar_tasa(12, 112, self.inicio, 120, self.inicio + timedelta(days=1), tau=1)
+        self.assertAlmostEqual(tasa, 12 + (1 - math.exp(-1)) * (8 - 12))
+        # Un horómetro que retrocede o una lectura en el mismo instante no cambian la tasa.
+        self.assertEqual(actualizar_tasa(12, 112, self.inicio, 50, self.inicio + timedelta(days=1)), 12)
+        self.assertEqual(actualizar_tasa(12, 112, self.inicio, 130, self.inicio), 12)
+        self.assertEqual(actualizar_tasa(None, 0, self.inicio, 1000, self.inicio + timedelta(days=1)), 24)
+
+    def test_carga_masiva(self):
+        lecturas = [self.lectura(equipo, dia, 100 + 10 * dia) for equipo in self.equipos for dia in range(5)]
+        # Validación de equipos, equipos a actualizar, lecturas existentes, INSERT,
+        # UPDATE y el savepoint, sin importar la cantidad de lecturas.
+        with self.assertNumQueries(7):
+            response = self.client.post("/api/mantenimiento-workflow/lecturas-horometro/", lecturas, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'recibidas': 15, 'registradas': 15, 'equipos_actualizados': 3})
+
+        equipo = Equipos.objects.get(pk=self.equipos[0].pk)
+        self.assertEqual(equipo.horometroactual, 140)
+        self.assertAlmostEqual(equipo.tasausodiaria, 10)
+        self.assertEqual(equipo.lecturas_horometro.count(), 5)
+
+        # Reintentar el envío no duplica lecturas; una lectura atrasada solo se guarda.
+        response = self.client.post("/api/mantenimiento-workflow/lecturas-horometro/", {
+            'lecturas': lecturas + [self.lectura(self.equipos[0], 2.5, 125)]
+        }, format='json')
+        self.assertEqual(response.data, {'recibidas': 16, 'registradas': 1, 'equipos_actualizados': 0})
+        self.assertEqual(Equipos.objects.get(pk=self.equipos[0].pk).horometroactual, 140)
+
+    def test_carga_masiva_valida_equipos(self):
+        response = self.client.post("/api/mantenimiento-workflow/lecturas-horometro/", [
+            self.lectura(self.equipos[0], 0, 100), {'equipo_id': 999, 'horometro': 5}
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['equipos'], [999])
+        self.assertFalse(HistorialHorometros.objects.exists())
+
+    def test_actualizar_horometro_registra_historial(self):
+        response = self.client.post("/api/mantenimiento-workflow/actualizar-horometro/", {
+            'equipo_id': self.equipos[0].pk, 'horometro': 250
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['horometro_anterior'], response.data['horometro_nuevo']), (0, 250))
+        self.assertEqual(Equipos.objects.get(pk=self.equipos[0].pk).horometroactual, 250)
+        self.assertEqual(HistorialHorometros.objects.get().horometro, 250)
+
+    def test_pronostico_usa_la_tasa_estimada(self):
+        # A 20 h/día, un día después de la última lectura (140 h) el horómetro
+        # estimado es 160 h y el cambio de aceite (250 h) vence en 90 h: 4 días.
+        registrar_lecturas([
+            (self.equipos[0].pk, self.inicio + timedelta(days=dia), 60 + 20 * dia) for dia in range(5)
+        ])
+        equipo = equipos_con_horometro(Equipos.objects.filter(pk=self.equipos[0].pk)).get()
+        tarea = TareasEstandar.objects.create(
+            nombretarea="Cambio de aceite", idtipotarea=TiposTarea.objects.create(nombretipotarea="Preventiva")
+        )
+        detalle = DetallesPlanMantenimiento(intervalohorasoperacion=250, idtareaestandar=tarea)
+        self.assertAlmostEqual(equipo.tasausodiaria, 20)
+        hoy = timezone.localdate(self.inicio + timedelta(days=5))
+        (_, _, fecha, horometro, _), = vencimientos([equipo], [detalle], hoy, max_ocurrencias=1)
+        self.assertEqual(horometro, 250)
+        self.assertEqual(fecha, hoy + timedelta(days=4))
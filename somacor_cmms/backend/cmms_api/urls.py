@@ -47,5 +47,7 @@ urlpatterns = [
     # Rutas de autenticación
     path('login/', views.CustomAuthToken.as_view(), name='auth_token'),
     path('logout/', views.LogoutView.as_view(), name='logout'),
+    # Imágenes almacenadas en el blob store
+    path('blobs/<str:key>/', views.BlobView.as_view(), name='blob'),
 ]
 
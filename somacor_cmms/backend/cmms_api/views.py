@@ -6,12 +6,22 @@ from rest_framework.decorators import action
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
+from django.http import FileResponse
 from django.utils import timezone
 from django.db import models, transaction
+from django.db.models.functions import Upper
 import uuid
 import random
+from cmms_project.authentication import tokens_en_cache
 from .models import *
 from .serializers import *
+from .agenda import generar_agenda_plan, sincronizar_ordenes, sincronizar_planes
+from .blob_store import get_blob_store, BlobNoEncontrado
+from .cache import CatalogoCacheMixin
+from .campos import CamposDinamicosViewSetMixin
+from .condicional import ETagVersionMixin
+from .catalogos import estado_ot, tipo_mantenimiento_ot
+from .pagination import PaginacionSeleccionable
 from .permissions import IsAdminRole, IsSupervisorRole, IsOperadorRole, IsAdminOrSupervisorRole, IsAnyRole
 
 # --- Funciones Auxiliares ---
@@ -76,82 +86,179 @@ class LogoutView(generics.GenericAPIView):
     permission_classes = [permissions.AllowAny]
     def post(self, request):
         if request.user and request.user.is_authenticated:
-            request.user.auth_token.delete()
+            Token.objects.filter(user=request.user).delete()
+            tokens_en_cache.invalidar_usuario(request.user.pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class BlobView(generics.GenericAPIView):
+    """
+    Sirve una imagen del blob store a usuarios autenticados (las evidencias no
+    son públicas aunque se conozca su hash). El contenido de una clave nunca
+    cambia, por lo que se puede cachear indefinidamente, pero solo en el cliente:
+    los proxies compartidos no deben guardarlo.
+    """
+
+    def get(self, request, key):
+        store = get_blob_store()
+        try:
+            archivo = store.open(key)
+        except BlobNoEncontrado:
+            return Response({'error': 'Imagen no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+        response = FileResponse(archivo, content_type=store.content_type(key))
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
+
 # --- ViewSets de Catálogos ---
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all().order_by('id')
     serializer_class = UserSerializer
     permission_classes = [IsAdminRole]  # Solo Admin puede gestionar usuarios
 
-class RolViewSet(viewsets.ModelViewSet):
+class RolViewSet(ETagVersionMixin, CatalogoCacheMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = Roles.objects.all()
     serializer_class = RolSerializer
     permission_classes = [IsAdminRole]  # Solo Admin puede gestionar roles
 
-class FaenaViewSet(viewsets.ModelViewSet):
+class FaenaViewSet(ETagVersionMixin, CatalogoCacheMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = Faenas.objects.all()
     serializer_class = FaenaSerializer
     permission_classes = [IsAnyRole]  # Todos los roles pueden ver faenas
 
-class TipoEquipoViewSet(viewsets.ModelViewSet):
+class TipoEquipoViewSet(ETagVersionMixin, CatalogoCacheMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = TiposEquipo.objects.all()
     serializer_class = TipoEquipoSerializer
     permission_classes = [IsAnyRole]  # Todos los roles pueden ver tipos de equipo
 
-class EstadoEquipoViewSet(viewsets.ModelViewSet):
+class EstadoEquipoViewSet(ETagVersionMixin, CatalogoCacheMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = EstadosEquipo.objects.all()
     serializer_class = EstadoEquipoSerializer
     permission_classes = [IsAnyRole]  # Todos los roles pueden ver estados de equipo
 
-class EquipoViewSet(viewsets.ModelViewSet):
+class EquipoViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = Equipos.objects.all()
     serializer_class = EquipoSerializer
     permission_classes = [IsAnyRole]  # Todos los roles pueden ver equipos
 
+    BUSQUEDA_LIMITE_DEFECTO = 5
+    BUSQUEDA_LIMITE_MAXIMO = 20
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """
+        Busca equipos por nombre o código interno y retorna los mejores N resultados.
+        Primero resuelve coincidencias por prefijo sobre las columnas normalizadas
+        (indexadas); solo si faltan resultados recurre a coincidencias parciales.
+        Parámetros: q (obligatorio), limit, faena.
+        """
+        termino = normalizar_texto_busqueda(request.query_params.get('q', ''))
+        if not termino:
+            return Response({'error': 'El parámetro q es obligatorio.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limite = int(request.query_params.get('limit', self.BUSQUEDA_LIMITE_DEFECTO))
+        except (TypeError, ValueError):
+            limite = self.BUSQUEDA_LIMITE_DEFECTO
+        limite = max(1, min(limite, self.BUSQUEDA_LIMITE_MAXIMO))
+
+        queryset = Equipos.objects.filter(activo=True).select_related('idtipoequipo', 'idfaenaactual')
+        faena_id = request.query_params.get('faena')
+        if faena_id:
+            try:
+                faena_id = int(faena_id)
+            except ValueError:
+                return Response({'error': 'El parámetro "faena" debe ser un número.'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(idfaenaactual_id=faena_id)
+
+        # Las columnas ya están en minúsculas; los lookups "i" evitan el LIKE BINARY
+        # de startswith/contains en MySQL, para que coincidan las mismas filas que en SQLite.
+        # Ranking: código exacto > prefijo de código > prefijo de nombre > palabra del nombre > parcial
+        ranking = models.Case(
+            models.When(codigobusqueda=termino, then=models.Value(0)),
+            models.When(codigobusqueda__istartswith=termino, then=models.Value(1)),
+            models.When(nombrebusqueda__istartswith=termino, then=models.Value(2)),
+            models.When(nombrebusqueda__icontains=f' {termino}', then=models.Value(3)),
+            default=models.Value(4),
+            output_field=models.IntegerField()
+        )
+        queryset = queryset.annotate(ranking=ranking).order_by('ranking', 'nombrebusqueda')
+
+        resultados = list(queryset.filter(
+            models.Q(codigobusqueda__istartswith=termino) | models.Q(nombrebusqueda__istartswith=termino)
+        )[:limite])
+        if len(resultados) < limite:
+            resultados += list(queryset.filter(
+                models.Q(codigobusqueda__icontains=termino) | models.Q(nombrebusqueda__icontains=termino)
+            ).exclude(
+                idequipo__in=[equipo.idequipo for equipo in resultados]
+            )[:limite - len(resultados)])
+
+        return Response({
+            'query': termino,
+            'resultados': EquipoBusquedaSerializer(resultados, many=True).data
+        })
+
 # --- NUEVOS VIEWSETS PARA EL MÓDULO DE CHECKLISTS ---
 
-class ChecklistTemplateViewSet(viewsets.ModelViewSet):
+class ChecklistTemplateViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = ChecklistTemplate.objects.all()
     serializer_class = ChecklistTemplateSerializer
+    modelos_etag = (ChecklistCategory, ChecklistItem)
     permission_classes = [permissions.AllowAny]
 
-class ChecklistCategoryViewSet(viewsets.ModelViewSet):
+class ChecklistCategoryViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = ChecklistCategory.objects.all()
     serializer_class = ChecklistCategorySerializer
+    modelos_etag = (ChecklistItem,)
     permission_classes = [permissions.AllowAny]
 
-class ChecklistItemViewSet(viewsets.ModelViewSet):
+class ChecklistItemViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = ChecklistItem.objects.all()
     serializer_class = ChecklistItemSerializer
     permission_classes = [permissions.AllowAny]
 
-class ChecklistInstanceViewSet(viewsets.ModelViewSet):
+class ChecklistInstanceViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = ChecklistInstance.objects.all()
     serializer_class = ChecklistInstanceSerializer
+    modelos_etag = (ChecklistImage,)
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionSeleccionable
+    cursor_ordering = ('-fecha_inspeccion', '-id_instance')
+    serializer_class_compacto = ChecklistInstanceCompactoSerializer
+
+    def get_queryset(self):
+        return self.get_serializer_class().setup_eager_loading(
+            super().get_queryset(), solo_miniaturas=self.action == 'list'
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # Los listados solo devuelven miniaturas; el detalle incluye todas las versiones.
+        context['solo_miniaturas'] = self.action == 'list'
+        return context
 
-class ChecklistAnswerViewSet(viewsets.ModelViewSet):
+class ChecklistAnswerViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = ChecklistAnswer.objects.all()
     serializer_class = ChecklistAnswerSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionSeleccionable
+    cursor_ordering = ('-id_answer',)
 
 # --- NUEVOS VIEWSETS PARA AGENDA DE MANTENIMIENTO PREVENTIVO ---
 
-class TipoTareaViewSet(viewsets.ModelViewSet):
+class TipoTareaViewSet(ETagVersionMixin, CatalogoCacheMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = TiposTarea.objects.all()
     serializer_class = TipoTareaSerializer
     permission_classes = [permissions.AllowAny]
 
-class TareaEstandarViewSet(viewsets.ModelViewSet):
+class TareaEstandarViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = TareasEstandar.objects.all()
     serializer_class = TareaEstandarSerializer
     permission_classes = [permissions.AllowAny]
 
-class PlanMantenimientoViewSet(viewsets.ModelViewSet):
+class PlanMantenimientoViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = PlanesMantenimiento.objects.all()
     serializer_class = PlanMantenimientoSerializer
+    modelos_etag = (DetallesPlanMantenimiento,)
     permission_classes = [permissions.AllowAny]
 
     @action(detail=True, methods=['get', 'post'], url_path='generar-agenda')
@@ -160,62 +267,22 @@ class PlanMantenimientoViewSet(viewsets.ModelViewSet):
         Genera eventos de agenda basados en el plan de mantenimiento y los equipos asociados
         """
         plan = self.get_object()
-        equipos = Equipos.objects.filter(idtipoequipo=plan.idtipoequipo, activo=True)
-        
-        eventos_creados = []
-        for equipo in equipos:
-            detalles = DetallesPlanMantenimiento.objects.filter(
-                idplanmantenimiento=plan, 
-                activo=True
-            ).select_related('idtareaestandar').order_by('intervalohorasoperacion')
-            
-            for detalle in detalles:
-                # Calcular próxima fecha de mantenimiento basada en horometro estimado
-                # Como el modelo Equipos no tiene un campo de horómetro, usamos un valor predeterminado
-                # o podríamos obtenerlo de la última orden de trabajo
-                horometro_estimado = 0  # Valor predeterminado
-                
-                # Intentar obtener el último horómetro registrado en órdenes de trabajo
-                ultima_ot = OrdenesTrabajo.objects.filter(
-                    idequipo=equipo,
-                    horometro__isnull=False
-                ).order_by('-fechacreacionot').first()
-                
-                if ultima_ot and ultima_ot.horometro:
-                    horometro_estimado = ultima_ot.horometro
-                
-                # Calcular horas restantes
-                horas_restantes = detalle.intervalohorasoperacion - (horometro_estimado % detalle.intervalohorasoperacion)
-                if horas_restantes == detalle.intervalohorasoperacion:
-                    horas_restantes = 0  # Ya es tiempo de mantenimiento
-                
-                # Estimar fecha (asumiendo 8 horas de operación por día)
-                dias_estimados = horas_restantes / 8
-                fecha_estimada = timezone.now().date() + timezone.timedelta(days=int(dias_estimados))
-                
-                # Crear evento en agenda
-                evento = Agendas.objects.create(
-                    tituloevento=f"Mantenimiento {detalle.idtareaestandar.nombretarea} - {equipo.nombreequipo}",
-                    fechahorainicio=timezone.datetime.combine(fecha_estimada, timezone.datetime.min.time().replace(hour=8)),
-                    fechahorafin=timezone.datetime.combine(fecha_estimada, timezone.datetime.min.time().replace(hour=8)) + timezone.timedelta(minutes=detalle.idtareaestandar.tiempoestimadominutos),
-                    descripcionevento=f"Mantenimiento preventivo programado cada {detalle.intervalohorasoperacion} horas",
-                    tipoevento="Mantenimiento Preventivo",
-                    colorevento="#28a745",
-                    idequipo=equipo,
-                    idplanmantenimiento=plan,
-                    idusuariocreador=request.user if request.user.is_authenticated else User.objects.first()
-                )
-                eventos_creados.append({
-                    'id': evento.idagenda,
-                    'tituloevento': evento.tituloevento,
-                    'fechahorainicio': evento.fechahorainicio,
-                    'fechahorafin': evento.fechahorafin,
-                    'tipoevento': evento.tipoevento,
-                    'equipo': equipo.nombreequipo,
-                    'tarea': detalle.idtareaestandar.nombretarea,
-                    'intervalo': detalle.intervalohorasoperacion
-                })
-        
+        usuario = request.user if request.user.is_authenticated else User.objects.first()
+
+        eventos_creados = [
+            {
+                'id': evento.idagenda,
+                'tituloevento': evento.tituloevento,
+                'fechahorainicio': evento.fechahorainicio,
+                'fechahorafin': evento.fechahorafin,
+                'tipoevento': evento.tipoevento,
+                'equipo': equipo.nombreequipo,
+                'tarea': detalle.idtareaestandar.nombretarea,
+                'intervalo': detalle.intervalohorasoperacion
+            }
+            for evento, equipo, detalle in generar_agenda_plan(plan, usuario)
+        ]
+
         return Response({
             'message': f'Se crearon {len(eventos_creados)} eventos de agenda',
             'eventos': eventos_creados,
@@ -244,27 +311,51 @@ class PlanMantenimientoViewSet(viewsets.ModelViewSet):
         serializer = DetallesPlanMantenimientoSerializer(detalles, many=True)
         return Response(serializer.data)
 
-class DetallesPlanMantenimientoViewSet(viewsets.ModelViewSet):
+class DetallesPlanMantenimientoViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = DetallesPlanMantenimiento.objects.select_related('idtareaestandar', 'idplanmantenimiento').all()
     serializer_class = DetallesPlanMantenimientoSerializer
+    modelos_etag = (TiposTarea,)
     permission_classes = [permissions.AllowAny]
 
-class TiposMantenimientoOTViewSet(viewsets.ModelViewSet):
+class TiposMantenimientoOTViewSet(ETagVersionMixin, CatalogoCacheMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = TiposMantenimientoOT.objects.all()
     serializer_class = TipoMantenimientoOTSerializer
     permission_classes = [permissions.AllowAny]
 
-class EstadosOrdenTrabajoViewSet(viewsets.ModelViewSet):
+class EstadosOrdenTrabajoViewSet(ETagVersionMixin, CatalogoCacheMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = EstadosOrdenTrabajo.objects.all()
     serializer_class = EstadoOrdenTrabajoSerializer
     permission_classes = [permissions.AllowAny]
 
 # --- NUEVOS VIEWSETS PARA REGISTRO DE MANTENIMIENTOS ---
 
-class OrdenTrabajoViewSet(viewsets.ModelViewSet):
+class OrdenTrabajoViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = OrdenesTrabajo.objects.all().order_by('-fechacreacionot')
     serializer_class = OrdenTrabajoSerializer
+    modelos_etag = (ActividadesOrdenTrabajo, TareasEstandar)
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionSeleccionable
+    cursor_ordering = ('-fechacreacionot', '-idordentrabajo')
+    serializer_class_compacto = OrdenTrabajoEstadoSerializer
+
+    def get_queryset(self):
+        return self.get_serializer_class().setup_eager_loading(super().get_queryset())
+
+    @action(detail=False, methods=['get'], url_path='by-numero/(?P<numeroot>[^/]+)')
+    def by_numero(self, request, numeroot=None):
+        """
+        Busca una OT por su número (sin distinguir mayúsculas) y retorna solo su estado.
+        Usa el índice sobre UPPER(NumeroOT), por lo que es una única lectura indexada.
+        """
+        queryset = OrdenTrabajoEstadoSerializer.setup_eager_loading(
+            OrdenesTrabajo.objects.alias(numero_normalizado=Upper('numeroot'))
+        )
+        orden = queryset.filter(numero_normalizado=numeroot.strip().upper()).first()
+        if orden is None:
+            return Response({
+                'error': f'No existe una orden de trabajo con número {numeroot}.'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response(OrdenTrabajoEstadoSerializer(orden).data)
 
     @action(detail=False, methods=['post'], url_path='crear-desde-plan')
     def crear_desde_plan(self, request):
@@ -287,21 +378,8 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
             solicitante = User.objects.get(pk=id_solicitante)
             
             # Obtener o crear registros necesarios
-            try:
-                estado_inicial = EstadosOrdenTrabajo.objects.get(nombreestadoot='Abierta')
-            except EstadosOrdenTrabajo.DoesNotExist:
-                estado_inicial = EstadosOrdenTrabajo.objects.create(
-                    nombreestadoot='Abierta', 
-                    descripcion='OT recién creada.'
-                )
-            
-            try:
-                tipo_ot = TiposMantenimientoOT.objects.get(nombretipomantenimientoot='Preventivo')
-            except TiposMantenimientoOT.DoesNotExist:
-                tipo_ot = TiposMantenimientoOT.objects.create(
-                    nombretipomantenimientoot='Preventivo', 
-                    descripcion='Mantenimiento planificado.'
-                )
+            estado_inicial = estado_ot('Abierta', 'OT recién creada.')
+            tipo_ot = tipo_mantenimiento_ot('Preventivo', 'Mantenimiento planificado.')
             
             # Buscar tareas aplicables para el horometro
             detalles_aplicables = DetallesPlanMantenimiento.objects.filter(
@@ -389,21 +467,8 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
                 )
 
             # Obtener o crear el estado y tipo de OT
-            try:
-                estado_inicial = EstadosOrdenTrabajo.objects.get(nombreestadoot='Abierta')
-            except EstadosOrdenTrabajo.DoesNotExist:
-                estado_inicial = EstadosOrdenTrabajo.objects.create(
-                    nombreestadoot='Abierta', 
-                    descripcion='OT recién creada.'
-                )
-            
-            try:
-                tipo_ot = TiposMantenimientoOT.objects.get(nombretipomantenimientoot='Correctivo')
-            except TiposMantenimientoOT.DoesNotExist:
-                tipo_ot = TiposMantenimientoOT.objects.create(
-                    nombretipomantenimientoot='Correctivo', 
-                    descripcion='Mantenimiento por falla no planificada.'
-                )
+            estado_inicial = estado_ot('Abierta', 'OT recién creada.')
+            tipo_ot = tipo_mantenimiento_ot('Correctivo', 'Mantenimiento por falla no planificada.')
 
             # Preparar datos para la OT
             horometro = request.data.get('horometro')
@@ -474,13 +539,7 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Obtener o crear estado "Completada"
-            try:
-                estado_completada = EstadosOrdenTrabajo.objects.get(nombreestadoot='Completada')
-            except EstadosOrdenTrabajo.DoesNotExist:
-                estado_completada = EstadosOrdenTrabajo.objects.create(
-                    nombreestadoot='Completada',
-                    descripcion='Orden de trabajo completada exitosamente.'
-                )
+            estado_completada = estado_ot('Completada', 'Orden de trabajo completada exitosamente.')
             
             # Actualizar la orden con fecha de completado y estado
             orden.fechacompletado = timezone.now()
@@ -515,15 +574,21 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
                 'error': f'Error al completar la orden de trabajo: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class ActividadOrdenTrabajoViewSet(viewsets.ModelViewSet):
+class ActividadOrdenTrabajoViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = ActividadesOrdenTrabajo.objects.all()
     serializer_class = ActividadOrdenTrabajoSerializer
     permission_classes = [permissions.AllowAny]
 
-class AgendaViewSet(viewsets.ModelViewSet):
+class AgendaViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = Agendas.objects.all()
     serializer_class = AgendaSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionSeleccionable
+    cursor_ordering = ('fechahorainicio', 'idagenda')
+    serializer_class_compacto = AgendaCompactoSerializer
+
+    def get_queryset(self):
+        return self.get_serializer_class().setup_eager_loading(super().get_queryset())
 
     @action(detail=False, methods=['get'], url_path='calendario')
     def calendario(self, request):
@@ -565,88 +630,29 @@ class AgendaViewSet(viewsets.ModelViewSet):
         Sincroniza las mantenciones programadas con el calendario
         """
         try:
-            eventos_creados = []
-            
-            # Obtener órdenes de trabajo programadas que no tienen evento en agenda
-            ordenes_programadas = OrdenesTrabajo.objects.filter(
-                fechaejecucion__isnull=False,
-                idestadoot__nombreestadoot__in=['Abierta', 'En Progreso']
-            ).exclude(
-                idordentrabajo__in=Agendas.objects.values_list('idordentrabajo', flat=True)
-            )
-            
-            for orden in ordenes_programadas:
-                # Determinar el tipo de evento basado en el tipo de mantenimiento
-                tipo_evento = 'preventivo'
-                color_evento = '#3B82F6'  # Azul para preventivo
-                
-                if orden.idtipomantenimientoot.nombretipomantenimientoot == 'Correctivo':
-                    tipo_evento = 'correctivo'
-                    color_evento = '#F59E0B'  # Naranja para correctivo
-                elif orden.idtipomantenimientoot.nombretipomantenimientoot == 'Predictivo':
-                    tipo_evento = 'predictivo'
-                    color_evento = '#10B981'  # Verde para predictivo
-                
-                # Crear título descriptivo
-                titulo = f"Mantenimiento {orden.idtipomantenimientoot.nombretipomantenimientoot} - {orden.idequipo.nombreequipo}"
-                
-                # Crear descripción
-                descripcion = f"OT: {orden.numeroot}\n"
-                descripcion += f"Equipo: {orden.idequipo.nombreequipo}\n"
-                descripcion += f"Tipo: {orden.idtipomantenimientoot.nombretipomantenimientoot}\n"
-                descripcion += f"Prioridad: {orden.prioridad}\n"
-                if orden.descripcionproblemareportado:
-                    descripcion += f"Problema: {orden.descripcionproblemareportado}\n"
-                if orden.horometro:
-                    descripcion += f"Horómetro: {orden.horometro}h\n"
-                
-                # Calcular fechas de inicio y fin (asumiendo 4 horas de duración por defecto)
-                from datetime import datetime, time
-                fecha_inicio = timezone.make_aware(
-                    datetime.combine(orden.fechaejecucion, time(8, 0))  # 8:00 AM
-                )
-                fecha_fin = fecha_inicio + timezone.timedelta(hours=4)
-                
-                # Obtener o crear usuario por defecto para eventos automáticos
-                usuario_sistema, created = User.objects.get_or_create(
-                    username='sistema_agenda',
-                    defaults={
-                        'first_name': 'Sistema',
-                        'last_name': 'Agenda',
-                        'email': 'sistema@somacor.com',
-                        'is_active': True
-                    }
-                )
-                
-                # Crear evento en agenda
-                evento = Agendas.objects.create(
-                    tituloevento=titulo,
-                    fechahorainicio=fecha_inicio,
-                    fechahorafin=fecha_fin,
-                    descripcionevento=descripcion,
-                    tipoevento=tipo_evento,
-                    colorevento=color_evento,
-                    esdiacompleto=False,
-                    idequipo=orden.idequipo,
-                    idordentrabajo=orden,
-                    idusuarioasignado=orden.idtecnicoasignado,
-                    idusuariocreador=usuario_sistema
-                )
-                
-                eventos_creados.append({
+            # Órdenes de trabajo programadas que no tienen evento en agenda
+            eventos_creados = [
+                {
                     'id': evento.idagenda,
                     'titulo': evento.tituloevento,
                     'fecha': evento.fechahorainicio.isoformat(),
-                    'orden_trabajo': orden.numeroot,
-                    'equipo': orden.idequipo.nombreequipo
-                })
+                    'orden_trabajo': evento.idordentrabajo.numeroot,
+                    'equipo': evento.idequipo.nombreequipo
+                }
+                for evento in sincronizar_ordenes()
+            ]
+            creados_ordenes = len(eventos_creados)
             
             # Sincronizar planes de mantenimiento próximos a vencer
             self._sincronizar_planes_mantenimiento(eventos_creados)
             
             return Response({
                 'message': f'Se crearon {len(eventos_creados)} eventos de agenda',
-                'eventos': eventos_creados
+                'eventos': eventos_creados,
+                'creados': {
+                    'ordenes_trabajo': creados_ordenes,
+                    'planes_mantenimiento': len(eventos_creados) - creados_ordenes
+                }
             })
             
         except Exception as e:
@@ -663,110 +669,36 @@ class AgendaViewSet(viewsets.ModelViewSet):
         Método auxiliar para sincronizar planes de mantenimiento próximos a vencer
         """
         try:
-            from datetime import datetime, timedelta
-            
-            # Obtener equipos con planes de mantenimiento activos
-            equipos_con_planes = Equipos.objects.filter(
-                planesmantenimiento__activo=True
-            ).distinct()
-            
-            for equipo in equipos_con_planes:
-                planes = PlanesMantenimiento.objects.filter(
-                    idequipo=equipo,
-                    activo=True
-                )
-                
-                for plan in planes:
-                    # Obtener detalles del plan ordenados por intervalo
-                    detalles = DetallesPlanMantenimiento.objects.filter(
-                        idplanmantenimiento=plan,
-                        activo=True
-                    ).order_by('intervalohorasoperacion')
-                    
-                    for detalle in detalles:
-                        # Calcular próxima fecha de mantenimiento basada en horómetro actual
-                        # (Esta es una lógica simplificada, se puede mejorar)
-                        horometro_actual = equipo.horometro if hasattr(equipo, 'horometro') else 0
-                        horas_hasta_mantenimiento = detalle.intervalohorasoperacion - (horometro_actual % detalle.intervalohorasoperacion)
-                        
-                        # Estimar fecha basada en uso promedio (asumiendo 8 horas/día)
-                        dias_hasta_mantenimiento = horas_hasta_mantenimiento / 8
-                        fecha_estimada = timezone.now().date() + timedelta(days=dias_hasta_mantenimiento)
-                        
-                        # Solo crear eventos para mantenciones en los próximos 30 días
-                        if dias_hasta_mantenimiento <= 30:
-                            # Verificar si ya existe un evento para esta tarea
-                            evento_existente = Agendas.objects.filter(
-                                idequipo=equipo,
-                                idplanmantenimiento=plan,
-                                tituloevento__icontains=detalle.idtareaestandar.nombretarea,
-                                fechahorainicio__date=fecha_estimada
-                            ).exists()
-                            
-                            if not evento_existente:
-                                titulo = f"Mantenimiento Preventivo - {equipo.nombreequipo} - {detalle.idtareaestandar.nombretarea}"
-                                descripcion = f"Plan: {plan.nombreplan}\n"
-                                descripcion += f"Tarea: {detalle.idtareaestandar.nombretarea}\n"
-                                descripcion += f"Intervalo: {detalle.intervalohorasoperacion}h\n"
-                                descripcion += f"Equipo: {equipo.nombreequipo}\n"
-                                descripcion += f"Horómetro estimado: {horometro_actual + horas_hasta_mantenimiento}h"
-                                
-                                fecha_inicio = timezone.datetime.combine(
-                                    fecha_estimada,
-                                    timezone.datetime.min.time().replace(hour=9)  # 9:00 AM
-                                )
-                                fecha_fin = fecha_inicio + timezone.timedelta(
-                                    minutes=detalle.idtareaestandar.tiempoestimadominutos or 120
-                                )
-                                
-                                # Obtener usuario sistema para eventos automáticos
-                                usuario_sistema, created = User.objects.get_or_create(
-                                    username='sistema_agenda',
-                                    defaults={
-                                        'first_name': 'Sistema',
-                                        'last_name': 'Agenda',
-                                        'email': 'sistema@somacor.com',
-                                        'is_active': True
-                                    }
-                                )
-                                
-                                evento = Agendas.objects.create(
-                                    tituloevento=titulo,
-                                    fechahorainicio=fecha_inicio,
-                                    fechahorafin=fecha_fin,
-                                    descripcionevento=descripcion,
-                                    tipoevento='preventivo',
-                                    colorevento='#3B82F6',  # Azul
-                                    esdiacompleto=False,
-                                    idequipo=equipo,
-                                    idplanmantenimiento=plan,
-                                    idusuariocreador=usuario_sistema
-                                )
-                                
-                                eventos_creados.append({
-                                    'id': evento.idagenda,
-                                    'titulo': evento.tituloevento,
-                                    'fecha': evento.fechahorainicio.isoformat(),
-                                    'plan': plan.nombreplan,
-                                    'equipo': equipo.nombreequipo
-                                })
-                                
+            eventos_creados.extend(
+                {
+                    'id': evento.idagenda,
+                    'titulo': evento.tituloevento,
+                    'fecha': evento.fechahorainicio.isoformat(),
+                    'plan': evento.idplanmantenimiento.nombreplan,
+                    'equipo': evento.idequipo.nombreequipo
+                }
+                for evento in sincronizar_planes(dias_adelante=30)
+            )
         except Exception as e:
             print(f"Error en sincronización de planes: {str(e)}")  # Para debugging
 
 
 # --- VIEWSET PARA EVIDENCIAS FOTOGRÁFICAS ---
 
-class EvidenciaOTViewSet(viewsets.ModelViewSet):
+class EvidenciaOTViewSet(ETagVersionMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar evidencias fotográficas de órdenes de trabajo
     """
     queryset = EvidenciaOT.objects.all()
     serializer_class = EvidenciaOTSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PaginacionSeleccionable
+    cursor_ordering = ('-fecha_subida', '-idevidencia')
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('usuario_subida', 'idordentrabajo')
+        if self.action == 'list':
+            queryset = queryset.defer('imagen_base64')
         orden_trabajo_id = self.request.query_params.get('orden_trabajo', None)
         if orden_trabajo_id:
             queryset = queryset.filter(idordentrabajo=orden_trabajo_id)
@@ -775,5 +707,6 @@ class EvidenciaOTViewSet(viewsets.ModelViewSet):
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
+        context['solo_miniaturas'] = self.action == 'list'
         return context
 
@@ -4,14 +4,25 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser
+from rest_framework.request import is_form_media_type
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Sum
+from django.db.models.functions import Coalesce
 from .models import *
 from .serializers import *
+from .catalogos import estado_ot, tipo_mantenimiento_ot
+from .parsers import JSONRapidoParser, MultiPartEnDiscoParser
 import datetime
 import json # Importante añadir json
 
+# Campos simples de ChecklistInstance que se leen de una carga multipart.
+CAMPOS_CHECKLIST_MULTIPART = (
+    'template', 'equipo', 'fecha_inspeccion', 'horometro_inspeccion',
+    'lugar_inspeccion', 'observaciones_generales', 'imagen_evidencia',
+)
+
 class ChecklistWorkflowViewSet(viewsets.ViewSet):
     """
     ViewSet para manejar el flujo completo de checklists
@@ -41,24 +52,21 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-    @action(detail=False, methods=['post'], url_path='completar-checklist')
+    @action(detail=False, methods=['post'], url_path='completar-checklist',
+            parser_classes=[JSONRapidoParser, FormParser, MultiPartEnDiscoParser])
     def completar_checklist(self, request):
         """
         Completa un checklist y analiza los resultados para generar alertas.
-        Ahora procesa multipart/form-data.
+        Acepta JSON (imágenes en base64), formularios url-encoded (con 'answers'
+        como texto JSON) o multipart/form-data, donde las fotos llegan como partes
+        de archivo ('imagenes', repetible, e 'imagen_evidencia') que se escriben a
+        disco mientras se reciben.
         """
-        # --- INICIO DE LA CORRECCIÓN ---
-        # Copiamos los datos para poder modificarlos.
-        data = request.data.copy()
-
-        # El campo 'answers' viene como un string JSON, lo convertimos a un objeto Python.
-        if 'answers' in data and isinstance(data['answers'], str):
-            try:
-                data['answers'] = json.loads(data['answers'])
-            except json.JSONDecodeError:
-                return Response({'error': 'Formato de "answers" inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            data = self._datos_checklist(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Pasamos los datos modificados al serializador.
         serializer = ChecklistInstanceSerializer(data=data, context={'request': request})
 
         if serializer.is_valid():
@@ -73,7 +81,7 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
                         alertas['ot_creada'] = ot_creada
                     
                     # Devolvemos la instancia serializada (incluirá la URL de la imagen si se subió).
-                    response_data = ChecklistInstanceSerializer(instance).data
+                    response_data = ChecklistInstanceSerializer(instance, context={'request': request}).data
                     response_data['alertas'] = alertas
                     
                     return Response(response_data, status=status.HTTP_201_CREATED)
@@ -87,11 +95,53 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
             # Si la validación falla, retornamos los errores para depuración.
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def _datos_checklist(self, request):
+        """
+        Arma los datos para el serializador sin copiar el cuerpo de la solicitud.
+        En formularios (multipart o url-encoded) solo se decodifican los campos
+        JSON pequeños ('answers' y las descripciones de las fotos); los archivos se
+        pasan como referencias a los temporales en disco y se guardan en el blob
+        store uno a uno al crear el checklist.
+        """
+        if is_form_media_type(request.content_type):
+            return self._datos_multipart(request.POST, request.FILES)
+        return request.data
+
+    def _datos_multipart(self, campos, archivos):
+        data = {campo: campos[campo] for campo in CAMPOS_CHECKLIST_MULTIPART if campo in campos}
+        data['answers'] = self._leer_json(campos, 'answers', [])
+
+        if 'imagenes' in campos:
+            # Compatibilidad: imágenes en base64 enviadas como un campo JSON.
+            data['imagenes'] = self._leer_json(campos, 'imagenes', [])
+        else:
+            descripciones = self._leer_json(campos, 'imagenes_descripciones', [])
+            data['imagenes'] = [
+                {
+                    'imagen_base64': archivo,
+                    'descripcion': descripciones[i] if i < len(descripciones) else None,
+                }
+                for i, archivo in enumerate(archivos.getlist('imagenes'))
+            ]
+
+        if 'imagen_evidencia' in archivos:
+            data['imagen_evidencia'] = archivos['imagen_evidencia']
+        return data
+
+    @staticmethod
+    def _leer_json(campos, campo, defecto):
+        if campo not in campos:
+            return defecto
+        try:
+            return json.loads(campos[campo])
+        except json.JSONDecodeError:
+            raise ValueError(f'Formato de "{campo}" inválido.')
+
     def _analizar_respuestas_criticas(self, instance):
         """
         Analiza las respuestas del checklist para identificar elementos críticos en mal estado
         """
-        respuestas_malas = instance.answers.filter(estado='malo')
+        respuestas_malas = instance.answers.filter(estado='malo').select_related('item__category')
         elementos_criticos_malos = []
         elementos_no_criticos_malos = []
         
@@ -122,15 +172,8 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
         """
         try:
             # Obtener tipos y estados necesarios
-            tipo_correctivo = TiposMantenimientoOT.objects.get_or_create(
-                nombretipomantenimientoot='Correctivo',
-                defaults={'descripcion': 'Mantenimiento por falla no planificada'}
-            )[0]
-            
-            estado_abierta = EstadosOrdenTrabajo.objects.get_or_create(
-                nombreestadoot='Abierta',
-                defaults={'descripcion': 'OT recién creada'}
-            )[0]
+            tipo_correctivo = tipo_mantenimiento_ot('Correctivo', 'Mantenimiento por falla no planificada')
+            estado_abierta = estado_ot('Abierta', 'OT recién creada')
             
             # Crear descripción del problema
             elementos_criticos = [item['item'] for item in alertas['elementos_criticos_malos']]
@@ -196,16 +239,20 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
             
             queryset = queryset.order_by('-fecha_inspeccion')
             
-            # Estadísticas del período
-            total_checklists = queryset.count()
-            checklists_con_fallas = queryset.filter(
-                answers__estado='malo'
-            ).distinct().count()
-            
-            checklists_con_fallas_criticas = queryset.filter(
-                answers__estado='malo',
-                answers__item__es_critico=True
-            ).distinct().count()
+            # Estadísticas del período, desde el resumen diario de conformidad
+            resumenes = ConformidadDiariaChecklist.objects.filter(equipo=equipo)
+            if fecha_inicio:
+                resumenes = resumenes.filter(fecha__gte=fecha_inicio)
+            if fecha_fin:
+                resumenes = resumenes.filter(fecha__lte=fecha_fin)
+            totales = resumenes.aggregate(
+                total_checklists=Coalesce(Sum('total_checklists'), 0),
+                checklists_con_fallas=Coalesce(Sum('checklists_con_fallas'), 0),
+                checklists_conformes=Coalesce(Sum('checklists_conformes'), 0),
+            )
+            total_checklists = totales['total_checklists']
+            checklists_con_fallas = totales['checklists_con_fallas']
+            checklists_con_fallas_criticas = total_checklists - totales['checklists_conformes']
             
             return Response({
                 'equipo': EquipoSerializer(equipo).data,
@@ -218,7 +265,11 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
                         if total_checklists > 0 else 0, 2
                     )
                 },
-                'historial': ChecklistInstanceSerializer(queryset[:50], many=True).data  # Últimos 50
+                'historial': ChecklistInstanceSerializer(
+                    ChecklistInstanceSerializer.setup_eager_loading(queryset, solo_miniaturas=True)[:50],
+                    many=True,
+                    context={'request': request, 'solo_miniaturas': True}
+                ).data  # Últimos 50, solo con miniaturas
             })
             
         except Equipos.DoesNotExist:
@@ -240,45 +291,38 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
             fecha_fin = timezone.now().date()
             fecha_inicio = fecha_fin - datetime.timedelta(days=30)
         
-        queryset = ChecklistInstance.objects.filter(
-            fecha_inspeccion__range=[fecha_inicio, fecha_fin]
+        # Se lee del resumen diario de conformidad: el costo depende de días × equipos,
+        # no de la cantidad de respuestas del período.
+        resumenes = ConformidadDiariaChecklist.objects.filter(
+            fecha__range=[fecha_inicio, fecha_fin]
         )
         
         if tipo_equipo_id:
-            queryset = queryset.filter(equipo__idtipoequipo_id=tipo_equipo_id)
+            resumenes = resumenes.filter(equipo__idtipoequipo_id=tipo_equipo_id)
         
         # Conformidad por equipo
+        filas = resumenes.order_by().values(
+            'equipo', 'equipo__nombreequipo', 'equipo__codigointerno'
+        ).annotate(
+            total_checklists=Sum('total_checklists'),
+            checklists_conformes=Sum('checklists_conformes'),
+            fallas_criticas=Sum('fallas_criticas'),
+            fallas_no_criticas=Sum('fallas_no_criticas'),
+        ).order_by('equipo__nombreequipo', 'equipo__codigointerno')
+
         conformidad_por_equipo = {}
-        for instance in queryset:
-            equipo_key = f"{instance.equipo.nombreequipo} ({instance.equipo.codigointerno})"
-            
-            if equipo_key not in conformidad_por_equipo:
-                conformidad_por_equipo[equipo_key] = {
-                    'total_checklists': 0,
-                    'checklists_conformes': 0,
-                    'fallas_criticas': 0,
-                    'fallas_no_criticas': 0
-                }
-            
-            conformidad_por_equipo[equipo_key]['total_checklists'] += 1
-            
-            # Verificar si tiene fallas
-            fallas_criticas = instance.answers.filter(
-                estado='malo', 
-                item__es_critico=True
-            ).count()
-            
-            fallas_no_criticas = instance.answers.filter(
-                estado='malo', 
-                item__es_critico=False
-            ).count()
-            
-            conformidad_por_equipo[equipo_key]['fallas_criticas'] += fallas_criticas
-            conformidad_por_equipo[equipo_key]['fallas_no_criticas'] += fallas_no_criticas
-            
-            # Si no tiene fallas críticas, se considera conforme
-            if fallas_criticas == 0:
-                conformidad_por_equipo[equipo_key]['checklists_conformes'] += 1
+        total_checklists_periodo = 0
+        for fila in filas:
+            equipo_key = f"{fila['equipo__nombreequipo']} ({fila['equipo__codigointerno']})"
+            equipo_data = conformidad_por_equipo.setdefault(equipo_key, {
+                'total_checklists': 0,
+                'checklists_conformes': 0,
+                'fallas_criticas': 0,
+                'fallas_no_criticas': 0
+            })
+            for campo in equipo_data:
+                equipo_data[campo] += fila[campo]
+            total_checklists_periodo += fila['total_checklists']
         
         # Calcular porcentajes
         for equipo_data in conformidad_por_equipo.values():
@@ -295,60 +339,99 @@ class ChecklistWorkflowViewSet(viewsets.ViewSet):
                 'fecha_inicio': fecha_inicio,
                 'fecha_fin': fecha_fin
             },
-            'total_checklists_periodo': queryset.count(),
+            'total_checklists_periodo': total_checklists_periodo,
             'conformidad_por_equipo': conformidad_por_equipo
         })
 
     @action(detail=False, methods=['get'], url_path='elementos-mas-fallidos')
     def elementos_mas_fallidos(self, request):
         """
-        Retorna los elementos de checklist que más fallan
+        Retorna los elementos de checklist que más fallan.
+        Filtros opcionales: fecha_inicio/fecha_fin (últimos 30 días por defecto),
+        tipo_equipo, faena y limit (20 por defecto, máximo 100).
+        Con acumulado=true se usa el contador histórico de cada ítem
+        (ChecklistItem.total_fallas) en lugar de contar las respuestas del período;
+        el contador no distingue faenas, así que no se puede combinar con faena.
+        En ambos casos los equipos afectados se toman de las respuestas del período.
         """
         fecha_inicio = request.query_params.get('fecha_inicio')
         fecha_fin = request.query_params.get('fecha_fin')
+        tipo_equipo_id = request.query_params.get('tipo_equipo')
+        faena_id = request.query_params.get('faena')
+        acumulado = request.query_params.get('acumulado', '').lower() in ('1', 'true')
+        if acumulado and faena_id:
+            return Response(
+                {'error': 'El conteo acumulado no distingue faenas: no se puede combinar "acumulado" con "faena".'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limite = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'error': 'El parámetro "limit" debe ser un número.'}, status=status.HTTP_400_BAD_REQUEST)
         
         if not fecha_inicio or not fecha_fin:
             fecha_fin = timezone.now().date()
             fecha_inicio = fecha_fin - datetime.timedelta(days=30)
         
-        # Buscar respuestas "malo" en el período
-        respuestas_malas = ChecklistAnswer.objects.filter(
-            estado='malo',
+        # Respuestas "malo" que entran en el conteo
+        respuestas_malas = ChecklistAnswer.objects.filter(estado='malo')
+        if tipo_equipo_id:
+            respuestas_malas = respuestas_malas.filter(instance__equipo__idtipoequipo_id=tipo_equipo_id)
+        if faena_id:
+            respuestas_malas = respuestas_malas.filter(instance__equipo__idfaenaactual_id=faena_id)
+        respuestas_malas = respuestas_malas.filter(
             instance__fecha_inspeccion__range=[fecha_inicio, fecha_fin]
-        ).select_related('item', 'item__category')
-        
-        # Agrupar por elemento
-        elementos_fallidos = {}
-        for respuesta in respuestas_malas:
-            item_key = f"{respuesta.item.category.nombre} - {respuesta.item.texto}"
-            
-            if item_key not in elementos_fallidos:
-                elementos_fallidos[item_key] = {
-                    'elemento': respuesta.item.texto,
-                    'categoria': respuesta.item.category.nombre,
-                    'es_critico': respuesta.item.es_critico,
-                    'cantidad_fallas': 0,
-                    'equipos_afectados': set()
+        )
+
+        if acumulado:
+            # Ranking desde el contador: no se recorren respuestas.
+            items = ChecklistItem.objects.filter(total_fallas__gt=0)
+            if tipo_equipo_id:
+                items = items.filter(category__template__tipo_equipo_id=tipo_equipo_id)
+            top = [
+                {
+                    'id_item': item['id_item'],
+                    'elemento': item['texto'],
+                    'categoria': item['category__nombre'],
+                    'es_critico': item['es_critico'],
+                    'cantidad_fallas': item['total_fallas'],
                 }
-            
-            elementos_fallidos[item_key]['cantidad_fallas'] += 1
-            elementos_fallidos[item_key]['equipos_afectados'].add(
-                respuesta.instance.equipo.nombreequipo
-            )
-        
-        # Convertir sets a listas y ordenar por cantidad de fallas
-        resultado = []
-        for item_data in elementos_fallidos.values():
-            item_data['equipos_afectados'] = list(item_data['equipos_afectados'])
-            item_data['cantidad_equipos_afectados'] = len(item_data['equipos_afectados'])
-            resultado.append(item_data)
-        
-        resultado.sort(key=lambda x: x['cantidad_fallas'], reverse=True)
+                for item in items.order_by('-total_fallas', 'id_item').values(
+                    'id_item', 'texto', 'category__nombre', 'es_critico', 'total_fallas'
+                )[:limite]
+            ]
+        else:
+            # GROUP BY ítem, ordenado y limitado en la base de datos
+            top = [
+                {
+                    'id_item': fila['item'],
+                    'elemento': fila['item__texto'],
+                    'categoria': fila['item__category__nombre'],
+                    'es_critico': fila['item__es_critico'],
+                    'cantidad_fallas': fila['cantidad_fallas'],
+                }
+                for fila in respuestas_malas.order_by().values(
+                    'item', 'item__texto', 'item__category__nombre', 'item__es_critico'
+                ).annotate(
+                    cantidad_fallas=Count('id_answer')
+                ).order_by('-cantidad_fallas', 'item')[:limite]
+            ]
+
+        # Equipos afectados en el período, solo para los ítems del top
+        equipos_por_item = {elemento['id_item']: [] for elemento in top}
+        for item_id, nombre in respuestas_malas.filter(
+            item__in=list(equipos_por_item)
+        ).order_by().values_list('item', 'instance__equipo__nombreequipo').distinct():
+            equipos_por_item[item_id].append(nombre)
+
+        for elemento in top:
+            elemento['equipos_afectados'] = sorted(equipos_por_item[elemento['id_item']])
+            elemento['cantidad_equipos_afectados'] = len(elemento['equipos_afectados'])
         
         return Response({
             'periodo': {
                 'fecha_inicio': fecha_inicio,
                 'fecha_fin': fecha_fin
             },
-            'elementos_mas_fallidos': resultado[:20]  # Top 20
+            'elementos_mas_fallidos': top
         })
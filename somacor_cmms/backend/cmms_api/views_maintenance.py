@@ -9,6 +9,10 @@ from django.db import transaction
 from django.db.models import Q, Count, Avg
 from .models import *
 from .serializers import *
+from .catalogos import estado_ot, tipo_mantenimiento_ot
+from .dashboard import obtener_snapshot_dashboard, ttl_dashboard
+from .horometros import registrar_lecturas
+from django.utils.cache import patch_cache_control
 import datetime
 
 class MantenimientoWorkflowViewSet(viewsets.ViewSet):
@@ -20,54 +24,16 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='dashboard')
     def dashboard(self, request):
         """
-        Retorna información del dashboard de mantenimiento
+        Retorna información del dashboard de mantenimiento.
+        Los KPIs salen de una instantánea en caché (ver dashboard.py) y la respuesta
+        lleva su ETag: ETagMiddleware responde 304 vacío si el cliente ya
+        tiene un dashboard sin cambios.
         """
-        # Estadísticas generales
-        total_equipos = Equipos.objects.filter(activo=True).count()
-        equipos_operativos = Equipos.objects.filter(
-            activo=True, 
-            idestadoactual__nombreestado='Operativo'
-        ).count()
-        
-        # Órdenes de trabajo
-        ots_abiertas = OrdenesTrabajo.objects.filter(
-            idestadoot__nombreestadoot__in=['Abierta', 'Asignada']
-        ).count()
-        
-        ots_vencidas = OrdenesTrabajo.objects.filter(
-            fechaejecucion__lt=timezone.now().date(),
-            idestadoot__nombreestadoot__in=['Abierta', 'Asignada']
-        ).count()
-        
-        # Mantenimientos próximos (próximos 7 días)
-        fecha_limite = timezone.now().date() + datetime.timedelta(days=7)
-        mantenimientos_proximos = Agendas.objects.filter(
-            fechahorainicio__date__lte=fecha_limite,
-            fechahorainicio__date__gte=timezone.now().date(),
-            tipoevento='Mantenimiento Preventivo'
-        ).count()
-        
-        # Equipos por estado
-        equipos_por_estado = EstadosEquipo.objects.annotate(
-            cantidad=Count('equipos')
-        ).values('nombreestado', 'cantidad')
-        
-        # OTs por tipo de mantenimiento
-        ots_por_tipo = TiposMantenimientoOT.objects.annotate(
-            cantidad=Count('ordenestrabajo')
-        ).values('nombretipomantenimientoot', 'cantidad')
-
-        return Response({
-            'estadisticas_generales': {
-                'total_equipos': total_equipos,
-                'equipos_operativos': equipos_operativos,
-                'ots_abiertas': ots_abiertas,
-                'ots_vencidas': ots_vencidas,
-                'mantenimientos_proximos': mantenimientos_proximos
-            },
-            'equipos_por_estado': list(equipos_por_estado),
-            'ots_por_tipo': list(ots_por_tipo)
-        })
+        snapshot = obtener_snapshot_dashboard()
+        response = Response(snapshot['datos'])
+        response['ETag'] = snapshot['etag']
+        patch_cache_control(response, private=True, max_age=ttl_dashboard())
+        return response
 
     @action(detail=False, methods=['get'], url_path='equipos-criticos')
     def equipos_criticos(self, request):
@@ -128,10 +94,7 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
                 
                 if actividades_pendientes == 0:
                     # Marcar OT como completada
-                    estado_completada = EstadosOrdenTrabajo.objects.get_or_create(
-                        nombreestadoot='Completada',
-                        defaults={'descripcion': 'Orden de trabajo finalizada'}
-                    )[0]
+                    estado_completada = estado_ot('Completada', 'Orden de trabajo finalizada')
                     
                     ot.idestadoot = estado_completada
                     ot.fechacompletado = timezone.now()
@@ -165,12 +128,9 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
         try:
             equipo = Equipos.objects.get(idequipo=equipo_id)
             horometro_anterior = equipo.horometroactual
-            
-            equipo.horometroactual = nuevo_horometro
-            equipo.save()
 
-            # Aquí se podría crear un registro de historial de horómetros
-            # HistorialHorometros.objects.create(...)
+            # Queda en el historial y actualiza la tasa de uso del equipo
+            registrar_lecturas([(equipo.idequipo, timezone.now(), int(nuevo_horometro))])
 
             return Response({
                 'message': 'Horómetro actualizado exitosamente',
@@ -190,6 +150,33 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['post'], url_path='lecturas-horometro')
+    def lecturas_horometro(self, request):
+        """
+        Carga masiva de lecturas de horómetro: una lista de
+        {equipo_id, horometro, fecha} (o {"lecturas": [...]}). Las lecturas
+        repetidas se ignoran, así que el envío de un turno se puede reintentar.
+        """
+        datos = request.data.get('lecturas') if isinstance(request.data, dict) else request.data
+        serializer = LecturaHorometroSerializer(data=datos, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        ahora = timezone.now()
+        lecturas = [
+            (lectura['equipo_id'], lectura.get('fecha') or ahora, lectura['horometro'])
+            for lectura in serializer.validated_data
+        ]
+        ids = {equipo_id for equipo_id, _, _ in lecturas}
+        desconocidos = ids - set(Equipos.objects.filter(idequipo__in=ids).values_list('idequipo', flat=True))
+        if desconocidos:
+            return Response(
+                {'error': 'Equipos no encontrados', 'equipos': sorted(desconocidos)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        resultado = registrar_lecturas(lecturas)
+        return Response({'recibidas': len(lecturas), **resultado})
+
     @action(detail=False, methods=['get'], url_path='reportes/eficiencia')
     def reporte_eficiencia(self, request):
         """
@@ -269,21 +256,8 @@ class MantenimientoWorkflowViewSet(viewsets.ViewSet):
                 )
 
             # Obtener o crear estado y tipo de OT
-            try:
-                estado_inicial = EstadosOrdenTrabajo.objects.get(nombreestadoot='Abierta')
-            except EstadosOrdenTrabajo.DoesNotExist:
-                estado_inicial = EstadosOrdenTrabajo.objects.create(
-                    nombreestadoot='Abierta',
-                    descripcion='OT recién creada y pendiente de asignación'
-                )
-
-            try:
-                tipo_ot = TiposMantenimientoOT.objects.get(nombretipomantenimientoot='Preventivo')
-            except TiposMantenimientoOT.DoesNotExist:
-                tipo_ot = TiposMantenimientoOT.objects.create(
-                    nombretipomantenimientoot='Preventivo',
-                    descripcion='Mantenimiento planificado y programado'
-                )
+            estado_inicial = estado_ot('Abierta', 'OT recién creada y pendiente de asignación')
+            tipo_ot = tipo_mantenimiento_ot('Preventivo', 'Mantenimiento planificado y programado')
 
             # Crear la orden de trabajo
             with transaction.atomic():
@@ -0,0 +1,133 @@
+# cmms_project/authentication.py
+# Autenticación por token con caché en memoria del proceso.
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from cmms_api.models import Roles, Usuarios
+from cmms_api.permissions import rol_usuario
+
+
+class CacheTokens:
+    """
+    LRU acotado con expiración: token -> (usuario, rol, expira). Es propio de
+    cada proceso, así que la expiración limita cuánto tarda otro worker en notar
+    un logout o un cambio de rol.
+    """
+
+    def __init__(self, tamano=1024, ttl=60):
+        self.tamano = tamano
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, key):
+        with self._lock:
+            entrada = self._entradas.get(key)
+            if entrada is None:
+                return None
+            if entrada[2] <= time.monotonic():
+                del self._entradas[key]
+                return None
+            self._entradas.move_to_end(key)
+            return entrada[0], entrada[1]
+
+    def guardar(self, key, user, rol):
+        with self._lock:
+            self._entradas[key] = (user, rol, time.monotonic() + self.ttl)
+            self._entradas.move_to_end(key)
+            while len(self._entradas) > self.tamano:
+                self._entradas.popitem(last=False)
+
+    def invalidar_token(self, key):
+        with self._lock:
+            self._entradas.pop(key, None)
+
+    def invalidar_usuario(self, user_id):
+        with self._lock:
+            for key in [k for k, (user, _, _) in self._entradas.items() if user.pk == user_id]:
+                del self._entradas[key]
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+tokens_en_cache = CacheTokens(
+    tamano=getattr(settings, 'CMMS_TOKEN_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'CMMS_TOKEN_CACHE_TTL', 60),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication que resuelve cada token una vez por proceso (con su
+    rol) en vez de consultar authtoken_token y auth_user en cada solicitud.
+    """
+
+    def authenticate(self, request):
+        resultado = super().authenticate(request)
+        if resultado is not None:
+            # Los permisos por rol lo leen de la solicitud (ver cmms_api.permissions).
+            request._rol_cmms = resultado[1]._rol_cmms
+        return resultado
+
+    def authenticate_credentials(self, key):
+        encontrado = tokens_en_cache.obtener(key)
+        if encontrado is None:
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            encontrado = (token.user, rol_usuario(token.user_id))
+            tokens_en_cache.guardar(key, *encontrado)
+
+        user, rol = encontrado
+        # Cada solicitud recibe su propia copia: la del caché se comparte entre hilos.
+        user = copy.copy(user)
+        token = Token(key=key, user=user)
+        token._rol_cmms = rol
+        return user, token
+
+
+def _al_confirmar(funcion, *args):
+    funcion(*args)
+    transaction.on_commit(lambda: funcion(*args))
+
+
+@receiver(post_delete, sender=Token)
+@receiver(post_save, sender=Token)
+def token_modificado(sender, instance, **kwargs):
+    # Logout (LogoutView elimina el token) o rotación del token.
+    _al_confirmar(tokens_en_cache.invalidar_token, instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Usuarios)
+@receiver(post_delete, sender=Usuarios)
+def usuario_modificado(sender, instance, **kwargs):
+    _al_confirmar(tokens_en_cache.invalidar_usuario, instance.pk)
+
+
+@receiver(post_save, sender=Roles)
+@receiver(post_delete, sender=Roles)
+def rol_modificado(sender, **kwargs):
+    _al_confirmar(tokens_en_cache.limpiar)
@@ -47,9 +47,11 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'cmms_api.middleware.CompresionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'cmms_api.middleware.ETagMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -149,6 +151,75 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # --- FIN DE LA MODIFICACIÓN ---
 
+# Almacén de imágenes (evidencias de checklists y OTs) direccionado por contenido.
+# Las imágenes se guardan fuera de la base de datos y la API solo expone su URL.
+CMMS_BLOB_STORE = {
+    'BACKEND': 'cmms_api.blob_store.LocalFileSystemBlobStore',
+    'OPTIONS': {
+        'location': os.environ.get('CMMS_BLOB_ROOT', os.path.join(MEDIA_ROOT, 'blobs')),
+    },
+}
+
+# Caché compartida de la API (ver cmms_api/cache.py). Por defecto, memoria local
+# del proceso; CMMS_CACHE_BACKEND=file o db la comparte entre workers sin servicios
+# extra (db requiere "manage.py createcachetable"), y REDIS_URL usa Redis.
+CMMS_CACHE_BACKEND = os.environ.get('CMMS_CACHE_BACKEND', 'redis' if os.environ.get('REDIS_URL') else 'locmem')
+CACHES = {
+    'default': {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cmms-api',
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CMMS_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+        },
+        'db': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cmms_cache',
+        },
+        'redis': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        },
+    }[CMMS_CACHE_BACKEND],
+}
+CACHES['default'].update({
+    'KEY_PREFIX': 'cmms',
+    'TIMEOUT': 300,
+    'OPTIONS': {'MAX_ENTRIES': 5000} if CMMS_CACHE_BACKEND in ('locmem', 'file', 'db') else {},
+})
+# Alias y duración por defecto (segundos) de las entradas de cmms_api/cache.py.
+CMMS_CACHE_ALIAS = 'default'
+CMMS_CACHE_TTL = 300
+# Las entradas que se invalidan por tags (catálogos, roles, instantánea del
+# dashboard y ETag por versiones de los modelos) suponen que todos los workers
+# ven la misma caché: con locmem cada proceso tiene sus propias versiones y no se
+# entera de una escritura hecha en otro. Por eso con locmem esas versiones y
+# entradas duran solo CMMS_CACHE_TTL_LOCAL segundos, lo máximo que un worker
+# puede servir datos obsoletos. Con un único proceso (p. ej. runserver)
+# CMMS_CACHE_COMPARTIDA=true usa el TTL normal.
+CMMS_CACHE_COMPARTIDA = (
+    CMMS_CACHE_BACKEND != 'locmem'
+    or os.environ.get('CMMS_CACHE_COMPARTIDA', 'False').lower() in ('1', 'true')
+)
+CMMS_CACHE_TTL_LOCAL = int(os.environ.get('CMMS_CACHE_TTL_LOCAL', 5))
+
+# Tokens resueltos que guarda cada proceso y segundos que se reutilizan (ver
+# cmms_project/authentication.py).
+CMMS_TOKEN_CACHE_SIZE = int(os.environ.get('CMMS_TOKEN_CACHE_SIZE', 1024))
+CMMS_TOKEN_CACHE_TTL = int(os.environ.get('CMMS_TOKEN_CACHE_TTL', 60))
+
+# Tamaño mínimo (bytes) de las respuestas que se comprimen y calidad de brotli (0-11).
+CMMS_COMPRESION_MIN_BYTES = int(os.environ.get('CMMS_COMPRESION_MIN_BYTES', 1024))
+CMMS_COMPRESION_BROTLI_CALIDAD = int(os.environ.get('CMMS_COMPRESION_BROTLI_CALIDAD', 5))
+
+# Días en que la tasa de uso estimada de un equipo olvida las lecturas de horómetro antiguas.
+CMMS_HOROMETRO_EWMA_DIAS = float(os.environ.get('CMMS_HOROMETRO_EWMA_DIAS', 7))
+
+# Segundos que se reutiliza la instantánea de KPIs del dashboard de mantenimiento.
+CMMS_DASHBOARD_TTL = int(os.environ.get('CMMS_DASHBOARD_TTL', 30))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -193,7 +264,7 @@ CORS_PREFLIGHT_MAX_AGE = 86400
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'cmms_project.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -202,10 +273,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'cmms_api.renderers.JSONRapidoRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'cmms_api.parsers.JSONRapidoParser',
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ],
@@ -5,6 +5,7 @@ from flask_cors import CORS
 import os
 import requests
 import re
+from urllib.parse import quote
 from datetime import datetime
 from session_manager import RedisSessionManager
 
@@ -50,26 +51,31 @@ def get_equipos():
         return []
 
 def get_equipo_by_name_or_code(search_term):
-    equipos = get_equipos()
-    search_term = search_term.lower().strip()
-    
-    for equipo in equipos:
-        nombre = equipo.get('nombreequipo', '').lower()
-        codigo = str(equipo.get('codigointerno', '')).lower()
-        
-        if search_term in nombre or search_term in codigo:
-            return equipo
-    
-    return None
+    search_term = search_term.strip()
+    if not search_term:
+        return None
+    try:
+        response = requests.get(
+            f'{CMMS_API_BASE_URL}equipos/search/',
+            params={'q': search_term, 'limit': 1},
+            timeout=5
+        )
+        if response.status_code == 200:
+            resultados = response.json().get('resultados', [])
+            return resultados[0] if resultados else None
+        return None
+    except Exception as e:
+        print(f"Error al buscar equipo: {str(e)}")
+        return None
 
 def get_orden_trabajo(numero_ot):
     try:
-        response = requests.get(f'{CMMS_API_BASE_URL}ordenes-trabajo/', timeout=5)
+        response = requests.get(
+            f'{CMMS_API_BASE_URL}ordenes-trabajo/by-numero/{quote(numero_ot, safe="")}/',
+            timeout=5
+        )
         if response.status_code == 200:
-            ordenes = response.json()
-            for orden in ordenes:
-                if orden.get('numeroot', '').lower() == numero_ot.lower():
-                    return orden
+            return response.json()
         return None
     except Exception as e:
         print(f"Error al obtener orden de trabajo: {str(e)}")
@@ -117,7 +123,7 @@ def format_orden_trabajo_info(orden):
     prioridad = orden.get('prioridad', 'N/A')
     fecha_emision = orden.get('fechaemision', 'N/A')
     fecha_ejecucion = orden.get('fechaejecucion', 'No programada')
-    tecnico = orden.get('tecnico_asignado_nombre', 'No asignado')
+    tecnico = orden.get('tecnico_nombre') or 'No asignado'
     
     mensaje = f"📋 *Orden de Trabajo: {numero}*\n\n"
     mensaje += f"🔧 Equipo: {equipo}\n"
@@ -11,6 +11,7 @@ from airflow.operators.dummy import DummyOperator
 from pendulum import datetime
 import requests
 import re
+from urllib.parse import quote
 
 # Configuración
 CMMS_API_BASE_URL = "http://localhost:8000/api/"
@@ -32,12 +33,12 @@ def query_cmms_api_func(**context):
         return None
     
     try:
-        response = requests.get(f'{CMMS_API_BASE_URL}ordenes-trabajo/', timeout=5)
+        response = requests.get(
+            f'{CMMS_API_BASE_URL}ordenes-trabajo/by-numero/{quote(ot_number, safe="")}/',
+            timeout=5
+        )
         if response.status_code == 200:
-            ordenes = response.json()
-            for orden in ordenes:
-                if orden.get('numeroot', '').lower() == ot_number.lower():
-                    return orden
+            return response.json()
         return None
     except Exception as e:
         print(f"Error al consultar CMMS API: {str(e)}")
@@ -9,18 +9,19 @@ from airflow.decorators import dag, task
 from pendulum import datetime
 import requests
 import re
+from urllib.parse import quote
 
 # URL del servicio de notificaciones
 NOTIFICATION_URL = "http://localhost:5001/api/notify"
 
 def get_orden_trabajo(numero_ot):
     try:
-        response = requests.get(f'http://localhost:8000/api/ordenes-trabajo/', timeout=5)
+        response = requests.get(
+            f'http://localhost:8000/api/ordenes-trabajo/by-numero/{quote(numero_ot, safe="")}/',
+            timeout=5
+        )
         if response.status_code == 200:
-            ordenes = response.json()
-            for orden in ordenes:
-                if orden.get('numeroot', '').lower() == numero_ot.lower():
-                    return orden
+            return response.json()
         return None
     except Exception as e:
         print(f"Error al obtener orden de trabajo: {str(e)}")